@@ -1,7 +1,9 @@
 import glob
+import json
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from agent_torch.core.analyzer.utils import DotDict, load_state_trace
 from langchain_community.document_loaders import TextLoader
+from langchain_core.documents import Document
 from langchain.vectorstores import FAISS
 from langchain.retrievers.self_query.base import SelfQueryRetriever
 from langchain_community.embeddings.sentence_transformer import (
@@ -59,8 +61,33 @@ class DocumentRetriever:
             loader = TextLoader(file)
             docs.append(loader.load()[0])
         split_docs = self.split_documents(docs)
+
+        log_files = glob.glob(
+            self.directory + "/conversation_history" + "/**/*.jsonl", recursive=True
+        )
+        for file in log_files:
+            split_docs.extend(self.load_conversation_log(file))
         return self.add_metadata(split_docs, metadata=metadata)
 
+    def load_conversation_log(self, file):
+        r"""one document per turn of a ConversationLog, tagged with its step and group"""
+        docs = []
+        with open(file, "r") as f:
+            for line in f:
+                record = json.loads(line)
+                docs.append(
+                    Document(
+                        page_content=f"Query: {record['query']}\nResponse: {record['answer']}",
+                        metadata={
+                            "source": file,
+                            "step": record["step"],
+                            "group": record["group"],
+                            "archetype": record["archetype"],
+                        },
+                    )
+                )
+        return docs
+
     def split_documents(self, docs):
         text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=5000, chunk_overlap=30
@@ -158,6 +158,23 @@ class Configurator(nn.Module):
     def add_metadata(self, key, value):
         self.config["simulation_metadata"].update({key: value})
 
+    def add_metric(
+        self, name, path, reduce="sum", group_by=None, bins=None, num_groups=None
+    ):
+        """Online reducer evaluated by the runner after every step"""
+        if "metrics" not in self.config:
+            self.config["metrics"] = OmegaConf.create()
+
+        _metric_obj = OmegaConf.create({"path": path, "reduce": reduce})
+        for key, value in (
+            ("group_by", group_by),
+            ("bins", bins),
+            ("num_groups", num_groups),
+        ):
+            if value is not None:
+                _metric_obj.update({key: value})
+        self.config["metrics"].update({name: _metric_obj})
+
     def add_agents(self, key, number, all_properties=None):
         _created_agent = OmegaConf.create()
         if all_properties is None:
@@ -1,12 +1,17 @@
 from abc import ABC, abstractmethod
 import glob
+import json
 import os
+import tempfile
+import threading
+import numpy as np
 import pandas as pd
 import torch
 import yaml
 import pdb
 import dask.dataframe as dd
 from agent_torch.core.helpers import read_config
+from agent_torch.core.helpers.network import read_edge_list
 
 
 class DataLoaderBase(ABC):
@@ -55,6 +60,10 @@ class DataLoader(DataLoaderBase):
         self.population_size = population.population_size
         self.set_input_data_dir(population.population_folder_path)
         self.set_population_size(population.population_size)
+        if hasattr(population, "region_id"):
+            self.set_config_attribute(
+                "num_regions", int(population.region_id.max()) + 1
+            )
         self.register_resolvers = True
         self._write_config()
 
@@ -76,6 +85,59 @@ class DataLoader(DataLoaderBase):
         return omega_config
 
 
+class PopulationRegistry:
+    r"""
+    Process-level cache of loaded populations, keyed by population folder. Every
+    `LoadPopulation` of a folder shares the same attribute tensors, so the
+    pickles are read once no matter how many behaviors or executors use them.
+    Consumers must treat the shared tensors as read-only. An entry is reloaded
+    when a pickle of its folder is added, removed or modified.
+    """
+
+    entries = {}
+    lock = threading.Lock()
+
+    @staticmethod
+    def signature(folder):
+        pickle_files = sorted(glob.glob(f"{folder}/*.pickle", recursive=False))
+        return tuple(
+            (file, os.stat(file).st_mtime_ns, os.stat(file).st_size)
+            for file in pickle_files
+        )
+
+    @staticmethod
+    def read(signature):
+        attributes, population_size = {}, 0
+        for file, _, _ in signature:
+            key = os.path.splitext(os.path.basename(file))[0]
+            df = pd.read_pickle(file)
+            attributes[key] = torch.from_numpy(df.values).float()
+            population_size = len(df)
+        return attributes, population_size
+
+    @classmethod
+    def get(cls, folder):
+        r"""returns ({attribute: tensor}, population size) of a population folder"""
+        folder = os.path.abspath(folder)
+        signature = cls.signature(folder)
+        with cls.lock:
+            entry = cls.entries.get(folder)
+            if entry is None or entry[0] != signature:
+                entry = (signature, *cls.read(signature))
+                cls.entries[folder] = entry
+        return entry[1], entry[2]
+
+    @classmethod
+    def remove(cls, folder):
+        with cls.lock:
+            cls.entries.pop(os.path.abspath(folder), None)
+
+    @classmethod
+    def clear(cls):
+        with cls.lock:
+            cls.entries = {}
+
+
 class LoadPopulation:
     def __init__(self, region):
         self.population_folder_path = region.__path__[0]
@@ -95,15 +157,183 @@ class LoadPopulation:
             data.to_parquet(parquet_file, index=False)
 
     def load_population(self):
-        pickle_files = glob.glob(
-            f"{self.population_folder_path}/*.pickle", recursive=False
+        # tensors are shared with every other loader of this population
+        attributes, self.population_size = PopulationRegistry.get(
+            self.population_folder_path
         )
-        for file in pickle_files:
-            with open(file, "rb") as f:
-                key = os.path.splitext(os.path.basename(file))[0]
-                df = pd.read_pickle(file)
-                setattr(self, key, torch.from_numpy(df.values).float())
-        self.population_size = len(df)
+        for key, value in attributes.items():
+            setattr(self, key, value)
+
+
+class BatchedPopulation:
+    """
+    Several regions merged into one population folder, so a single run covers all of them.
+    Attribute codes are re-encoded against a shared mapping, every agent gets a `region_id`,
+    and mobility networks are concatenated block-diagonally. The object can be passed
+    anywhere a population module is expected.
+
+    Attributes in `region_specific_attributes` (e.g. household ids) are never shared
+    across regions, their labels are prefixed with the region name instead.
+
+    Without a `save_dir` the merged population lives in a temporary folder that is
+    deleted by `close()` (or when the object is garbage collected).
+    """
+
+    def __init__(
+        self, regions, save_dir=None, region_specific_attributes=("household",)
+    ):
+        self.regions = regions
+        self.region_specific_attributes = region_specific_attributes
+        self.region_names = []
+        for region in regions:
+            region_name = region.__name__.split(".")[-1]
+            if region_name in self.region_names:
+                region_name = f"{region_name}_{len(self.region_names)}"
+            self.region_names.append(region_name)
+        self.region_folder_paths = [region.__path__[0] for region in regions]
+
+        self.temp_dir = None
+        if save_dir is None:
+            self.temp_dir = tempfile.TemporaryDirectory(prefix="batched_population_")
+            save_dir = self.temp_dir.name
+        os.makedirs(save_dir, exist_ok=True)
+        self.population_folder_path = save_dir
+        self.__path__ = [save_dir]
+        self.__name__ = "batched_population"
+
+        self.region_sizes = []
+        self.merge_populations()
+        self.region_offsets = np.concatenate(([0], np.cumsum(self.region_sizes)))
+        self.population_size = int(self.region_offsets[-1])
+
+    def close(self):
+        r"""delete the merged population if it lives in a temporary folder"""
+        if self.temp_dir is not None:
+            PopulationRegistry.remove(self.population_folder_path)
+            self.temp_dir.cleanup()
+            self.temp_dir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __del__(self):
+        if getattr(self, "temp_dir", None) is not None:
+            self.close()
+
+    def _load_mapping(self, folder_path):
+        mapping_path = os.path.join(folder_path, "mapping.json")
+        if not os.path.exists(mapping_path):
+            return {}
+        with open(mapping_path, "r") as f:
+            return json.load(f)
+
+    def _common_files(self, pattern):
+        file_names = [
+            set(
+                os.path.relpath(path, folder_path)
+                for path in glob.glob(os.path.join(folder_path, pattern))
+            )
+            for folder_path in self.region_folder_paths
+        ]
+        return sorted(set.intersection(*file_names))
+
+    def merge_populations(self):
+        mappings = [
+            self._load_mapping(folder_path) for folder_path in self.region_folder_paths
+        ]
+
+        merged_mapping = {}
+        for file_name in self._common_files("*.pickle"):
+            key = os.path.splitext(file_name)[0]
+            columns = []
+            label_index = {}
+            for region_name, folder_path, mapping in zip(
+                self.region_names, self.region_folder_paths, mappings
+            ):
+                values = pd.read_pickle(os.path.join(folder_path, file_name))
+                if key in mapping:
+                    # re-encode region codes against the shared mapping
+                    region_labels = mapping[key]
+                    if key in self.region_specific_attributes:
+                        region_labels = [f"{region_name}_{l}" for l in region_labels]
+                    labels = merged_mapping.setdefault(key, [])
+                    for label in region_labels:
+                        if label not in label_index:
+                            label_index[label] = len(labels)
+                            labels.append(label)
+                    recode = np.array([label_index[label] for label in region_labels])
+                    codes = values.values
+                    values = pd.Series(
+                        np.where(codes >= 0, recode[codes], codes), name=values.name
+                    )
+                columns.append(values)
+            self.region_sizes = [len(values) for values in columns]
+            merged = pd.concat(columns, ignore_index=True)
+            merged.to_pickle(os.path.join(self.population_folder_path, file_name))
+
+        region_id = np.repeat(np.arange(len(self.regions)), self.region_sizes)
+        self.region_id = torch.from_numpy(region_id)
+        pd.Series(region_id, name="region_id").to_pickle(
+            os.path.join(self.population_folder_path, "region_id.pickle")
+        )
+        merged_mapping["region_id"] = self.region_names
+        with open(os.path.join(self.population_folder_path, "mapping.json"), "w") as f:
+            json.dump(merged_mapping, f)
+
+        for file_name in self._common_files("*.csv"):
+            merged = pd.concat(
+                [
+                    pd.read_csv(os.path.join(folder_path, file_name))
+                    for folder_path in self.region_folder_paths
+                ],
+                ignore_index=True,
+            )
+            merged.to_csv(
+                os.path.join(self.population_folder_path, file_name), index=False
+            )
+
+        self.merge_networks()
+
+    def merge_networks(self, network_dir="mobility_networks"):
+        offsets = np.concatenate(([0], np.cumsum(self.region_sizes)))
+        save_dir = os.path.join(self.population_folder_path, network_dir)
+        for file_name in self._common_files(os.path.join(network_dir, "*.csv")):
+            os.makedirs(save_dir, exist_ok=True)
+            # block-diagonal: each region's agent ids are shifted by its offset
+            edges = [
+                pd.read_csv(os.path.join(folder_path, file_name), header=None) + offset
+                for folder_path, offset in zip(self.region_folder_paths, offsets)
+            ]
+            pd.concat(edges, ignore_index=True).to_csv(
+                os.path.join(self.population_folder_path, file_name),
+                header=False,
+                index=False,
+            )
+
+        # int32 edge files of the mobility generator, listed in index.json
+        steps = []
+        for file_name in self._common_files(os.path.join(network_dir, "*.bin")):
+            os.makedirs(save_dir, exist_ok=True)
+            edges = np.concatenate(
+                [
+                    read_edge_list(os.path.join(folder_path, file_name)) + offset
+                    for folder_path, offset in zip(self.region_folder_paths, offsets)
+                ]
+            ).astype("<i4")
+            edges.tofile(os.path.join(self.population_folder_path, file_name))
+            steps.append({"file": os.path.basename(file_name), "num_edges": len(edges)})
+        if len(steps) > 0:
+            steps.sort(key=lambda step: (len(step["file"]), step["file"]))
+            index = {
+                "num_agents": int(offsets[-1]),
+                "dtype": "<i4",
+                "steps": steps,
+            }
+            with open(os.path.join(save_dir, "index.json"), "w") as f:
+                json.dump(index, f)
 
 
 class LinkPopulation(DataLoader):
@@ -34,7 +34,7 @@ class envs:
                     if substep_name in substep_func_dict:
                         substep_class = substep_func_dict[substep_name]
                         if hasattr(substep_class, "set_behavior"):
-                            behavior = Behavior(archetype=archetype, region=population)
+                            behavior = Behavior(archetype=archetype, region=loader)
                             substep_class.set_behavior(behavior)
 
             # 3. Now initialize runner after behaviors are set
@@ -52,11 +52,15 @@ class Executor(BaseExecutor):
             self.runner.step(num_steps_per_episode)
 
         if key is not None:
-            self.simulation_values = self.runner.get_simulation_values(key)
+            self.get_simulation_values(key)
 
     def get_simulation_values(self, key, key_type="environment"):
         if isinstance(self.runner.state_trajectory, dd.DataFrame):
             self.runner.state_trajectory = self.runner.state_trajectory.compute()
 
-        self.simulation_values = self.runner.state_trajectory[-1][-1][key_type][key]
+        if self.runner.capture_trajectory:
+            self.simulation_values = self.runner.state_trajectory[-1][-1][key_type][key]
+        else:
+            # without a trajectory only the final state is kept
+            self.simulation_values = self.runner.state[key_type][key]
         return self.simulation_values
@@ -2,3 +2,5 @@ from agent_torch.core.helpers.general import *
 from agent_torch.core.helpers.environment import *
 from agent_torch.core.helpers.initializer import *
 from agent_torch.core.helpers.soft import *
+from agent_torch.core.helpers.network import *
+from agent_torch.core.helpers.timeseries import *
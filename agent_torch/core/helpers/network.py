@@ -0,0 +1,218 @@
+"""Packed multi-layer contact networks"""
+
+import numpy as np
+import pandas as pd
+import torch
+
+
+class MultiLayerNetwork:
+    r"""
+    Several contact layers (household, work, school, random, ...) packed into a
+    single CSR structure. Rows are the receiving agents, `col_indices` the
+    sending agents, and `layer_ids` tags every edge with the layer it came from
+    so that per-layer weights can be gathered in a single pass.
+    """
+
+    def __init__(self, crow_indices, col_indices, layer_ids, layer_names, num_nodes):
+        self.crow_indices = crow_indices
+        self.col_indices = col_indices
+        self.layer_ids = layer_ids
+        self.layer_names = list(layer_names)
+        self.num_nodes = num_nodes
+
+    @property
+    def num_edges(self):
+        return self.col_indices.shape[0]
+
+    @property
+    def num_layers(self):
+        return len(self.layer_names)
+
+    def row_indices(self):
+        counts = self.crow_indices[1:] - self.crow_indices[:-1]
+        return torch.repeat_interleave(
+            torch.arange(self.num_nodes, device=counts.device), counts
+        )
+
+    def edge_index(self):
+        r"""edge list in (source, target) order, sorted by target"""
+        return torch.vstack((self.col_indices, self.row_indices()))
+
+    def edge_attr(self):
+        r"""edge attributes in the (network number, B_n) layout used by transmission"""
+        return torch.vstack(
+            (
+                self.layer_ids.float(),
+                torch.ones(self.num_edges, device=self.layer_ids.device),
+            )
+        )
+
+    def layer_sizes(self):
+        return {
+            name: int(count)
+            for name, count in zip(
+                self.layer_names,
+                torch.bincount(self.layer_ids, minlength=self.num_layers).tolist(),
+            )
+        }
+
+    def to(self, device):
+        return MultiLayerNetwork(
+            self.crow_indices.to(device),
+            self.col_indices.to(device),
+            self.layer_ids.to(device),
+            self.layer_names,
+            self.num_nodes,
+        )
+
+    def save(self, path):
+        np.savez(
+            path,
+            crow_indices=self.crow_indices.cpu().numpy(),
+            col_indices=self.col_indices.cpu().numpy(),
+            layer_ids=self.layer_ids.cpu().numpy(),
+            layer_names=np.array(self.layer_names),
+            num_nodes=self.num_nodes,
+        )
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(
+            torch.from_numpy(data["crow_indices"]).long(),
+            torch.from_numpy(data["col_indices"]).long(),
+            torch.from_numpy(data["layer_ids"]).long(),
+            data["layer_names"].tolist(),
+            int(data["num_nodes"]),
+        )
+
+    def __deepcopy__(self, memo):
+        # the packed structure is read-only during a simulation, so the state
+        # copies made by the controller can safely share it
+        return self
+
+
+def pack_layers(layers, num_nodes):
+    r"""
+    Pack a dict of {layer_name: (2, E) edge_index} into a MultiLayerNetwork.
+    Edges keep their layer of origin, duplicates across layers are preserved.
+    """
+    layer_names = list(layers.keys())
+    edge_lists = [np.asarray(layers[name]).reshape(2, -1) for name in layer_names]
+
+    src = np.concatenate([edges[0] for edges in edge_lists]).astype(np.int64)
+    dst = np.concatenate([edges[1] for edges in edge_lists]).astype(np.int64)
+    layer_ids = np.repeat(
+        np.arange(len(layer_names)), [edges.shape[1] for edges in edge_lists]
+    )
+
+    order = np.argsort(dst, kind="stable")
+    crow_indices = np.zeros(num_nodes + 1, dtype=np.int64)
+    crow_indices[1:] = np.cumsum(np.bincount(dst, minlength=num_nodes))
+
+    return MultiLayerNetwork(
+        torch.from_numpy(crow_indices),
+        torch.from_numpy(src[order]),
+        torch.from_numpy(layer_ids[order]).long(),
+        layer_names,
+        num_nodes,
+    )
+
+
+def group_clique_edges(group_ids):
+    r"""
+    Directed edges between every pair of agents that share a group id.
+    Negative ids mark agents without a group. Work is linear in the edges produced.
+    """
+    group_ids = np.asarray(group_ids).reshape(-1)
+    agents = np.nonzero(group_ids >= 0)[0]
+    order = np.argsort(group_ids[agents], kind="stable")
+    agents = agents[order]
+
+    _, starts, sizes = np.unique(
+        group_ids[agents], return_index=True, return_counts=True
+    )
+    member_size = np.repeat(sizes, sizes)
+    member_start = np.repeat(starts, sizes)
+
+    row_start = np.repeat(np.cumsum(member_size) - member_size, member_size)
+    offsets = np.arange(member_size.sum()) - row_start
+
+    src = np.repeat(agents, member_size)
+    dst = agents[np.repeat(member_start, member_size) + offsets]
+
+    keep = src != dst
+    return np.vstack((src[keep], dst[keep]))
+
+
+def chunked_group_ids(group_ids, group_size, eligible=None, seed=None):
+    r"""
+    Split the agents of every group into random chunks of at most `group_size`
+    (e.g. workplaces or classrooms within an area). Returns one id per agent,
+    -1 for agents that are not eligible.
+    """
+    group_ids = np.asarray(group_ids).reshape(-1)
+    num_agents = group_ids.shape[0]
+    if eligible is None:
+        eligible = np.ones(num_agents, dtype=bool)
+
+    rng = np.random.default_rng(seed)
+    agents = rng.permutation(np.nonzero(eligible & (group_ids >= 0))[0])
+    agents = agents[np.argsort(group_ids[agents], kind="stable")]
+
+    groups = group_ids[agents]
+    _, starts, sizes = np.unique(groups, return_index=True, return_counts=True)
+    position = np.arange(agents.shape[0]) - np.repeat(starts, sizes)
+
+    chunk_ids = -np.ones(num_agents, dtype=np.int64)
+    chunk_ids[agents] = groups.astype(np.int64) * (num_agents + 1) + (
+        position // group_size
+    )
+    return chunk_ids
+
+
+def read_edge_list(file_path):
+    r"""
+    (num_edges, 2) edge list written by the mobility generator, either a csv
+    or a .bin file of little-endian int32 pairs
+    """
+    if str(file_path).endswith(".bin"):
+        return np.fromfile(file_path, dtype="<i4").reshape(-1, 2)
+    return pd.read_csv(file_path, header=None).to_numpy()
+
+
+def edges_from_file(file_path):
+    r"""undirected edge list (as written by the mobility generator) in both directions"""
+    forward = read_edge_list(file_path).T.astype(np.int64)
+    return np.hstack((forward, forward[::-1]))
+
+
+def build_multi_layer_network(attributes, layer_specs, num_nodes, seed=None):
+    r"""
+    Build all contact layers from per-agent attribute codes and pack them.
+
+    Each entry of `layer_specs` is one of:
+        {"attribute": "household"}                       -> clique per value
+        {"attribute": "area", "group_size": 20,
+         "ages": [1, 2, 3, 4]}                           -> random chunks per value
+        {"file_path": ".../mobility_networks/0.csv"}     -> edges read from file
+    """
+    layers = {}
+    for layer_name, spec in layer_specs.items():
+        if spec.get("file_path") is not None:
+            layers[layer_name] = edges_from_file(spec["file_path"])
+            continue
+
+        group_ids = np.asarray(attributes[spec["attribute"]]).reshape(-1)
+        if spec.get("group_size") is not None:
+            eligible = None
+            if spec.get("ages") is not None:
+                eligible = np.isin(
+                    np.asarray(attributes["age"]).reshape(-1), spec["ages"]
+                )
+            group_ids = chunked_group_ids(
+                group_ids, spec["group_size"], eligible=eligible, seed=seed
+            )
+        layers[layer_name] = group_clique_edges(group_ids)
+
+    return pack_layers(layers, num_nodes)
@@ -0,0 +1,33 @@
+import torch
+
+
+class TimeSeriesBuffer:
+    r"""
+    Time-indexed view over a state tensor (e.g. `daily_infected` of shape
+    (num_steps,) or (num_steps, num_regions)). `write` updates a single slot
+    out-of-place and returns the new tensor, so a step costs O(1) autograd work
+    instead of adding a dense one-hot vector over the whole horizon.
+    """
+
+    def __init__(self, values, dim=0):
+        self.values = values
+        self.dim = dim % values.dim()
+
+    def _slot(self, value):
+        slot_shape = self.values.shape[: self.dim] + self.values.shape[self.dim + 1 :]
+        value = torch.as_tensor(value, device=self.values.device).to(self.values.dtype)
+        if value.numel() == 1:
+            value = value.reshape(())
+        return value.expand(slot_shape).unsqueeze(self.dim)
+
+    def _index(self, t):
+        return torch.tensor([int(t)], device=self.values.device)
+
+    def write(self, t, value, accumulate=True):
+        r"""returns the buffer with `value` added to (or stored in) slot t"""
+        if accumulate:
+            return self.values.index_add(self.dim, self._index(t), self._slot(value))
+        return self.values.index_copy(self.dim, self._index(t), self._slot(value))
+
+    def read(self, t):
+        return self.values.select(self.dim, int(t))
@@ -4,6 +4,9 @@ import torch.nn as nn
 # import dask.dataframe as dd
 from agent_torch.core.helpers.general import *
 
+# empty rows per super-agent when `compression` does not set `spare_rows`
+DEFAULT_SPARE_ROWS = 4
+
 
 class Initializer(nn.Module):
     def __init__(self, config, registry):
@@ -202,11 +205,87 @@ class Initializer(nn.Module):
                 #     attr_list.to(self.device),
                 # )
 
+    def _group_identical_agents(self, properties, by, num_agents):
+        key = torch.hstack(
+            [properties[prop].reshape(num_agents, -1).float() for prop in by]
+        )
+        _, inverse, counts = torch.unique(
+            key, dim=0, return_inverse=True, return_counts=True
+        )
+        representatives = torch.full(
+            (counts.shape[0],), num_agents, dtype=torch.long, device=key.device
+        ).scatter_reduce(
+            0, inverse, torch.arange(num_agents, device=key.device), reduce="amin"
+        )
+        return representatives, inverse, counts
+
+    def compress_agents(self, agent_type, compression):
+        r"""
+        merge agents that are identical in `compression["by"]` into weighted super-agents.
+        Every super-agent keeps `spare_rows` empty rows (weight 0) that transitions can
+        split members into, and a `node` id that locates all its rows on the networks.
+        The state has (1 + spare_rows) rows per super-agent, so few spare rows keep the
+        compression high. Transitions free rows by merging identical ones; a super-agent
+        without a free row moves new members into an existing row (e.g. the latest
+        exposed cohort), which shifts their transition times. Set `spare_rows` up to
+        `num_steps_per_episode` when every step needs its own split.
+        """
+        properties = self.agents[agent_type]
+        num_agents = properties[compression["by"][0]].shape[0]
+
+        representatives, inverse, counts = self._group_identical_agents(
+            properties, compression["by"], num_agents
+        )
+        num_groups = counts.shape[0]
+        spare_rows = compression.get("spare_rows", DEFAULT_SPARE_ROWS)
+        rows = representatives.repeat(1 + spare_rows)
+
+        for prop, value in properties.items():
+            if not torch.is_tensor(value) or value.dim() == 0:
+                continue
+            if value.shape[0] != num_agents:
+                continue
+            properties[prop] = value[rows]
+            property_key = f"agents_{agent_type}_{prop}"
+            if property_key in self.learnable_parameters:
+                self.learnable_parameters[property_key] = properties[prop]
+            if property_key in self.fixed_parameters:
+                self.fixed_parameters[property_key] = properties[prop]
+
+        weight = torch.zeros(rows.shape[0], 1, device=self.device)
+        weight[:num_groups, 0] = counts.float()
+        properties["weight"] = weight
+        properties["node"] = (
+            torch.arange(num_groups, device=self.device)
+            .repeat(1 + spare_rows)
+            .unsqueeze(1)
+        )
+
+        # networks are defined between super-agents; edges keep their multiplicity
+        inverse = inverse.to(self.device)
+        for network_path in compression.get("networks", []):
+            interaction_type, contact_network = network_path.split("/")
+            network = self.networks[interaction_type][contact_network]
+            edge_list, attr_list = network["adjacency_matrix"]
+            network["adjacency_matrix"] = (inverse[edge_list], attr_list)
+
+        self.config["state"]["agents"][agent_type]["number"] = rows.shape[0]
+        self.config["simulation_metadata"]["num_agents"] = rows.shape[0]
+
+    def compress(self):
+        compression = self.config["simulation_metadata"].get("compression")
+        if compression is None:
+            return
+
+        for agent_type in compression.keys():
+            self.compress_agents(agent_type, compression[agent_type])
+
     def simulator(self):
         self.init_environment()
         self.init_agents(key="agents")
         self.init_objects(key="objects")
         self.init_network()
+        self.compress()
 
         # track learnable parameters
         self.parameters_dict = nn.ParameterDict(self.learnable_parameters)
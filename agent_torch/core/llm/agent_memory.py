@@ -1,6 +1,90 @@
 import abc
+import json
 import os
 
+from langchain_core.messages import AIMessage, HumanMessage
+
+
+class RingBufferMemory:
+    """
+    Fixed-size conversation memory for a set of agents (prompt groups).
+    Every agent keeps its last `capacity` (input, output) pairs in a ring
+    buffer stored in flat lists, so reads cost O(last_k) and the total size
+    is bounded by num_agents * capacity.
+    """
+
+    def __init__(self, num_agents, capacity=64):
+        self.num_agents = num_agents
+        self.capacity = capacity
+        self.inputs = [None] * (num_agents * capacity)
+        self.outputs = [None] * (num_agents * capacity)
+        self.heads = [0] * num_agents  # next slot to write
+        self.counts = [0] * num_agents
+
+    def __len__(self):
+        return self.num_agents
+
+    def save_context(self, agent_id, context_in, context_out):
+        slot = agent_id * self.capacity + self.heads[agent_id]
+        self.inputs[slot] = context_in
+        self.outputs[slot] = context_out
+        self.heads[agent_id] = (self.heads[agent_id] + 1) % self.capacity
+        self.counts[agent_id] = min(self.counts[agent_id] + 1, self.capacity)
+
+    def get_pairs(self, agent_id, last_k=None):
+        """Last `last_k` (input, output) pairs of an agent, oldest first."""
+        count = self.counts[agent_id]
+        k = count if last_k is None else min(last_k, count)
+        base = agent_id * self.capacity
+        start = self.heads[agent_id] - k
+        slots = [base + (start + i) % self.capacity for i in range(k)]
+        return [(self.inputs[slot], self.outputs[slot]) for slot in slots]
+
+    def get_messages(self, agent_id, last_k=None):
+        """Last `last_k` messages as alternating human / ai messages."""
+        if last_k is not None and last_k <= 0:
+            last_k = None  # keep the `[-last_k:]` semantics of the langchain buffer
+        num_pairs = None if last_k is None else (last_k + 1) // 2
+        messages = []
+        for context_in, context_out in self.get_pairs(agent_id, num_pairs):
+            messages.append(HumanMessage(content=context_in))
+            messages.append(AIMessage(content=context_out))
+        return messages if last_k is None else messages[-last_k:]
+
+    def clear(self, agent_id):
+        base = agent_id * self.capacity
+        for slot in range(base, base + self.capacity):
+            self.inputs[slot] = None
+            self.outputs[slot] = None
+        self.heads[agent_id] = 0
+        self.counts[agent_id] = 0
+
+    def save(self, path):
+        """Write the whole store to a single json file."""
+        with open(path, "w") as f:
+            json.dump(
+                {
+                    "num_agents": self.num_agents,
+                    "capacity": self.capacity,
+                    "inputs": self.inputs,
+                    "outputs": self.outputs,
+                    "heads": self.heads,
+                    "counts": self.counts,
+                },
+                f,
+            )
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r") as f:
+            data = json.load(f)
+        memory = cls(data["num_agents"], data["capacity"])
+        memory.inputs = data["inputs"]
+        memory.outputs = data["outputs"]
+        memory.heads = data["heads"]
+        memory.counts = data["counts"]
+        return memory
+
 
 class MemoryHandler(abc.ABC):
     """Abstract base class for handling memory operations."""
@@ -34,20 +118,16 @@ class DSPYMemoryHandler(MemoryHandler):
         self.llm = llm
 
     def save_memory(self, query, output, agent_id):
-        self.agent_memory[agent_id].save_context(
-            {"input": query["agent_query"]}, {"output": output}
-        )
+        self.agent_memory.save_context(agent_id, query["agent_query"], output)
 
     def get_memory(self, last_k, agent_id):
         last_k_memory = {
-            "chat_history": self.agent_memory[agent_id].load_memory_variables({})[
-                "chat_history"
-            ][-last_k:]
+            "chat_history": self.agent_memory.get_messages(agent_id, last_k=last_k)
         }
         return last_k_memory
 
     def clear_memory(self, agent_id):
-        self.agent_memory[agent_id].clear()
+        self.agent_memory.clear(agent_id)
 
     def export_memory_to_file(self, file_dir, last_k):
         if not os.path.exists(file_dir):
@@ -68,20 +148,16 @@ class LangchainMemoryHandler(MemoryHandler):
         self.agent_memory = agent_memory
 
     def save_memory(self, query, output, agent_id):
-        self.agent_memory[agent_id].save_context(
-            {"input": query["agent_query"]}, {"output": output["text"]}
-        )
+        self.agent_memory.save_context(agent_id, query["agent_query"], output["text"])
 
     def get_memory(self, last_k, agent_id):
         last_k_memory = {
-            "chat_history": self.agent_memory[agent_id].load_memory_variables({})[
-                "chat_history"
-            ][-last_k:]
+            "chat_history": self.agent_memory.get_messages(agent_id, last_k=last_k)
         }
         return last_k_memory
 
     def clear_memory(self, agent_id):
-        self.agent_memory[agent_id].clear()
+        self.agent_memory.clear(agent_id)
 
     def export_memory_to_file(self, file_dir, last_k):
         if not os.path.exists(file_dir):
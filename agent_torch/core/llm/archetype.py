@@ -1,65 +1,146 @@
 import sys
 import os
+import time
+import concurrent.futures
 
-from agent_torch.core.llm.agent_memory import DSPYMemoryHandler, LangchainMemoryHandler
+from agent_torch.core.llm.agent_memory import (
+    DSPYMemoryHandler,
+    LangchainMemoryHandler,
+    RingBufferMemory,
+)
+from agent_torch.core.llm.packing import prompt_packed
 
+# responses are cached through `Archetype(cache=...)` instead of dspy's own cache
 os.environ["DSP_CACHEBOOL"] = "False"
-from langchain.memory import ConversationBufferMemory
 
 
 class Archetype:
-    def __init__(self, n_arch=1):
+    def __init__(
+        self,
+        n_arch=1,
+        cache=None,
+        memory_size=64,
+        pack_size=None,
+        response_schema=None,
+        max_requeries=2,
+        telemetry=None,
+    ):
         self.n_arch = n_arch
+        self.cache = cache
+        self.memory_size = memory_size
+        self.pack_size = pack_size
+        self.response_schema = response_schema
+        self.max_requeries = max_requeries
+        self.telemetry = telemetry
 
     def llm(self, llm, user_prompt):
         try:
             llm.initialize_llm()
-            return [
-                LLMArchetype(llm, user_prompt, n_arch=self.n_arch)
-                for _ in range(self.n_arch)
-            ]
         except Exception as e:
             print(
                 " 'initialize_llm' Not Implemented, make sure if it's the intended behaviour"
             )
-            return [
-                LLMArchetype(llm, user_prompt, n_arch=self.n_arch)
-                for _ in range(self.n_arch)
-            ]
+        return [
+            LLMArchetype(
+                llm,
+                user_prompt,
+                n_arch=self.n_arch,
+                cache=self.cache,
+                sample_id=i,
+                memory_size=self.memory_size,
+                pack_size=self.pack_size,
+                response_schema=self.response_schema,
+                max_requeries=self.max_requeries,
+                telemetry=self.telemetry,
+            )
+            for i in range(self.n_arch)
+        ]
 
     def rule_based(self):
         raise NotImplementedError
 
 
 class LLMArchetype:
-    def __init__(self, llm, user_prompt, n_arch=1):
+    def __init__(
+        self,
+        llm,
+        user_prompt,
+        n_arch=1,
+        cache=None,
+        sample_id=0,
+        memory_size=64,
+        pack_size=None,
+        response_schema=None,
+        max_requeries=2,
+        telemetry=None,
+    ):
         self.n_arch = n_arch
+        self.memory_size = memory_size  # conversation turns kept per group
+        # questions per request in packing mode, None sends one request per group
+        self.pack_size = pack_size
+        # answers failing the schema are repaired locally or re-queried per group
+        self.response_schema = response_schema
+        self.max_requeries = max_requeries
+        self.telemetry = telemetry  # LLMTelemetry shared by the archetypes
         self.llm = llm
         # self.predictor = self.llm.initialize_llm()
         self.backend = llm.backend
         self.user_prompt = user_prompt
+        self.cache = cache
+        # archetypes sampled from the same prompt must not share cached answers
+        self.sample_id = sample_id
 
     def __call__(self, prompt_list, last_k):
-        last_k = 2 * last_k + 8
+        return prompt_archetypes([self], prompt_list, last_k)[0]
 
-        prompt_inputs = self.preprocess_prompts(prompt_list, last_k)
-        agent_outputs = self.llm.prompt(prompt_inputs)
+    def parse(self, output):
+        if self.response_schema is None:
+            return output
+        return self.response_schema(output)
 
-        # Save conversation history
-        for id, (prompt_input, agent_output) in enumerate(
-            zip(prompt_inputs, agent_outputs)
-        ):
-            self.save_memory(prompt_input, agent_output, agent_id=id)
+    def cache_key(self, prompt_input):
+        return self.cache.make_key(
+            self.backend,
+            getattr(self.llm, "model", None),
+            prompt_input["agent_query"],
+            prompt_input["chat_history"],
+            getattr(self.llm, "temperature", None),
+            self.sample_id,
+        )
+
+    def lookup(self, prompt_inputs):
+        r"""cached outputs (None where missing) and the indices that still need a query"""
+        if self.cache is None:
+            return [None] * len(prompt_inputs), list(range(len(prompt_inputs)))
 
-        return agent_outputs
+        keys = [self.cache_key(prompt_input) for prompt_input in prompt_inputs]
+        cached = self.cache.get_many(keys)
+        missing = [i for i, key in enumerate(keys) if key not in cached]
+        return [cached.get(key) for key in keys], missing
+
+    def record(self, prompt_inputs, agent_outputs, queried, agent_ids=None):
+        if self.cache is not None:
+            self.cache.set_many(
+                {
+                    self.cache_key(prompt_inputs[i]): agent_outputs[i]
+                    for i in queried
+                    if agent_outputs[i] is not None
+                }
+            )
+
+        # Save conversation history, failed queries come back as None
+        if agent_ids is None:
+            agent_ids = range(len(prompt_inputs))
+        for id, prompt_input, agent_output in zip(
+            agent_ids, prompt_inputs, agent_outputs
+        ):
+            if agent_output is not None:
+                self.save_memory(prompt_input, agent_output, agent_id=id)
 
     def initialize_memory(self, num_agents):
         self.num_agents = num_agents  # Number of agents
-        self.agent_memory = [
-            ConversationBufferMemory(memory_key="chat_history", return_messages=True)
-            for _ in range(num_agents)
-        ]
-        if self.backend == "dspy":
+        self.agent_memory = RingBufferMemory(num_agents, capacity=self.memory_size)
+        if self.backend in ("dspy", "openai", "local"):
             self.memory_handler = DSPYMemoryHandler(
                 agent_memory=self.agent_memory, llm=self.llm
             )
@@ -68,7 +149,9 @@ class LLMArchetype:
         else:
             raise ValueError(f"Invalid backend: {self.backend}")
 
-    def preprocess_prompts(self, prompt_list, last_k):
+    def preprocess_prompts(self, prompt_list, last_k, agent_ids=None):
+        if agent_ids is None:
+            agent_ids = range(len(prompt_list))
         prompt_inputs = [
             {
                 "agent_query": prompt,
@@ -76,7 +159,7 @@ class LLMArchetype:
                     "chat_history"
                 ],
             }
-            for agent_id, prompt in enumerate(prompt_list)
+            for agent_id, prompt in zip(agent_ids, prompt_list)
         ]
         return prompt_inputs
 
@@ -92,3 +175,136 @@ class LLMArchetype:
 
     def get_memory(self, last_k, agent_id):
         return self.memory_handler.get_memory(last_k=last_k, agent_id=agent_id)
+
+
+def prompt_archetypes(
+    archetypes, prompt_list, last_k, agent_ids=None, return_raw=False
+):
+    r"""
+    Query several archetypes with the same prompt list in one batch per backend
+    and regroup the outputs per archetype. Cache hits are served locally and
+    memory is still written per archetype. Archetypes with a `response_schema`
+    return parsed values, and only the groups whose answer fails to parse are
+    re-queried (up to `max_requeries` times). `agent_ids` maps the prompts to
+    memory slots when only some of the groups are queried. Every attempt is
+    reported to the archetypes' `telemetry`. With `return_raw` the answer texts
+    of the last attempt are returned as well.
+    """
+    last_k = 2 * last_k + 8
+
+    prompt_inputs = [
+        archetype.preprocess_prompts(prompt_list, last_k, agent_ids)
+        for archetype in archetypes
+    ]
+    agent_outputs, missing = [], []
+    for a, archetype in enumerate(archetypes):
+        outputs, archetype_missing = archetype.lookup(prompt_inputs[a])
+        agent_outputs.append(outputs)
+        missing.extend((a, i) for i in archetype_missing)
+
+    request_stats = {}
+
+    def query(llm, pack_size, slots):
+        inputs = [prompt_inputs[a][i] for a, i in slots]
+        start = time.perf_counter()
+        if pack_size is None:
+            outputs = llm.prompt(inputs)
+        else:
+            outputs = prompt_packed(
+                llm, inputs, pack_size, pack_groups=[a for a, _ in slots]
+            )
+        elapsed = time.perf_counter() - start
+        assert len(outputs) == len(slots), "LLM returned incomplete outputs"
+
+        # per request stats of the backend, else the batch wall time
+        stats = getattr(llm, "last_stats", None) if pack_size is None else None
+        if stats is None or len(stats) != len(slots):
+            stats = [None] * len(slots)
+        for (a, i), output, stat in zip(slots, outputs, stats):
+            agent_outputs[a][i] = output
+            request_stats[(a, i)] = stat if stat is not None else {"latency": elapsed}
+
+    def report(slots, attempt, cached):
+        pending = {}
+        for a, i in slots:
+            telemetry = archetypes[a].telemetry
+            if telemetry is None:
+                continue
+            stats = {} if cached else request_stats.get((a, i), {})
+            output = agent_outputs[a][i]
+            pending.setdefault(id(telemetry), (telemetry, []))[1].append(
+                {
+                    "archetype": a,
+                    "group": agent_ids[i] if agent_ids is not None else i,
+                    "attempt": attempt,
+                    "cached": cached,
+                    "latency": stats.get("latency"),
+                    "prompt_tokens": stats.get("prompt_tokens"),
+                    "completion_tokens": stats.get("completion_tokens"),
+                    "retries": stats.get("retries", 0),
+                    "failed": output is None,
+                    "parse_failed": output is not None and parsed_outputs[a][i] is None,
+                }
+            )
+        for telemetry, records in pending.values():
+            telemetry.record(records)
+
+    def query_all(slots):
+        pending = {}
+        for a, i in slots:
+            archetype = archetypes[a]
+            batch_key = (id(archetype.llm), archetype.pack_size)
+            pending.setdefault(batch_key, (archetype.llm, archetype.pack_size, []))[
+                2
+            ].append((a, i))
+
+        batches = list(pending.values())
+        if len(batches) == 1:
+            query(*batches[0])
+        elif len(batches) > 1:
+            with concurrent.futures.ThreadPoolExecutor(len(batches)) as executor:
+                list(executor.map(lambda batch: query(*batch), batches))
+
+    queried = [set() for _ in archetypes]
+    parsed_outputs = [list(outputs) for outputs in agent_outputs]
+    slots, attempt = missing, 0
+    cached_slots = sorted(
+        set((a, i) for a in range(len(archetypes)) for i in range(len(prompt_list)))
+        - set(missing)
+    )
+    while True:
+        query_all(slots)
+        for a, i in slots:
+            queried[a].add(i)
+        queried_slots = slots
+
+        # cache hits are validated as well, e.g. answers stored before a schema was set
+        slots = []
+        for a, archetype in enumerate(archetypes):
+            parsed_outputs[a] = [archetype.parse(output) for output in agent_outputs[a]]
+            if (
+                archetype.response_schema is not None
+                and attempt < archetype.max_requeries
+            ):
+                slots.extend(
+                    (a, i) for i, value in enumerate(parsed_outputs[a]) if value is None
+                )
+        if attempt == 0:
+            report(cached_slots, attempt, cached=True)
+        report(queried_slots, attempt, cached=False)
+        if len(slots) == 0:
+            break
+        print(f"Archetype: re-querying {len(slots)} invalid responses")
+        attempt += 1
+
+    for a, archetype in enumerate(archetypes):
+        # answers that stayed invalid are neither cached nor kept in memory
+        valid_outputs = [
+            output if value is not None else None
+            for output, value in zip(agent_outputs[a], parsed_outputs[a])
+        ]
+        archetype.record(prompt_inputs[a], valid_outputs, sorted(queried[a]), agent_ids)
+
+    if return_raw:
+        return parsed_outputs, agent_outputs
+    return parsed_outputs
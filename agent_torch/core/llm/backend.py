@@ -1,10 +1,18 @@
 import os
 import sys
+import asyncio
+import copy
+import random
+import threading
+import time
+from collections import OrderedDict, deque
 from langchain_openai import ChatOpenAI
 from langchain.chains import LLMChain
 import dspy
+import httpx
 import concurrent.futures
 import io
+import torch
 from langchain.prompts import (
     ChatPromptTemplate,
     HumanMessagePromptTemplate,
@@ -37,10 +45,11 @@ class DspyLLM(LLMBackend):
         self.backend = "dspy"
         self.openai_api_key = openai_api_key
         self.model = model
+        self.temperature = 0.0
 
     def initialize_llm(self):
         self.llm = dspy.OpenAI(
-            model=self.model, api_key=self.openai_api_key, temperature=0.0
+            model=self.model, api_key=self.openai_api_key, temperature=self.temperature
         )
         dspy.settings.configure(lm=self.llm)
         self.predictor = self.cot(self.qa)
@@ -96,7 +105,11 @@ class LangchainLLM(LLMBackend):
     ):
         super().__init__()
         self.backend = "langchain"
-        self.llm = ChatOpenAI(model=model, openai_api_key=openai_api_key, temperature=1)
+        self.model = model
+        self.temperature = 1
+        self.llm = ChatOpenAI(
+            model=model, openai_api_key=openai_api_key, temperature=self.temperature
+        )
         self.prompt_template = ChatPromptTemplate.from_messages(
             [
                 SystemMessagePromptTemplate.from_template(agent_profile),
@@ -144,3 +157,428 @@ class LangchainLLM(LLMBackend):
         raise NotImplementedError(
             "inspect_history method is not applicable for Langchain backend"
         )
+
+
+def chat_messages(prompt_input, system_prompt=None):
+    r"""chat completion messages for a prompt input with langchain chat history"""
+    if type(prompt_input) is str:
+        query, history = prompt_input, []
+    else:
+        query, history = prompt_input["agent_query"], prompt_input["chat_history"]
+
+    roles = {"human": "user", "ai": "assistant", "system": "system"}
+    messages = []
+    if system_prompt is not None:
+        messages.append({"role": "system", "content": system_prompt})
+    for message in history:
+        messages.append(
+            {
+                "role": roles.get(getattr(message, "type", "human"), "user"),
+                "content": getattr(message, "content", str(message)),
+            }
+        )
+    messages.append({"role": "user", "content": query})
+    return messages
+
+
+class TokenBucket:
+    r"""asyncio token bucket: `rate` requests per second with bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = None
+
+    async def acquire(self, tokens=1):
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated_at) * self.rate
+                )
+                self.updated_at = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+
+class AsyncOpenAILLM(LLMBackend):
+    r"""
+    Backend for OpenAI-style chat completion endpoints built on asyncio.
+
+    Requests share one persistent connection pool, at most `max_concurrency`
+    are in flight, and `requests_per_second` (if set) is enforced with a token
+    bucket. Each request is retried on its own with exponential backoff, and
+    requests that still fail are returned as None so the rest of the batch is kept.
+    Failures of the last call are available in `last_errors`.
+    """
+
+    RETRY_STATUS = (408, 409, 429, 500, 502, 503, 504)
+
+    def __init__(
+        self,
+        openai_api_key,
+        model="gpt-4o-mini",
+        agent_profile=None,
+        base_url="https://api.openai.com/v1",
+        temperature=0.0,
+        max_concurrency=16,
+        requests_per_second=None,
+        burst=None,
+        max_retries=5,
+        backoff_base=0.5,
+        backoff_max=30.0,
+        timeout=60.0,
+    ):
+        super().__init__()
+        self.backend = "openai"
+        self.openai_api_key = openai_api_key
+        self.model = model
+        self.agent_profile = agent_profile
+        self.base_url = base_url.rstrip("/")
+        self.temperature = temperature
+        self.max_concurrency = max_concurrency
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+
+        self.history = deque(maxlen=1000)
+        self.last_errors = {}
+        self.loop = None
+        self.client = None
+
+    def initialize_llm(self):
+        if self.loop is not None:
+            return self
+        # the connection pool is bound to one event loop, which lives in its own thread
+        self.loop = asyncio.new_event_loop()
+        self.loop_thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.loop_thread.start()
+        asyncio.run_coroutine_threadsafe(self._open(), self.loop).result()
+        return self
+
+    async def _open(self):
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={"Authorization": f"Bearer {self.openai_api_key}"},
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency,
+            ),
+        )
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.rate_limiter = None
+        if self.requests_per_second is not None:
+            self.rate_limiter = TokenBucket(self.requests_per_second, self.burst)
+
+    def close(self):
+        if self.loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.client.aclose(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.loop_thread.join()
+        self.loop.close()
+        self.loop = None
+        self.client = None
+
+    def prompt(self, prompt_list):
+        self.initialize_llm()
+        return asyncio.run_coroutine_threadsafe(
+            self._prompt(prompt_list), self.loop
+        ).result()
+
+    async def aprompt(self, prompt_list):
+        r"""awaitable version of `prompt`, usable from any event loop"""
+        self.initialize_llm()
+        return await asyncio.wrap_future(
+            asyncio.run_coroutine_threadsafe(self._prompt(prompt_list), self.loop)
+        )
+
+    async def _prompt(self, prompt_list):
+        results = await asyncio.gather(
+            *[self._query(prompt_input) for prompt_input in prompt_list],
+            return_exceptions=True,
+        )
+        self.last_errors = {
+            i: result
+            for i, result in enumerate(results)
+            if isinstance(result, Exception)
+        }
+        # latency, token usage and retries per request, for LLMTelemetry
+        self.last_stats = [
+            None if isinstance(result, Exception) else result[1] for result in results
+        ]
+        return [
+            None if isinstance(result, Exception) else result[0] for result in results
+        ]
+
+    def to_messages(self, prompt_input):
+        return chat_messages(prompt_input, self.agent_profile)
+
+    async def _query(self, prompt_input):
+        payload = {
+            "model": self.model,
+            "messages": self.to_messages(prompt_input),
+            "temperature": self.temperature,
+        }
+        start = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self.semaphore:
+                    if self.rate_limiter is not None:
+                        await self.rate_limiter.acquire()
+                    response = await self.client.post("/chat/completions", json=payload)
+                if response.status_code in self.RETRY_STATUS:
+                    raise httpx.HTTPStatusError(
+                        f"retryable status {response.status_code}",
+                        request=response.request,
+                        response=response,
+                    )
+                response.raise_for_status()
+                body = response.json()
+                answer = body["choices"][0]["message"]["content"]
+                self.history.append((payload["messages"], answer))
+                usage = body.get("usage") or {}
+                return answer, {
+                    "latency": time.perf_counter() - start,
+                    "prompt_tokens": usage.get("prompt_tokens"),
+                    "completion_tokens": usage.get("completion_tokens"),
+                    "retries": attempt,
+                }
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                retryable = not isinstance(e, httpx.HTTPStatusError) or (
+                    e.response.status_code in self.RETRY_STATUS
+                )
+                if not retryable or attempt == self.max_retries:
+                    raise
+                delay = min(self.backoff_max, self.backoff_base * 2**attempt)
+                await asyncio.sleep(delay * (0.5 + random.random() / 2))
+
+    def inspect_history(self, last_k, file_dir):
+        if file_dir is None:
+            return
+        with open(os.path.join(file_dir, "inspect_history.md"), "w") as f:
+            for messages, answer in list(self.history)[-last_k:]:
+                for message in messages:
+                    f.write(f"{message['role']}: {message['content']}\n\n")
+                f.write(f"answer: {answer}\n\n---\n\n")
+
+
+class LocalCausalLM(LLMBackend):
+    r"""
+    Runs a causal LM stored in a local directory (huggingface `transformers`
+    format) in-process, without network access.
+
+    The prompts of a call are sorted by length and generated in left padded
+    batches of `batch_size`. The token prefix shared by all prompts of a call
+    (system prompt and chat template header) is encoded once, and its key/value
+    cache is reused by every batch and by later calls with the same prefix.
+    Decoding is greedy for `temperature=0`. Answers are returned as stripped
+    strings, like the other backends.
+    """
+
+    def __init__(
+        self,
+        model_path,
+        agent_profile=None,
+        max_new_tokens=32,
+        batch_size=16,
+        temperature=0.0,
+        num_threads=None,
+        max_cached_prefixes=8,
+    ):
+        super().__init__()
+        self.backend = "local"
+        self.model_path = model_path
+        self.model = os.path.basename(os.path.normpath(model_path))
+        self.agent_profile = agent_profile
+        self.max_new_tokens = max_new_tokens
+        self.batch_size = batch_size
+        self.temperature = temperature
+        self.num_threads = num_threads
+        self.max_cached_prefixes = max_cached_prefixes
+
+        self.history = deque(maxlen=1000)
+        self.prefix_cache = OrderedDict()
+        self.tokenizer = None
+        self.llm = None
+        # one generation at a time, concurrent archetype batches are serialized
+        self.lock = threading.Lock()
+
+    def load_model(self):
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
+        tokenizer = AutoTokenizer.from_pretrained(
+            self.model_path, local_files_only=True
+        )
+        model = AutoModelForCausalLM.from_pretrained(
+            self.model_path, local_files_only=True
+        )
+        return tokenizer, model
+
+    def initialize_llm(self):
+        if self.llm is not None:
+            return self
+        if self.num_threads is not None:
+            torch.set_num_threads(self.num_threads)
+        self.tokenizer, self.llm = self.load_model()
+        self.llm.eval()
+        if self.tokenizer.pad_token_id is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        return self
+
+    def to_text(self, prompt_input):
+        messages = chat_messages(prompt_input, self.agent_profile)
+        if getattr(self.tokenizer, "chat_template", None):
+            return self.tokenizer.apply_chat_template(
+                messages, tokenize=False, add_generation_prompt=True
+            )
+        lines = [f"{message['role']}: {message['content']}" for message in messages]
+        return "\n".join(lines) + "\nassistant:"
+
+    def encode(self, text):
+        add_special_tokens = not getattr(self.tokenizer, "chat_template", None)
+        return self.tokenizer(text, add_special_tokens=add_special_tokens)["input_ids"]
+
+    def prompt(self, prompt_list):
+        self.initialize_llm()
+        if len(prompt_list) == 0:
+            return []
+        texts = [self.to_text(prompt_input) for prompt_input in prompt_list]
+        token_ids = [self.encode(text) for text in texts]
+
+        # every prompt keeps at least one token after the shared prefix
+        prefix_length = min(len(ids) for ids in token_ids) - 1
+        for i in range(prefix_length):
+            if any(ids[i] != token_ids[0][i] for ids in token_ids):
+                prefix_length = i
+                break
+        prefix = token_ids[0][:prefix_length]
+
+        order = sorted(range(len(token_ids)), key=lambda i: len(token_ids[i]))
+        outputs = [None] * len(token_ids)
+        stats = [None] * len(token_ids)
+        with self.lock, torch.no_grad():
+            prefix_kv = self.get_prefix_cache(prefix)
+            for start in range(0, len(order), self.batch_size):
+                batch = order[start : start + self.batch_size]
+                batch_start = time.perf_counter()
+                answers, lengths = self.generate(
+                    prefix, prefix_kv, [token_ids[i][prefix_length:] for i in batch]
+                )
+                latency = time.perf_counter() - batch_start
+                for i, answer, length in zip(batch, answers, lengths):
+                    outputs[i] = answer
+                    stats[i] = {
+                        "latency": latency,
+                        "prompt_tokens": len(token_ids[i]),
+                        "completion_tokens": length,
+                        "retries": 0,
+                    }
+        self.last_stats = stats
+
+        self.history.extend(zip(texts, outputs))
+        return outputs
+
+    def get_prefix_cache(self, prefix):
+        key = tuple(prefix)
+        if len(prefix) == 0:
+            return None
+        if key in self.prefix_cache:
+            self.prefix_cache.move_to_end(key)
+            return self.prefix_cache[key]
+
+        output = self.llm(input_ids=torch.tensor([prefix]), use_cache=True)
+        self.prefix_cache[key] = output.past_key_values
+        if len(self.prefix_cache) > self.max_cached_prefixes:
+            self.prefix_cache.popitem(last=False)
+        return output.past_key_values
+
+    @staticmethod
+    def repeat_cache(past_key_values, batch_size):
+        r"""copy of a batch 1 key/value cache for `batch_size` sequences"""
+        if past_key_values is None:
+            return None
+        if isinstance(past_key_values, (tuple, list)):
+            return tuple(
+                tuple(t.expand(batch_size, *t.shape[1:]).contiguous() for t in layer)
+                for layer in past_key_values
+            )
+        past_key_values = copy.deepcopy(past_key_values)
+        past_key_values.batch_repeat_interleave(batch_size)
+        return past_key_values
+
+    def next_tokens(self, logits):
+        if self.temperature is None or self.temperature <= 0:
+            return logits.argmax(-1)
+        probabilities = torch.softmax(logits / self.temperature, dim=-1)
+        return torch.multinomial(probabilities, 1).view(-1)
+
+    def generate(self, prefix, prefix_kv, suffixes):
+        batch_size, length = len(suffixes), max(len(ids) for ids in suffixes)
+        pad_id, eos_id = self.tokenizer.pad_token_id, self.tokenizer.eos_token_id
+
+        # left padding sits between the shared prefix and each prompt, it is
+        # masked out and skipped by the position ids
+        input_ids = torch.full((batch_size, length), pad_id, dtype=torch.long)
+        suffix_mask = torch.zeros((batch_size, length), dtype=torch.long)
+        for row, ids in enumerate(suffixes):
+            input_ids[row, length - len(ids) :] = torch.tensor(ids)
+            suffix_mask[row, length - len(ids) :] = 1
+        attention_mask = torch.cat(
+            [torch.ones((batch_size, len(prefix)), dtype=torch.long), suffix_mask], 1
+        )
+        position_ids = (attention_mask.cumsum(-1) - 1).clamp(min=0)[:, len(prefix) :]
+
+        output = self.llm(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            position_ids=position_ids,
+            past_key_values=self.repeat_cache(prefix_kv, batch_size),
+            use_cache=True,
+        )
+        generated = []
+        finished = torch.zeros(batch_size, dtype=torch.bool)
+        for _ in range(self.max_new_tokens):
+            tokens = self.next_tokens(output.logits[:, -1, :])
+            tokens = torch.where(finished, torch.full_like(tokens, pad_id), tokens)
+            generated.append(tokens)
+            finished = finished | (tokens == eos_id)
+            if bool(finished.all()):
+                break
+            attention_mask = torch.cat(
+                [attention_mask, torch.ones((batch_size, 1), dtype=torch.long)], 1
+            )
+            position_ids = position_ids[:, -1:] + 1
+            output = self.llm(
+                input_ids=tokens.view(-1, 1),
+                attention_mask=attention_mask,
+                position_ids=position_ids,
+                past_key_values=output.past_key_values,
+                use_cache=True,
+            )
+
+        answers, lengths = [], []
+        generated = torch.stack(generated, 1).tolist()
+        for row in generated:
+            if eos_id in row:
+                row = row[: row.index(eos_id)]
+            answers.append(self.tokenizer.decode(row, skip_special_tokens=True).strip())
+            lengths.append(len(row))
+        return answers, lengths
+
+    def inspect_history(self, last_k, file_dir):
+        if file_dir is None:
+            return
+        with open(os.path.join(file_dir, "inspect_history.md"), "w") as f:
+            for text, answer in list(self.history)[-last_k:]:
+                f.write(f"{text}\n\nanswer: {answer}\n\n---\n\n")
@@ -1,86 +1,288 @@
-from agent_torch.core.llm.archetype import Archetype
+from agent_torch.core.llm.archetype import Archetype, prompt_archetypes
 from agent_torch.core.llm.backend import DspyLLM
 from agent_torch.core.llm.prompt_manager import PromptManager
+from agent_torch.core.llm.conversation_log import ConversationLog
+from agent_torch.core.llm.parsing import NumberSchema
+from agent_torch.core.llm.reuse import DecisionReuse
 from agent_torch.core.dataloader import LoadPopulation
+import concurrent.futures
 import torch
 
 
 class Behavior:
-    def __init__(self, archetype, region):
+    def __init__(
+        self,
+        archetype,
+        region,
+        conversation_log=None,
+        reuse_tolerance=None,
+        surrogate=None,
+        grouping=None,
+    ):
         self.archetype = archetype
-        self.population = LoadPopulation(region)
+        # path or ConversationLog: turns are appended in the background instead of
+        # rewriting the markdown memory export every step
+        self.owns_conversation_log = isinstance(conversation_log, str)
+        if self.owns_conversation_log:
+            conversation_log = ConversationLog(conversation_log)
+        self.conversation_log = conversation_log
+        self.num_steps = 0
+        # groups whose prompt inputs did not change (or moved less than the relative
+        # tolerance) keep their previous answers, None queries every group every step
+        self.decision_reuse = (
+            DecisionReuse(rtol=reuse_tolerance) if reuse_tolerance is not None else None
+        )
+        self.sampled_behavior = None
+        # BehaviorSurrogate: logs every LLM answer and, once fitted, serves the
+        # groups it is confident about
+        self.surrogate = surrogate
+        # (prompt inputs, future) of a decision started ahead of time by `prefetch`
+        self.prefetched = None
+        self.prefetch_executor = None
+        # a population module, or a LoadPopulation shared with the executor
+        if isinstance(region, LoadPopulation):
+            self.population = region
+        else:
+            self.population = LoadPopulation(region)
         self.prompt_manager = PromptManager(
-            self.archetype[-1].user_prompt, self.population
+            self.archetype[-1].user_prompt, self.population, grouping=grouping
         )
-        [
+        if self.prompt_manager.calls_saved_per_step > 0:
+            print(
+                f"Behavior: skipping {self.prompt_manager.calls_saved_per_step} empty "
+                f"groups, {self.prompt_manager.calls_saved_per_step * len(self.archetype)} "
+                "LLM calls saved per step"
+            )
+        for archetype in self.archetype:
             archetype.initialize_memory(num_agents=self.prompt_manager.distinct_groups)
-            for archetype in self.archetype
-        ]
+            # sampled behavior is a number per group, malformed answers are
+            # repaired or re-queried per group instead of retrying the whole batch
+            if archetype.response_schema is None:
+                archetype.response_schema = NumberSchema()
 
-    def sample(self, kwargs=None):
-        print("Behavior: Decision")
+    def close(self):
+        r"""
+        Wait for a running prefetch and close the conversation log this behavior
+        opened (a log that was passed in is only flushed).
+        """
+        if self.prefetch_executor is not None:
+            self.prefetch_executor.shutdown(wait=True)
+            self.prefetch_executor = None
+            self.prefetched = None
+        if self.conversation_log is not None:
+            if self.owns_conversation_log:
+                self.conversation_log.close()
+            else:
+                self.conversation_log.flush()
+
+    def __del__(self):
+        if getattr(self, "owns_conversation_log", False):
+            self.conversation_log.close()
 
-        # tensor to store the sampled behavior for each agent
-        sampled_behavior = torch.zeros(self.population.population_size, 1).to(
-            kwargs["device"]
+    def prefetch_key(self, kwargs):
+        r"""the runtime prompt inputs, population attributes are fixed"""
+        return tuple(
+            (
+                key,
+                (
+                    kwargs.get(key)
+                    if isinstance(kwargs.get(key), (int, str, float, bool))
+                    else None
+                ),
+            )
+            for key in self.prompt_manager.variables
+            if not hasattr(self.population, key)
         )
 
+    def prefetch(self, kwargs):
+        r"""
+        Start sampling the decision for `kwargs` in the background. The next call
+        to `sample` with the same prompt inputs waits for it instead of querying
+        the LLM again. One decision is prefetched at a time, while one is still
+        running further prefetches are skipped instead of waiting for it.
+        """
+        if self.prefetched is not None and not self.prefetched[1].done():
+            return self.prefetched[1]
+        if self.prefetch_executor is None:
+            self.prefetch_executor = concurrent.futures.ThreadPoolExecutor(1)
+        future = self.prefetch_executor.submit(self._sample, dict(kwargs))
+        self.prefetched = (self.prefetch_key(kwargs), future)
+        return future
+
+    def sample(self, kwargs=None):
+        if self.prefetched is not None:
+            key, future = self.prefetched
+            self.prefetched = None
+            if key == self.prefetch_key(kwargs):
+                print("Behavior: using prefetched decision")
+                return future.result().to(kwargs["device"])
+            # the inputs changed after the prefetch, its answers are already in
+            # memory, so wait for it before querying again
+            future.result()
+        return self._sample(kwargs)
+
+    def _sample(self, kwargs):
+        print("Behavior: Decision")
+        telemetries = {
+            id(archetype.telemetry): archetype.telemetry
+            for archetype in self.archetype
+            if archetype.telemetry is not None
+        }
+        for telemetry in telemetries.values():
+            telemetry.set_tags(
+                step=kwargs.get("step", self.num_steps), substep=kwargs.get("substep")
+            )
         # Get list of prompts for each group
         prompt_list = self.prompt_manager.get_prompt_list(kwargs=kwargs)
-        masks = self.get_masks_for_each_group(
+        group_ids = self.prompt_manager.get_group_ids(
             self.prompt_manager.dict_variables_with_values
         )
-        agent_outputs = []
-        for num_retries in range(10):
-            try:
-                # last_k : Number of previous conversations to add in history
-                for n_arch in range(self.archetype[-1].n_arch):
-                    agent_outputs.append(self.archetype[n_arch](prompt_list, last_k=12))
-                break
-
-            except Exception as e:
-                print(f"Error in sampling behavior: {e}")
-                print("Retrying")
-                continue
+        archetypes = self.archetype[: self.archetype[-1].n_arch]
+
+        queried_groups = list(range(len(prompt_list)))
+        if self.decision_reuse is not None:
+            queried_groups = self.decision_reuse.stale_groups(
+                self.prompt_manager.group_variables
+            )
+            num_reused = len(prompt_list) - len(queried_groups)
+            if num_reused > 0:
+                print(f"Behavior: reusing decisions of {num_reused} unchanged groups")
+            # group membership is fixed for pruned populations, so the tensor holds
+            if (
+                len(queried_groups) == 0
+                and self.sampled_behavior is not None
+                and self.prompt_manager.group_ids is not None
+                and self.prompt_manager.grouping is None
+            ):
+                self.num_steps += 1
+                return self.sampled_behavior
+
+        group_variables = self.prompt_manager.group_variables
+        llm_groups, surrogate_values = queried_groups, {}
+        if self.surrogate is not None and self.surrogate.models is not None:
+            if len(queried_groups) > 0:
+                values, _, confident = self.surrogate.predict(
+                    [group_variables[group] for group in queried_groups]
+                )
+                surrogate_values = {
+                    group: float(value)
+                    for group, value, use in zip(queried_groups, values, confident)
+                    if use
+                }
+                llm_groups = [g for g in queried_groups if g not in surrogate_values]
+                print(
+                    f"Behavior: surrogate answered {len(surrogate_values)} groups, "
+                    f"{len(llm_groups)} sent to the LLM"
+                )
+
+        agent_outputs, raw_outputs = [], []
+        if len(llm_groups) > 0:
+            for num_retries in range(10):
+                try:
+                    # all archetypes are submitted as one batch
+                    # last_k : Number of previous conversations to add in history
+                    agent_outputs, raw_outputs = prompt_archetypes(
+                        archetypes,
+                        [prompt_list[group] for group in llm_groups],
+                        last_k=12,
+                        agent_ids=llm_groups,
+                        return_raw=True,
+                    )
+                    break
+
+                except Exception as e:
+                    print(f"Error in sampling behavior: {e}")
+                    print("Retrying")
+                    continue
+
+        llm_outputs = agent_outputs
+        if self.surrogate is not None:
+            self.surrogate.record(
+                [group_variables[group] for group in llm_groups],
+                self.mean_outputs(llm_outputs, len(llm_groups)),
+            )
+        if len(surrogate_values) > 0:
+            # surrogate answers stand in for every archetype of their group
+            if len(llm_outputs) == 0:
+                llm_outputs = [[None] * len(llm_groups) for _ in archetypes]
+            agent_outputs = []
+            for llm_output in llm_outputs:
+                answers = dict(surrogate_values)
+                answers.update(zip(llm_groups, llm_output))
+                agent_outputs.append([answers[group] for group in queried_groups])
+
+        group_outputs = agent_outputs
+        if self.decision_reuse is not None:
+            self.decision_reuse.update(queried_groups, group_variables, agent_outputs)
+            group_outputs = self.decision_reuse.get_outputs(
+                len(prompt_list), len(archetypes)
+            )
 
         sampled_behavior = self.get_sampled_behavior(
-            sampled_behavior, masks, agent_outputs
+            group_ids.to(kwargs["device"]), group_outputs, len(prompt_list)
         )
+        self.sampled_behavior = sampled_behavior
 
-        # Save current step's conversation history to file
-        # file_dir : Path to export current step's conversation history
-        self.archetype[-1].export_memory_to_file(
-            file_dir=kwargs["current_memory_dir"], last_k=len(prompt_list)
-        )
+        if self.conversation_log is not None:
+            self.log_conversations(
+                kwargs.get("step", self.num_steps),
+                prompt_list,
+                raw_outputs,
+                groups=llm_groups,
+            )
+        elif kwargs.get("current_memory_dir") is not None:
+            # Save current step's conversation history to file
+            # file_dir : Path to export current step's conversation history
+            self.archetype[-1].export_memory_to_file(
+                file_dir=kwargs["current_memory_dir"], last_k=len(prompt_list)
+            )
+        self.num_steps += 1
 
         return sampled_behavior
 
-    def get_sampled_behavior(self, sampled_behavior, masks, agent_outputs):
+    def log_conversations(self, step, prompt_list, agent_outputs, groups=None):
+        r"""agent_outputs[archetype][i] is the answer text to the prompt of group groups[i]"""
+        if groups is None:
+            groups = range(len(prompt_list))
+        combinations = self.prompt_manager.combinations_of_prompt_variables
+        self.conversation_log.append(
+            {
+                "step": step,
+                "group": group,
+                "archetype": n_arch,
+                "variables": combinations[group],
+                "query": prompt_list[group],
+                "answer": output,
+            }
+            for n_arch, agent_output in enumerate(agent_outputs)
+            for group, output in zip(groups, agent_output)
+        )
+
+    @staticmethod
+    def mean_outputs(agent_outputs, num_groups):
+        r"""per group mean over the archetypes that answered, None if none did"""
+        means = []
+        for group in range(num_groups):
+            values = [
+                float(agent_output[group])
+                for agent_output in agent_outputs
+                if agent_output[group] is not None
+            ]
+            means.append(sum(values) / len(values) if len(values) > 0 else None)
+        return means
+
+    @staticmethod
+    def get_sampled_behavior(group_ids, agent_outputs, num_groups):
+        # average each group over the archetypes that answered (failed queries are None)
+        group_values = torch.zeros(num_groups + 1, device=group_ids.device)
+        group_counts = torch.zeros(num_groups + 1, device=group_ids.device)
         for agent_output in agent_outputs:
             for en, output_value in enumerate(agent_output):
-                value_for_group = float(output_value)
-                sampled_behavior_for_group = masks[en] * value_for_group
-                sampled_behavior = torch.add(
-                    sampled_behavior, sampled_behavior_for_group
-                )
-        n = len(agent_outputs)
-        average_sampled_behavior = sampled_behavior / n
-        return average_sampled_behavior
-
-    def get_masks_for_each_group(self, variables):
-        masks = []
-        for en, target_values in enumerate(
-            self.prompt_manager.combinations_of_prompt_variables_with_index
-        ):
-            mask = torch.tensor([True] * self.population.population_size)
-            for key, value in target_values.items():
-                if key in variables:
-                    if key == "age" and value == 0:
-                        mask = torch.zeros_like(mask)
-                    else:
-                        mask = torch.logical_and(mask, variables[key] == value)
-            mask = mask.unsqueeze(1)
-            float_mask = mask.float()
-            masks.append(float_mask)
-
-        return masks
+                if output_value is None:
+                    continue
+                group_values[en] += float(output_value)
+                group_counts[en] += 1
+        group_values = group_values / torch.clamp(group_counts, min=1)
+
+        # agents outside every group (id -1) read the trailing zero entry
+        return group_values[group_ids].unsqueeze(1)
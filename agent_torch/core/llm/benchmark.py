@@ -0,0 +1,241 @@
+import argparse
+import math
+import os
+import random
+import tempfile
+import time
+
+from agent_torch.core.llm.archetype import Archetype
+from agent_torch.core.llm.backend import LLMBackend
+from agent_torch.core.llm.behavior import Behavior
+
+
+def constant_latency(seconds):
+    return lambda rng: seconds
+
+
+def lognormal_latency(median, sigma=0.5):
+    r"""request latencies with the given median and a long right tail"""
+    return lambda rng: rng.lognormvariate(math.log(median), sigma)
+
+
+class SimulatedLLM(LLMBackend):
+    r"""
+    Mock backend for benchmarks. Every request takes a latency drawn from
+    `latency(rng)`, and a batch takes as long as its requests would when at
+    most `max_concurrency` are in flight. A fraction `failure_rate` of the
+    requests fails (None, like `AsyncOpenAILLM`). A fraction `malformed_rate`
+    answers with text the response schema can not parse, the rest answer with
+    a random probability.
+    """
+
+    MALFORMED_ANSWER = "It depends on a lot of things."
+
+    def __init__(
+        self,
+        latency=None,
+        failure_rate=0.0,
+        malformed_rate=0.0,
+        max_concurrency=16,
+        seed=0,
+    ):
+        super().__init__()
+        self.backend = "openai"
+        self.model = "simulated"
+        self.temperature = 0.0
+        self.latency = latency if latency is not None else constant_latency(0.0)
+        self.failure_rate = failure_rate
+        self.malformed_rate = malformed_rate
+        self.max_concurrency = max_concurrency
+        self.rng = random.Random(seed)
+        self.reset()
+
+    def reset(self):
+        self.num_requests = 0
+        self.num_batches = 0
+        self.simulated_time = 0.0
+
+    def initialize_llm(self):
+        return self
+
+    def batch_time(self, latencies):
+        # greedy schedule on `max_concurrency` connections
+        slots = [0.0] * min(self.max_concurrency, max(len(latencies), 1))
+        for latency in latencies:
+            slots[slots.index(min(slots))] += latency
+        return max(slots)
+
+    def answer(self):
+        draw = self.rng.random()
+        if draw < self.failure_rate:
+            return None
+        if draw < self.failure_rate + self.malformed_rate:
+            return self.MALFORMED_ANSWER
+        return f"{self.rng.random():.2f}"
+
+    def prompt(self, prompt_list):
+        latencies = [self.latency(self.rng) for _ in prompt_list]
+        duration = self.batch_time(latencies) if len(latencies) > 0 else 0.0
+        time.sleep(duration)
+
+        self.num_requests += len(prompt_list)
+        self.num_batches += 1
+        self.simulated_time += duration
+        return [self.answer() for _ in prompt_list]
+
+    def inspect_history(self, last_k, file_dir):
+        pass
+
+
+class MemoryTimer:
+    r"""
+    wall time spent reading, writing and exporting the archetypes' conversation
+    memory
+    """
+
+    def __init__(self, archetypes):
+        self.seconds = 0.0
+        for archetype in archetypes:
+            archetype.get_memory = self.timed(archetype.get_memory)
+            archetype.save_memory = self.timed(archetype.save_memory)
+            archetype.export_memory_to_file = self.timed(
+                archetype.export_memory_to_file
+            )
+
+    def timed(self, method):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.seconds += time.perf_counter() - start
+
+        return wrapper
+
+
+def benchmark_behavior(
+    region,
+    prompts=("{gender}", "{gender} {ethnicity}"),
+    archetype_counts=(1, 3),
+    num_steps=3,
+    make_llm=None,
+    kwargs=None,
+):
+    r"""
+    Runs `Behavior.sample` for every combination of prompt template (which sets
+    the number of groups) and archetype count. Returns one row per combination:
+    mean step latency, LLM requests per step, retry amplification (requests
+    per group and archetype) and the share of step time spent in memory.
+    """
+    if make_llm is None:
+        make_llm = lambda: SimulatedLLM()
+
+    rows = []
+    for prompt in prompts:
+        for n_arch in archetype_counts:
+            llm = make_llm()
+            archetypes = Archetype(n_arch=n_arch).llm(llm, prompt)
+            behavior = Behavior(archetypes, region)
+            timer = MemoryTimer(archetypes)
+
+            step_kwargs = {"device": "cpu", **(kwargs or {})}
+            step_times = []
+            with tempfile.TemporaryDirectory() as memory_dir:
+                for step in range(num_steps):
+                    step_kwargs["current_memory_dir"] = os.path.join(
+                        memory_dir, str(step)
+                    )
+                    start = time.perf_counter()
+                    behavior.sample(step_kwargs)
+                    step_times.append(time.perf_counter() - start)
+
+            num_groups = behavior.prompt_manager.distinct_groups
+            requests_per_step = llm.num_requests / num_steps
+            rows.append(
+                {
+                    "prompt": prompt,
+                    "groups": num_groups,
+                    "archetypes": n_arch,
+                    "step_latency": sum(step_times) / num_steps,
+                    "requests_per_step": requests_per_step,
+                    "batches_per_step": llm.num_batches / num_steps,
+                    "retry_amplification": requests_per_step
+                    / max(num_groups * n_arch, 1),
+                    "memory_overhead": timer.seconds / max(sum(step_times), 1e-9),
+                }
+            )
+    return rows
+
+
+def benchmark_env(model, population, archetypes, num_steps=1):
+    r"""
+    Startup and step time of `envs.create` for a model whose behavior
+    substeps use the given archetypes ({substep name: archetype list}).
+    """
+    from agent_torch.core.environment import envs
+
+    start = time.perf_counter()
+    runner = envs.create(model=model, population=population, archetypes=archetypes)
+    create_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    runner.step(num_steps)
+    step_time = (time.perf_counter() - start) / num_steps
+
+    llms = {id(a[0].llm): a[0].llm for a in archetypes.values()}
+    num_requests = sum(getattr(llm, "num_requests", 0) for llm in llms.values())
+    return {
+        "create_time": create_time,
+        "step_latency": step_time,
+        "requests_per_step": num_requests / num_steps,
+    }
+
+
+def format_results(rows):
+    if len(rows) == 0:
+        return ""
+    columns = list(rows[0].keys())
+    cells = [
+        [f"{row[c]:.4f}" if isinstance(row[c], float) else str(row[c]) for c in columns]
+        for row in rows
+    ]
+    widths = [
+        max(len(column), *(len(cell[i]) for cell in cells))
+        for i, column in enumerate(columns)
+    ]
+    lines = ["  ".join(c.ljust(w) for c, w in zip(columns, widths))]
+    lines += ["  ".join(c.ljust(w) for c, w in zip(cell, widths)) for cell in cells]
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="benchmark the behavior pipeline")
+    parser.add_argument("--population", default="sample")
+    parser.add_argument(
+        "--prompts", nargs="+", default=["{gender}", "{gender} {ethnicity}"]
+    )
+    parser.add_argument("--archetypes", nargs="+", type=int, default=[1, 3])
+    parser.add_argument("--steps", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.05, help="median seconds")
+    parser.add_argument("--sigma", type=float, default=0.5)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    import importlib
+
+    region = importlib.import_module(f"agent_torch.populations.{args.population}")
+    rows = benchmark_behavior(
+        region,
+        prompts=args.prompts,
+        archetype_counts=args.archetypes,
+        num_steps=args.steps,
+        make_llm=lambda: SimulatedLLM(
+            latency=lognormal_latency(args.latency, args.sigma),
+            failure_rate=args.failure_rate,
+            malformed_rate=args.malformed_rate,
+            max_concurrency=args.concurrency,
+        ),
+    )
+    print(format_results(rows))
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+
+
+def serialize_history(history):
+    r"""chat history (langchain messages, dicts or strings) as a list of plain strings"""
+    serialized = []
+    for message in history or []:
+        if isinstance(message, dict):
+            serialized.append(f"{message.get('type')}:{message.get('content')}")
+        else:
+            serialized.append(
+                f"{getattr(message, 'type', None)}:{getattr(message, 'content', message)}"
+            )
+    return serialized
+
+
+def history_hash(history):
+    return hashlib.sha256(
+        json.dumps(serialize_history(history)).encode("utf-8")
+    ).hexdigest()
+
+
+class LLMCache(ABC):
+    r"""
+    Cache for LLM responses keyed by (backend, model, prompt, history hash,
+    temperature, sample id). Values must be json serializable.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(backend, model, prompt, history, temperature, sample_id=0):
+        key = json.dumps(
+            [backend, model, prompt, history_hash(history), temperature, sample_id]
+        )
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    @abstractmethod
+    def get_many(self, keys):
+        r"""returns {key: value} for the keys present in the cache"""
+        pass
+
+    @abstractmethod
+    def set_many(self, items):
+        pass
+
+    @abstractmethod
+    def clear(self):
+        pass
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def record(self, hits, misses):
+        self.hits += hits
+        self.misses += misses
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+class SQLiteLLMCache(LLMCache):
+    r"""
+    Disk-backed LLM response cache. A single sqlite file can be shared by
+    several processes (e.g. parallel calibration workers). Entries older than
+    `ttl` seconds are dropped on read, and the least recently used entries are
+    evicted once the cache grows past `max_entries`.
+    """
+
+    def __init__(self, path, max_entries=100000, ttl=None):
+        super().__init__()
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock = threading.Lock()
+
+        cache_dir = os.path.dirname(os.path.abspath(path))
+        os.makedirs(cache_dir, exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        with self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT, created_at REAL, accessed_at REAL)"
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed_at "
+                "ON responses (accessed_at)"
+            )
+
+    def get_many(self, keys):
+        keys = list(keys)
+        if len(keys) == 0:
+            return {}
+
+        now = time.time()
+        found = {}
+        with self.lock, self.connection:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start : start + 500]
+                rows = self.connection.execute(
+                    "SELECT key, value, created_at FROM responses "
+                    f"WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                for key, value, created_at in rows:
+                    found[key] = (value, created_at)
+
+            expired = [
+                key
+                for key, (_, created_at) in found.items()
+                if self.ttl is not None and now - created_at > self.ttl
+            ]
+            if expired:
+                self.connection.executemany(
+                    "DELETE FROM responses WHERE key = ?", [(key,) for key in expired]
+                )
+            hits = {
+                key: json.loads(value)
+                for key, (value, _) in found.items()
+                if key not in expired
+            }
+            self.connection.executemany(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                [(now, key) for key in hits],
+            )
+
+        self.record(len(hits), len(keys) - len(hits))
+        return hits
+
+    def set_many(self, items):
+        if len(items) == 0:
+            return
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                [(key, json.dumps(value), now, now) for key, value in items.items()],
+            )
+            self.evict()
+
+    def evict(self):
+        (num_entries,) = self.connection.execute(
+            "SELECT COUNT(*) FROM responses"
+        ).fetchone()
+        if num_entries > self.max_entries:
+            self.connection.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed_at ASC LIMIT ?)",
+                (num_entries - self.max_entries,),
+            )
+
+    def clear(self):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM responses")
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[
+                0
+            ]
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,138 @@
+import torch
+
+
+def nearest_centroids(x, centroids, chunk_size=65536):
+    r"""index of and squared distance to the nearest centroid of every row of x"""
+    ids = torch.empty(x.shape[0], dtype=torch.long, device=x.device)
+    distances = torch.empty(x.shape[0], dtype=x.dtype, device=x.device)
+    for start in range(0, x.shape[0], chunk_size):
+        chunk = x[start : start + chunk_size]
+        chunk_distances, chunk_ids = torch.cdist(chunk, centroids).pow(2).min(1)
+        distances[start : start + chunk_size] = chunk_distances
+        ids[start : start + chunk_size] = chunk_ids
+    return ids, distances
+
+
+def minibatch_kmeans(
+    x, num_clusters, init=None, batch_size=4096, num_iterations=20, generator=None
+):
+    r"""
+    Mini-batch k-means (Sculley, 2010) on the rows of x. Every iteration
+    assigns a random batch and moves each centroid towards the mean of its
+    points with a per-centroid learning rate of 1 / points seen. Centroids
+    that received no points are re-seeded on random rows. `init` warm-starts
+    from the centroids of a previous call. With fewer rows than clusters some
+    rows seed several centroids, so there are always `num_clusters` of them.
+    """
+    num_rows = x.shape[0]
+    if init is not None and init.shape == (num_clusters, x.shape[1]):
+        centroids = init.clone()
+    else:
+        rows = torch.randperm(num_rows, generator=generator)[:num_clusters]
+        if rows.shape[0] < num_clusters:
+            extra = torch.randint(
+                0, num_rows, (num_clusters - num_rows,), generator=generator
+            )
+            rows = torch.cat((rows, extra))
+        centroids = x[rows]
+    counts = torch.zeros(num_clusters, dtype=x.dtype, device=x.device)
+
+    for _ in range(num_iterations):
+        batch = x[torch.randint(0, num_rows, (batch_size,), generator=generator)]
+        ids, _ = nearest_centroids(batch, centroids)
+
+        batch_counts = torch.bincount(ids, minlength=num_clusters).to(x.dtype)
+        batch_sums = torch.zeros_like(centroids).index_add(0, ids, batch)
+        counts = counts + batch_counts
+        step = (batch_sums - batch_counts.unsqueeze(1) * centroids) / counts.clamp(
+            min=1
+        ).unsqueeze(1)
+        centroids = centroids + step
+
+        empty = counts == 0
+        if bool(empty.any()):
+            reseed = torch.randint(
+                0, num_rows, (int(empty.sum()),), generator=generator
+            )
+            centroids[empty] = x[reseed]
+    return centroids
+
+
+class StateClusterGrouping:
+    r"""
+    Grouping strategy for `PromptManager` that clusters agents on static
+    population attributes and dynamic per-agent state passed in the behavior
+    kwargs (e.g. assets, disease stage). At every step the standardized
+    attributes are clustered into at most `num_clusters` groups with
+    mini-batch k-means, warm-started from the previous step. The agent
+    closest to each centroid is the representative that is prompted, and its
+    answer is scattered to all members, so the number of prompts per step is
+    bounded by `num_clusters` independent of the population size.
+    """
+
+    def __init__(
+        self, attributes, num_clusters, batch_size=4096, num_iterations=20, seed=0
+    ):
+        self.attributes = attributes
+        self.num_clusters = num_clusters
+        self.batch_size = batch_size
+        self.num_iterations = num_iterations
+        self.generator = torch.Generator().manual_seed(seed)
+        self.centroids = None
+
+    def features(self, population, kwargs):
+        columns = []
+        for key in self.attributes:
+            if hasattr(population, key):
+                value = getattr(population, key)
+            else:
+                value = kwargs[key]
+            value = torch.as_tensor(value).reshape(-1).float().cpu()
+            columns.append(value.expand(population.population_size))
+
+        x = torch.stack(columns, dim=1)
+        return (x - x.mean(0)) / x.std(0).clamp(min=1e-6)
+
+    def assign(self, population, kwargs, eligible=None):
+        r"""
+        Returns the cluster of every agent (-1 for agents outside `eligible`)
+        and the representative agent of each of the `num_clusters` clusters.
+        Cluster ids are not renumbered between steps, so with the warm-started
+        centroids a cluster, and the archetype memory slot it is prompted
+        with, keeps covering the same region of the state space. A cluster
+        nobody was assigned to is represented by the agent closest to its
+        centroid.
+        """
+        x = self.features(population, kwargs)
+        agents = torch.arange(x.shape[0])
+        if eligible is not None:
+            agents = agents[torch.as_tensor(eligible).reshape(-1).bool().cpu()]
+            x = x[agents]
+        group_ids = torch.full((population.population_size,), -1, dtype=torch.long)
+        if x.shape[0] == 0:
+            return group_ids, torch.zeros(0, dtype=torch.long)
+
+        self.centroids = minibatch_kmeans(
+            x,
+            self.num_clusters,
+            init=self.centroids,
+            batch_size=min(self.batch_size, x.shape[0]),
+            num_iterations=self.num_iterations,
+            generator=self.generator,
+        )
+        cluster_ids, distances = nearest_centroids(x, self.centroids)
+        num_clusters = self.centroids.shape[0]
+
+        closest = torch.full((num_clusters,), float("inf")).scatter_reduce(
+            0, cluster_ids, distances, reduce="amin"
+        )
+        is_closest = distances == closest[cluster_ids]
+        representatives = torch.zeros(num_clusters, dtype=torch.long)
+        representatives[cluster_ids[is_closest]] = torch.nonzero(is_closest)[:, 0]
+
+        empty = torch.isinf(closest)
+        if bool(empty.any()):
+            representatives[empty] = torch.cdist(x, self.centroids[empty]).argmin(0)
+
+        group_ids[agents] = cluster_ids
+        return group_ids, agents[representatives]
@@ -0,0 +1,93 @@
+import json
+import os
+import queue
+import threading
+
+
+class ConversationLog:
+    """
+    Append-only JSONL log of LLM turns for a simulation run. Every line is one
+    turn: {"step", "group", "archetype", "variables", "query", "answer"}.
+    Records are handed to a background thread, so `append` never blocks the
+    simulation on file I/O. Use `flush` to wait for pending writes and `close`
+    at the end of the run, both raise the error if a write failed.
+    """
+
+    _CLOSE = object()
+
+    def __init__(self, path):
+        self.path = path
+        log_dir = os.path.dirname(os.path.abspath(path))
+        os.makedirs(log_dir, exist_ok=True)
+
+        self.queue = queue.Queue()
+        self.closed = False
+        # exception of the writer thread, re-raised by `append`, `flush` and `close`
+        self.error = None
+        self.writer = threading.Thread(target=self._write, daemon=True)
+        self.writer.start()
+
+    def append(self, records):
+        assert not self.closed, "conversation log is closed"
+        self._raise_error()
+        self.queue.put(list(records))
+
+    def _write(self):
+        closing = False
+        try:
+            with open(self.path, "a") as f:
+                while not closing:
+                    # drain everything pending, then flush once
+                    batches = [self.queue.get()]
+                    while True:
+                        try:
+                            batches.append(self.queue.get_nowait())
+                        except queue.Empty:
+                            break
+                    closing = any(records is self._CLOSE for records in batches)
+
+                    try:
+                        for records in batches:
+                            if records is not self._CLOSE:
+                                for record in records:
+                                    f.write(json.dumps(record, default=str) + "\n")
+                        f.flush()
+                    finally:
+                        for _ in batches:
+                            self.queue.task_done()
+        except Exception as e:
+            self.error = e
+            # keep taking batches so that `flush` and `close` return
+            while not closing:
+                closing = self.queue.get() is self._CLOSE
+                self.queue.task_done()
+
+    def _raise_error(self):
+        if self.error is not None:
+            raise self.error
+
+    def flush(self):
+        self.queue.join()
+        self._raise_error()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(self._CLOSE)
+        self.writer.join()
+        self._raise_error()
+
+    @staticmethod
+    def read(path, step=None, group=None):
+        r"""records of a log, optionally restricted to one step and / or group"""
+        records = []
+        with open(path, "r") as f:
+            for line in f:
+                record = json.loads(line)
+                if step is not None and record["step"] != step:
+                    continue
+                if group is not None and record["group"] != group:
+                    continue
+                records.append(record)
+        return records
@@ -0,0 +1,77 @@
+import re
+
+PACK_INSTRUCTION = (
+    "Answer each of the following {num_questions} questions independently. "
+    "Reply with exactly one line per question in the format `[index]: answer` "
+    "and nothing else."
+)
+# "." only separates an index that is not followed by a digit, "1.5" is an answer
+ANSWER_PATTERN = re.compile(r"^\s*\[?(\d+)\]?\s*(?:[:)\-]|\.(?!\d))\s*(.+?)\s*$")
+
+
+def pack_questions(questions):
+    r"""one prompt holding several indexed questions"""
+    lines = [PACK_INSTRUCTION.format(num_questions=len(questions))]
+    lines += [f"[{i + 1}] {question}" for i, question in enumerate(questions)]
+    return "\n\n".join(lines)
+
+
+def unpack_answers(response, num_questions):
+    r"""answers of a packed response by index, None for the ones that could not be parsed"""
+    answers = [None] * num_questions
+    if response is None:
+        return answers
+    for line in str(response).splitlines():
+        match = ANSWER_PATTERN.match(line)
+        if match is None:
+            continue
+        index = int(match.group(1)) - 1
+        if 0 <= index < num_questions and answers[index] is None:
+            answers[index] = match.group(2)
+    return answers
+
+
+def prompt_packed(llm, prompt_inputs, pack_size, pack_groups=None):
+    r"""
+    Send `prompt_inputs` as packed requests of up to `pack_size` questions.
+    Only inputs with the same entry in `pack_groups` share a request, e.g. to
+    keep the archetypes sampled for one prompt independent. Packed requests
+    carry no per-group chat history. Questions whose answer can not be parsed
+    are re-sent unpacked.
+    """
+    if pack_groups is None:
+        pack_groups = [0] * len(prompt_inputs)
+
+    members = {}
+    for i, group in enumerate(pack_groups):
+        members.setdefault(group, []).append(i)
+    packs = [
+        indices[start : start + pack_size]
+        for indices in members.values()
+        for start in range(0, len(indices), pack_size)
+    ]
+
+    def question(prompt_input):
+        if type(prompt_input) is str:
+            return prompt_input
+        return prompt_input["agent_query"]
+
+    packed_inputs = [
+        {
+            "agent_query": pack_questions([question(prompt_inputs[i]) for i in pack]),
+            "chat_history": [],
+        }
+        for pack in packs
+    ]
+    responses = llm.prompt(packed_inputs)
+
+    outputs = [None] * len(prompt_inputs)
+    for pack, response in zip(packs, responses):
+        for i, answer in zip(pack, unpack_answers(response, len(pack))):
+            outputs[i] = answer
+
+    failed = [i for i, output in enumerate(outputs) if output is None]
+    if len(failed) > 0:
+        for i, output in zip(failed, llm.prompt([prompt_inputs[i] for i in failed])):
+            outputs[i] = output
+    return outputs
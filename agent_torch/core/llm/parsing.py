@@ -0,0 +1,115 @@
+import json
+import math
+import re
+from abc import ABC, abstractmethod
+
+NUMBER_PATTERN = re.compile(r"[-+]?(?:\d+\.\d*|\.\d+|\d+)(?:[eE][-+]?\d+)?")
+LIST_PATTERN = re.compile(r"\[[^\[\]]*\]")
+YES_NO = {"yes": 1.0, "true": 1.0, "no": 0.0, "false": 0.0}
+
+
+class ResponseSchema(ABC):
+    r"""
+    Expected shape of an LLM answer. `parse` returns the validated value, after
+    cheap local repairs, or None if the answer can not be used. Archetypes with
+    a schema re-query only the groups whose answer failed to parse.
+    """
+
+    @abstractmethod
+    def parse(self, response):
+        pass
+
+    def __call__(self, response):
+        if response is None:
+            return None
+        return self.parse(response)
+
+
+class NumberSchema(ResponseSchema):
+    r"""
+    A single number, e.g. a probability in [0, 1]. Repairs: the first number in
+    free text is extracted, answers without a number that start with yes / no
+    are mapped to 1 / 0 and values outside [minimum, maximum] are clamped (or
+    rejected with `clamp=False`).
+    """
+
+    def __init__(self, minimum=None, maximum=None, clamp=True):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.clamp = clamp
+
+    def to_number(self, response):
+        if isinstance(response, bool):
+            return float(response)
+        if isinstance(response, (int, float)):
+            return float(response)
+
+        text = str(response).strip().strip("\"'`").strip()
+        try:
+            return float(text)
+        except ValueError:
+            pass
+
+        # an explicit number wins over a leading yes / no ("Yes, about 0.7")
+        match = NUMBER_PATTERN.search(text)
+        if match is not None:
+            return float(match.group(0))
+
+        word = re.match(r"[a-zA-Z]+", text)
+        if word is not None and word.group(0).lower() in YES_NO:
+            return YES_NO[word.group(0).lower()]
+        return None
+
+    def parse(self, response):
+        value = self.to_number(response)
+        if value is None or math.isnan(value):
+            return None
+
+        if self.minimum is not None and value < self.minimum:
+            if not self.clamp:
+                return None
+            value = float(self.minimum)
+        if self.maximum is not None and value > self.maximum:
+            if not self.clamp:
+                return None
+            value = float(self.maximum)
+        return value
+
+
+class ListSchema(ResponseSchema):
+    r"""
+    A json list of `length` items, each validated by `item` (a `NumberSchema`
+    by default), e.g. `[work_propensity, consumption_propensity]`. Repairs: the
+    list is cut out of surrounding text, or rebuilt from the numbers it contains.
+    """
+
+    def __init__(self, length=None, item=None):
+        self.length = length
+        self.item = item if item is not None else NumberSchema()
+
+    def to_list(self, response):
+        if isinstance(response, (list, tuple)):
+            return list(response)
+
+        text = str(response)
+        candidates = [text] + LIST_PATTERN.findall(text)
+        for candidate in candidates:
+            try:
+                values = json.loads(candidate)
+            except ValueError:
+                continue
+            if isinstance(values, list):
+                return values
+        return NUMBER_PATTERN.findall(text)
+
+    def parse(self, response):
+        values = self.to_list(response)
+        if len(values) == 0:
+            return None
+        if self.length is not None and len(values) != self.length:
+            return None
+
+        parsed = [self.item(value) for value in values]
+        if any(value is None for value in parsed):
+            return None
+        return parsed
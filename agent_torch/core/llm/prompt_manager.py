@@ -2,11 +2,15 @@ import os
 import json
 import re
 import itertools
+import torch
 
 
 class PromptManager:
-    def __init__(self, user_prompt, population):
+    def __init__(self, user_prompt, population, grouping=None):
         self.prompt = user_prompt
+        # None groups agents by the prompt's demographic combinations, a grouping
+        # strategy (e.g. StateClusterGrouping) regroups agents at every step
+        self.grouping = grouping
         self.population = population
         self.population_folder_path = self.population.population_folder_path
         mapping_path = os.path.join(self.population_folder_path, "mapping.json")
@@ -17,7 +21,19 @@ class PromptManager:
             self.combinations_of_prompt_variables,
             self.combinations_of_prompt_variables_with_index,
         ) = self.get_combinations_of_prompt_variables(self.filtered_mapping)
-        self.distinct_groups = len(self.combinations_of_prompt_variables)
+        self.total_groups = len(self.combinations_of_prompt_variables)
+        self.group_ids = None
+        if self.grouping is not None:
+            self.total_groups = self.grouping.num_clusters
+        else:
+            self.prune_empty_groups()
+        self.distinct_groups = (
+            self.total_groups
+            if self.grouping is not None
+            else len(self.combinations_of_prompt_variables)
+        )
+        # LLM calls per archetype that pruning saves at every step
+        self.calls_saved_per_step = self.total_groups - self.distinct_groups
 
     def load_mapping(self, path):
         with open(path, "r") as f:
@@ -54,7 +70,11 @@ class PromptManager:
 
     def get_prompt_list(self, kwargs):
         self.dict_variables_with_values = self.get_prompt_variables_dict(kwargs=kwargs)
+        if self.grouping is not None:
+            return self.get_cluster_prompt_list(kwargs)
         prompt_list = []
+        # variables each group's prompt was built from, used for decision reuse
+        self.group_variables = []
         for en, _ in enumerate(self.combinations_of_prompt_variables_with_index):
             prompt_values = self.combinations_of_prompt_variables[en]
             for key, value in self.dict_variables_with_values.items():
@@ -62,4 +82,91 @@ class PromptManager:
                     prompt_values[key] = value
             prompt = self.prompt.format(**prompt_values)
             prompt_list.append(prompt)
+            self.group_variables.append(dict(prompt_values))
         return prompt_list
+
+    def get_cluster_prompt_list(self, kwargs):
+        r"""
+        one prompt per cluster, filled in with the values of its representative.
+        As in `encode_groups`, agents of the first age group are never prompted.
+        """
+        eligible = None
+        age = self.dict_variables_with_values.get("age")
+        if "age" in self.filtered_mapping and age is not None:
+            eligible = torch.as_tensor(age).reshape(-1) != 0
+        self.group_ids, representatives = self.grouping.assign(
+            self.population, kwargs, eligible=eligible
+        )
+        num_agents = self.population.population_size
+
+        self.group_variables = []
+        for agent in representatives.tolist():
+            prompt_values = {}
+            for key, value in self.dict_variables_with_values.items():
+                if isinstance(value, (int, str, float, bool)) or value is None:
+                    prompt_values[key] = value
+                    continue
+                value = torch.as_tensor(value).reshape(-1)
+                value = value[agent] if value.numel() == num_agents else value[0]
+                if key in self.filtered_mapping:
+                    prompt_values[key] = self.filtered_mapping[key][int(value)]
+                else:
+                    prompt_values[key] = round(float(value), 2)
+            self.group_variables.append(prompt_values)
+
+        self.combinations_of_prompt_variables = self.group_variables
+        return [self.prompt.format(**values) for values in self.group_variables]
+
+    def encode_groups(self, variables):
+        r"""
+        Index of every agent's combination in the full itertools.product, -1 for
+        agents outside all groups. The index is the mixed-radix number formed by
+        the agent's mapping indices.
+        """
+        num_agents = self.population.population_size
+        group_ids = torch.zeros(num_agents, dtype=torch.long)
+        valid = torch.ones(num_agents, dtype=torch.bool)
+        stride = 1
+        for key in reversed(list(self.filtered_mapping.keys())):
+            radix = len(self.filtered_mapping[key])
+            if variables.get(key) is None:
+                valid = torch.zeros_like(valid)
+                continue
+            codes = torch.as_tensor(variables[key]).reshape(-1).long()
+            codes = codes.expand(num_agents)
+            valid = valid & (codes >= 0) & (codes < radix)
+            if key == "age":
+                valid = valid & (codes != 0)  # the first age group is never prompted
+            group_ids = group_ids + codes * stride
+            stride = stride * radix
+
+        return torch.where(valid, group_ids, -1)
+
+    def prune_empty_groups(self):
+        r"""keep only the combinations that some agent of the population belongs to"""
+        if not all(hasattr(self.population, key) for key in self.filtered_mapping):
+            return  # groups depend on runtime kwargs
+
+        variables = {
+            key: getattr(self.population, key) for key in self.filtered_mapping
+        }
+        full_ids = self.encode_groups(variables)
+        occupied = torch.unique(full_ids[full_ids >= 0])
+
+        group_index = -torch.ones(self.total_groups + 1, dtype=torch.long)
+        group_index[occupied] = torch.arange(occupied.shape[0])
+        self.group_ids = group_index[full_ids]
+
+        occupied = occupied.tolist()
+        self.combinations_of_prompt_variables = [
+            self.combinations_of_prompt_variables[i] for i in occupied
+        ]
+        self.combinations_of_prompt_variables_with_index = [
+            self.combinations_of_prompt_variables_with_index[i] for i in occupied
+        ]
+
+    def get_group_ids(self, variables):
+        r"""group index of every agent, -1 for agents outside all groups"""
+        if self.group_ids is not None:
+            return self.group_ids
+        return self.encode_groups(variables)
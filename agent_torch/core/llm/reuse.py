@@ -0,0 +1,79 @@
+import hashlib
+import json
+
+
+class DecisionReuse:
+    r"""
+    Remembers the prompt variables each group was last queried with and the
+    answers it got. A group is stale, and has to be queried again, when its
+    fingerprint changed and some input moved by more than `rtol` (relative to
+    the value it was last queried with). With `rtol=0` only identical inputs
+    are reused. Non-numeric inputs always have to match exactly.
+    """
+
+    def __init__(self, rtol=0.0):
+        self.rtol = rtol
+        self.reset()
+
+    def reset(self):
+        self.fingerprints = {}
+        self.variables = {}
+        self.outputs = {}
+
+    @staticmethod
+    def fingerprint(variables):
+        return hashlib.sha256(
+            json.dumps(variables, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+
+    @staticmethod
+    def is_number(value):
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+    def within_tolerance(self, previous, current):
+        if previous.keys() != current.keys():
+            return False
+        for key, value in current.items():
+            reference = previous[key]
+            if self.is_number(value) and self.is_number(reference):
+                if abs(value - reference) > self.rtol * abs(reference):
+                    return False
+            elif value != reference:
+                return False
+        return True
+
+    def stale_groups(self, group_variables):
+        r"""indices of the groups whose answers can not be reused"""
+        stale = []
+        for group, variables in enumerate(group_variables):
+            if group not in self.outputs:
+                stale.append(group)
+            elif self.fingerprint(variables) == self.fingerprints[group]:
+                continue
+            elif self.rtol > 0 and self.within_tolerance(
+                self.variables[group], variables
+            ):
+                continue
+            else:
+                stale.append(group)
+        return stale
+
+    def update(self, groups, group_variables, agent_outputs):
+        r"""store the answers of the queried `groups`, agent_outputs[archetype][i]"""
+        for i, group in enumerate(groups):
+            outputs = [agent_output[i] for agent_output in agent_outputs]
+            if all(output is None for output in outputs):
+                continue  # failed queries are retried at the next step
+            self.fingerprints[group] = self.fingerprint(group_variables[group])
+            self.variables[group] = dict(group_variables[group])
+            self.outputs[group] = outputs
+
+    def get_outputs(self, num_groups, num_archetypes):
+        r"""stored answers as agent_outputs[archetype][group], None where missing"""
+        return [
+            [
+                self.outputs.get(group, [None] * num_archetypes)[a]
+                for group in range(num_groups)
+            ]
+            for a in range(num_archetypes)
+        ]
@@ -0,0 +1,139 @@
+import json
+import math
+import os
+import torch
+import torch.nn as nn
+
+
+class BehaviorSurrogate:
+    r"""
+    Small torch model distilled from real LLM answers. Every answered group is
+    logged as (prompt variables -> numeric answer), the group attributes of
+    `mapping` are one-hot encoded and the remaining numeric variables (e.g.
+    week, case counts) are used as scalars. `fit` trains a bootstrap ensemble of
+    MLPs, their spread is the uncertainty of a prediction. A prediction is only
+    trusted when the spread is at most `max_std` and the scalars lie inside the
+    range seen during training, other groups fall back to the LLM.
+    """
+
+    def __init__(self, mapping, hidden_size=32, ensemble_size=5, max_std=0.05):
+        self.mapping = mapping
+        self.hidden_size = hidden_size
+        self.ensemble_size = ensemble_size
+        self.max_std = max_std
+
+        self.examples = []
+        self.numeric_keys = None
+        self.models = None
+
+    @staticmethod
+    def is_number(value):
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+    def record(self, group_variables, values):
+        r"""log the answers of a behavior step, None values are skipped"""
+        for variables, value in zip(group_variables, values):
+            if value is None:
+                continue
+            self.examples.append({"variables": dict(variables), "value": float(value)})
+
+    def __len__(self):
+        return len(self.examples)
+
+    def encode(self, group_variables):
+        features = []
+        for variables in group_variables:
+            row = []
+            for key, values in self.mapping.items():
+                one_hot = [0.0] * len(values)
+                if variables.get(key) in values:
+                    one_hot[values.index(variables[key])] = 1.0
+                row += one_hot
+            row += [
+                (
+                    float(variables[key])
+                    if self.is_number(variables.get(key))
+                    else math.nan
+                )
+                for key in self.numeric_keys
+            ]
+            features.append(row)
+        return torch.tensor(features, dtype=torch.float).view(len(group_variables), -1)
+
+    def make_model(self, num_features):
+        return nn.Sequential(
+            nn.Linear(num_features, self.hidden_size),
+            nn.ReLU(),
+            nn.Linear(self.hidden_size, self.hidden_size),
+            nn.ReLU(),
+            nn.Linear(self.hidden_size, 1),
+        )
+
+    def fit(self, epochs=500, lr=1e-2, seed=0):
+        assert len(self.examples) > 0, "no LLM answers recorded yet"
+        generator = torch.Generator().manual_seed(seed)
+        torch.manual_seed(seed)
+
+        group_variables = [example["variables"] for example in self.examples]
+        self.numeric_keys = sorted(
+            key
+            for key, value in group_variables[0].items()
+            if key not in self.mapping and self.is_number(value)
+        )
+        x = self.encode(group_variables)
+        y = torch.tensor([example["value"] for example in self.examples]).view(-1, 1)
+
+        num_categorical = x.shape[1] - len(self.numeric_keys)
+        scalars = x[:, num_categorical:]
+        self.low, self.high = scalars.min(0).values, scalars.max(0).values
+        self.shift = scalars.mean(0)
+        self.scale = scalars.std(0, unbiased=False).clamp(min=1e-6)
+        x = self.normalize(x)
+
+        self.models = []
+        for _ in range(self.ensemble_size):
+            # every member sees a bootstrap resample of the answers
+            sample = torch.randint(0, x.shape[0], (x.shape[0],), generator=generator)
+            model = self.make_model(x.shape[1])
+            optimizer = torch.optim.Adam(model.parameters(), lr=lr)
+            for _ in range(epochs):
+                optimizer.zero_grad()
+                loss = nn.functional.mse_loss(model(x[sample]), y[sample])
+                loss.backward()
+                optimizer.step()
+            self.models.append(model.eval())
+        return self
+
+    def normalize(self, x):
+        num_categorical = x.shape[1] - len(self.numeric_keys)
+        scalars = (x[:, num_categorical:] - self.shift) / self.scale
+        return torch.cat([x[:, :num_categorical], scalars], dim=1)
+
+    def predict(self, group_variables):
+        r"""
+        Returns the ensemble mean and standard deviation per group, and whether
+        the prediction can be used instead of querying the LLM.
+        """
+        assert self.models is not None, "surrogate is not trained, call `fit` first"
+        x = self.encode(group_variables)
+        num_categorical = x.shape[1] - len(self.numeric_keys)
+        scalars = x[:, num_categorical:]
+        in_range = ((scalars >= self.low) & (scalars <= self.high)).all(1)
+
+        with torch.no_grad():
+            predictions = torch.stack(
+                [model(self.normalize(x)).view(-1) for model in self.models]
+            )
+        mean, std = predictions.mean(0), predictions.std(0, unbiased=False)
+        confident = in_range & (std <= self.max_std)
+        return mean, std, confident
+
+    def save_examples(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.examples, f, default=str)
+
+    def load_examples(self, path):
+        with open(path, "r") as f:
+            self.examples += json.load(f)
+        return self
@@ -0,0 +1,89 @@
+import threading
+
+from agent_torch.core.llm.conversation_log import ConversationLog
+
+
+def percentile(values, q):
+    if len(values) == 0:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+class LLMTelemetry:
+    r"""
+    Cost of the LLM layer. `prompt_archetypes` records one entry per
+    (archetype, group) and attempt: {"archetype", "group", "attempt", "cached",
+    "latency", "prompt_tokens", "completion_tokens", "retries", "failed",
+    "parse_failed"}, tagged with the current `tags` (Behavior sets "step" and
+    "substep"). Backends that expose `last_stats` contribute per-request
+    latency, token counts and retries, for the others latency is the wall time
+    of the batch. Entries are kept in memory for `summary` and, with a `path`,
+    appended to a JSONL file in the background.
+    """
+
+    def __init__(self, path=None):
+        self.records = []
+        self.tags = {}
+        self.lock = threading.Lock()
+        self.log = ConversationLog(path) if path is not None else None
+
+    def set_tags(self, **tags):
+        self.tags = tags
+
+    def record(self, records):
+        records = [{**self.tags, **record} for record in records]
+        with self.lock:
+            self.records.extend(records)
+        if self.log is not None and len(records) > 0:
+            self.log.append(records)
+
+    def reset(self):
+        with self.lock:
+            self.records = []
+
+    def summarize(self, records):
+        requests = [record for record in records if not record["cached"]]
+        latencies = [
+            record["latency"] for record in requests if record["latency"] is not None
+        ]
+
+        def total(key):
+            values = [record.get(key) for record in requests]
+            values = [value for value in values if value is not None]
+            return sum(values) if len(values) > 0 else None
+
+        cache_hits = len(records) - len(requests)
+        return {
+            "requests": len(requests),
+            "cache_hits": cache_hits,
+            "cache_hit_rate": cache_hits / len(records) if len(records) else 0.0,
+            "latency_mean": sum(latencies) / len(latencies) if latencies else None,
+            "latency_p50": percentile(latencies, 0.5),
+            "latency_p95": percentile(latencies, 0.95),
+            "prompt_tokens": total("prompt_tokens"),
+            "completion_tokens": total("completion_tokens"),
+            "retries": total("retries") or 0,
+            "failures": sum(bool(record["failed"]) for record in requests),
+            "parse_failures": sum(bool(record["parse_failed"]) for record in records),
+        }
+
+    def summary(self, by=None):
+        r"""totals over all records, or per value of the tag `by` (e.g. "step")"""
+        with self.lock:
+            records = list(self.records)
+        if by is None:
+            return self.summarize(records)
+
+        grouped = {}
+        for record in records:
+            grouped.setdefault(record.get(by), []).append(record)
+        return {key: self.summarize(value) for key, value in grouped.items()}
+
+    def flush(self):
+        if self.log is not None:
+            self.log.flush()
+
+    def close(self):
+        if self.log is not None:
+            self.log.close()
@@ -0,0 +1,112 @@
+import re
+import torch
+
+from agent_torch.core.helpers import get_by_path
+
+
+class MetricReducer:
+    r"""
+    Reduces one state path to a compact tensor after every step.
+
+    spec:
+        path: agents/citizens/disease_stage
+        reduce: sum | mean | count | histogram
+        bins: 5                           (histogram only, values in [0, bins))
+        group_by: agents/citizens/age     (optional, integer codes)
+        num_groups: 9                     (optional, inferred from the first step)
+    """
+
+    reductions = ("sum", "mean", "count", "histogram")
+
+    def __init__(self, name, spec):
+        self.name = name
+        self.path = re.split("/", spec["path"])
+        self.reduce = spec.get("reduce", "sum")
+        assert (
+            self.reduce in self.reductions
+        ), f"metric {name}: unknown reduction {self.reduce}"
+
+        self.bins = spec.get("bins")
+        if self.reduce == "histogram":
+            assert self.bins is not None, f"metric {name}: histogram needs `bins`"
+
+        self.group_by = spec.get("group_by")
+        if self.group_by is not None:
+            self.group_by = re.split("/", self.group_by)
+        self.num_groups = spec.get("num_groups")
+
+    def _groups(self, state, num_values):
+        groups = get_by_path(state, self.group_by).reshape(-1).long()
+        assert groups.shape[0] == num_values, f"metric {self.name}: shape mismatch"
+        if self.num_groups is None:
+            self.num_groups = int(groups.max()) + 1
+        return groups
+
+    def __call__(self, state):
+        values = get_by_path(state, self.path)
+        if values.dim() == 2 and values.shape[1] == 1:
+            values = values.view(-1)  # per-agent properties are stored as (N, 1)
+
+        if self.group_by is None:
+            if self.reduce == "sum":
+                return values.sum(0)
+            if self.reduce == "mean":
+                return values.float().mean(0)
+            if self.reduce == "count":
+                return (values != 0).sum(0)
+            return torch.bincount(values.reshape(-1).long(), minlength=self.bins)[
+                : self.bins
+            ]
+
+        groups = self._groups(state, values.shape[0])
+        if self.reduce == "histogram":
+            codes = groups * self.bins + values.reshape(-1).long()
+            return torch.bincount(codes, minlength=self.num_groups * self.bins).view(
+                self.num_groups, self.bins
+            )
+
+        if self.reduce == "count":
+            values = (values != 0).long()
+        totals = torch.zeros(
+            (self.num_groups,) + tuple(values.shape[1:]),
+            dtype=values.dtype if self.reduce != "mean" else torch.float,
+            device=values.device,
+        ).index_add(0, groups, values if self.reduce != "mean" else values.float())
+        if self.reduce != "mean":
+            return totals
+
+        sizes = torch.bincount(groups, minlength=self.num_groups).clamp(min=1)
+        return totals / sizes.view((-1,) + (1,) * (totals.dim() - 1))
+
+
+class Metrics:
+    r"""
+    Online reducers declared in the `metrics` section of the config. The runner
+    calls `update` after every step, results are stacked along a leading time axis.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.reducers = {
+            name: MetricReducer(name, spec)
+            for name, spec in (config.get("metrics") or {}).items()
+        }
+        self.reset()
+
+    def reset(self):
+        self.history = {name: [] for name in self.reducers}
+
+    def update(self, state):
+        for name, reducer in self.reducers.items():
+            self.history[name].append(reducer(state))
+
+    def __len__(self):
+        return len(self.reducers)
+
+    def __getitem__(self, name):
+        if len(self.history[name]) == 0:
+            return None
+        return torch.stack(self.history[name])
+
+    def results(self):
+        return {name: self[name] for name in self.reducers}
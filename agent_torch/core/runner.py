@@ -3,6 +3,7 @@ from collections import deque
 
 from agent_torch.core.controller import Controller
 from agent_torch.core.initializer import Initializer
+from agent_torch.core.metrics import Metrics
 from agent_torch.core.helpers import to_cpu
 
 
@@ -18,6 +19,16 @@ class Runner(nn.Module):
 
         self.initializer = Initializer(self.config, self.registry)
         self.controller = Controller(self.config)
+        self.metrics = Metrics(self.config)
+
+        # production runs can keep only the reduced metrics
+        self.capture_trajectory = self.config["simulation_metadata"].get(
+            "capture_trajectory", True
+        )
+        # let LLM-driven actions start next step's requests while substeps compute
+        self.prefetch_behavior = self.config["simulation_metadata"].get(
+            "prefetch_behavior", False
+        )
 
         self.state = None
 
@@ -29,9 +40,11 @@ class Runner(nn.Module):
         self.state = self.initializer.state
 
         self.state_trajectory = []
-        self.state_trajectory.append(
-            [to_cpu(self.state)]
-        )  # move state to cpu and save in trajectory
+        if self.capture_trajectory:
+            self.state_trajectory.append(
+                [to_cpu(self.state)]
+            )  # move state to cpu and save in trajectory
+        self.metrics.reset()
 
     def reset(self):
         r"""
@@ -44,7 +57,9 @@ class Runner(nn.Module):
         reinitialize the state trajectory of the simulator at the beginning of an episode
         """
         self.state_trajectory = []
-        self.state_trajectory.append([to_cpu(self.state)])
+        if self.capture_trajectory:
+            self.state_trajectory.append([to_cpu(self.state)])
+        self.metrics.reset()
 
     def step(self, num_steps=None):
         r"""
@@ -60,7 +75,8 @@ class Runner(nn.Module):
         for time_step in range(num_steps):
             self.state["current_step"] = time_step
 
-            self.state_trajectory.append([])  # track state after each substep
+            if self.capture_trajectory:
+                self.state_trajectory.append([])  # track state after each substep
 
             for substep in self.config["substeps"].keys():
                 observation_profile, action_profile = {}, {}
@@ -84,9 +100,31 @@ class Runner(nn.Module):
                 )
                 self.state = next_state
 
-                self.state_trajectory[-1].append(
-                    to_cpu(self.state)
-                )  # move state in state trajectory to cpu
+                if self.capture_trajectory:
+                    self.state_trajectory[-1].append(
+                        to_cpu(self.state)
+                    )  # move state in state trajectory to cpu
+
+                if self.prefetch_behavior:
+                    self.prefetch(self.state, after=substep)
+
+            self.metrics.update(self.state)
+
+            if self.prefetch_behavior:
+                self.prefetch(self.state)
+
+    def prefetch(self, state, after=None):
+        r"""
+        let the policies whose next decision only depends on the state after substep
+        `after` (None: the end of the step) start their LLM requests in the background
+        """
+        for substep_policies in self.initializer.policy_function.values():
+            for agent_policies in substep_policies.values():
+                for policy in agent_policies.values():
+                    if not hasattr(policy, "prefetch"):
+                        continue
+                    if getattr(policy, "prefetch_after", None) == after:
+                        policy.prefetch(state)
 
     def _set_parameters(self, params_dict):
         for param_name in params_dict:
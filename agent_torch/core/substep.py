@@ -58,6 +58,18 @@ class SubstepAction(nn.Module, ABC):
     def forward(self, state, observation):
         pass
 
+    # key of the substep after which the inputs of the next step's decision are
+    # final, None waits for the end of the step
+    prefetch_after = None
+
+    def prefetch(self, state):
+        r"""
+        Called after the `prefetch_after` substep when `prefetch_behavior` is enabled.
+        Actions driven by an LLM can start next step's requests here, e.g.
+        `self.behavior.prefetch(kwargs)`, so they run while later substeps compute.
+        """
+        pass
+
 
 class SubstepTransition(nn.Module, ABC):
     def __init__(self, config, input_variables, output_variables, arguments):
@@ -3,6 +3,7 @@ import os
 import json
 
 from agent_torch import populations
+from agent_torch.core.helpers.network import build_multi_layer_network
 from agent_torch.data.census.generate.base_pop import base_pop_wrapper
 from agent_torch.data.census.generate.household import household_wrapper
 from agent_torch.data.census.generate.mobility_network import mobility_network_wrapper
@@ -113,7 +114,13 @@ class CensusDataLoader:
             self.export(region)
 
     def generate_mobility_networks(
-        self, num_steps, mobility_mapping, region, save_path=None
+        self,
+        num_steps,
+        mobility_mapping,
+        region,
+        save_path=None,
+        file_format="csv",
+        seed=None,
     ):
         """
         Generates mobility networks based on the given parameters.
@@ -124,6 +131,8 @@ class CensusDataLoader:
                 The interaction map should be a dictionary mapping age groups to interaction probabilities.
                 The age map should be a dictionary mapping age groups to age categories.
             save_path (str, optional): The path to save the generated mobility networks. If not provided, the networks will not be saved.
+            file_format (str): "csv" edge lists, as read by the covid config, or "bin" for int32 edge files with an index.json.
+            seed (int, optional): Seed of the generated networks.
 
         Returns:
             None
@@ -155,8 +164,63 @@ class CensusDataLoader:
             interaction_by_age_dict,
             age_by_category_dict,
             save_path=save_dir,
+            file_format=file_format,
+            n_workers=self.n_cpu if self.use_parallel else 1,
+            seed=seed,
         )
 
+    def generate_contact_layers(self, layer_mapping, region, save_path=None, seed=None):
+        """
+        Build multi-layer contact networks (household, work, school, random) from the generated population and pack them into one network.
+
+        Args:
+            layer_mapping (dict): Layer name to layer spec. A spec either groups agents by a population column
+                ({"attribute": "household"}), splits a column into random groups of a fixed size for the listed age
+                labels ({"attribute": "area", "group_size": 20, "ages": adult_list}), or reads an edge list
+                ({"file_path": mobility_network_path}).
+            region (str): Region for which the network is generated.
+            save_path (str, optional): Path to save the packed network. Defaults to contact_network.npz in the region folder.
+            seed (int, optional): Seed for the random grouping of work and school layers.
+
+        Returns:
+            MultiLayerNetwork: Packed network with one layer id per edge.
+
+        Notes:
+            - This function requires the household population to be generated first.
+            - Attribute codes match those written by `export`, so the network lines up with the exported population.
+        """
+        if self.population_df is None:
+            print("Generate base population first!!!")
+            return
+
+        attributes = {}
+        layer_specs = {}
+        for layer_name, spec in layer_mapping.items():
+            spec = dict(spec)
+            attribute = spec.get("attribute")
+            if attribute is not None and attribute not in attributes:
+                attributes[attribute], _ = pd.factorize(self.population_df[attribute])
+            if spec.get("ages") is not None:
+                attributes["age"], age_labels = pd.factorize(self.population_df["age"])
+                age_labels = age_labels.tolist()
+                spec["ages"] = [
+                    age_labels.index(age) for age in spec["ages"] if age in age_labels
+                ]
+            layer_specs[layer_name] = spec
+
+        self.contact_network = build_multi_layer_network(
+            attributes, layer_specs, len(self.population_df), seed=seed
+        )
+
+        if save_path is None:
+            save_dir = os.path.join(self.population_dir, region)
+            if not os.path.exists(save_dir):
+                os.makedirs(save_dir)
+            save_path = os.path.join(save_dir, "contact_network.npz")
+        self.contact_network.save(save_path)
+
+        return self.contact_network
+
     def export(self, region, population_data_path=None, num_individuals=None):
         """
         Export demographic data for a specific region.
@@ -6,14 +6,12 @@ from copy import deepcopy
 from datetime import datetime
 from logging import getLogger
 
-import ray
 from numpy import NaN
 from pandas import DataFrame
 
 logger = getLogger()
 
 
-@ray.remote
 def assign_place_to_address_remote(
     address_type: str, pop_data_input: DataFrame, address_data_input: DataFrame
 ):
@@ -82,7 +80,11 @@ def add_random_address(
     all_areas = list(base_pop["area"].unique())
 
     if use_parallel:
+        # ray is only needed for the parallel path
+        import ray
+
         ray.init(num_cpus=n_cpu, include_dashboard=False)
+        assign_remote = ray.remote(assign_place_to_address_remote)
 
     results = []
 
@@ -98,7 +100,7 @@ def add_random_address(
         proc_pop_data = base_pop[base_pop[area_type] == proc_area]
 
         if use_parallel:
-            processed_address = assign_place_to_address_remote.remote(
+            processed_address = assign_remote.remote(
                 address_type, proc_pop_data, proc_address_data
             )
         else:
@@ -2,7 +2,6 @@ from datetime import datetime
 from genericpath import exists
 from os import makedirs
 
-import ray
 from numpy.random import choice
 from pandas import DataFrame
 import numpy as np
@@ -25,11 +24,6 @@ def get_index(value, age_ranges):
         return "Value not found in the list"
 
 
-@ray.remote
-def create_base_pop_remote(df_age_gender, df_ethnicity, age, area):
-    return create_base_pop(df_age_gender, df_ethnicity, age, area)
-
-
 def create_base_pop(df_age_gender, df_ethnicity, age, area):
     population = []
     # number_of_individuals = area_data[number_of_individuals]
@@ -81,11 +75,120 @@ def create_base_pop(df_age_gender, df_ethnicity, age, area):
     return population
 
 
+def normalize_rows(counts):
+    r"""row-wise probabilities, uniform for rows without any count"""
+    counts = np.asarray(counts, dtype=np.float64)
+    totals = counts.sum(axis=1, keepdims=True)
+    uniform = np.full_like(counts, 1.0 / max(counts.shape[1], 1))
+    return np.where(totals > 0, counts / np.where(totals > 0, totals, 1.0), uniform)
+
+
+def sample_codes(rng, probabilities, rows):
+    r"""
+    One categorical draw per individual, individual i uses the probabilities of
+    row `rows[i]`. Inverse-CDF sampling with one pass per category, so memory
+    stays O(individuals).
+    """
+    cdf = np.cumsum(probabilities, axis=1)
+    u = rng.random(len(rows))
+    codes = np.zeros(len(rows), dtype=np.int32)
+    for k in range(probabilities.shape[1] - 1):
+        codes += u >= cdf[rows, k]
+    return codes
+
+
+def create_base_pop_vectorized(df_age_gender, df_ethnicity, areas=None, seed=None):
+    """
+    Vectorised version of `create_base_pop` over all (area, age) groups at once.
+
+    Group sizes come from `population_count` or the summed `count` of a group.
+    Gender is drawn from the group's gender counts and ethnicity from the
+    area's ethnicity counts, as in `create_base_pop`. Individuals are ordered
+    by area, then age, and the columns are categoricals built from integer codes.
+
+    Args:
+        df_age_gender (DataFrame): area, age, gender, count, region (and optionally population_count)
+        df_ethnicity (DataFrame): area, ethnicity, count
+        areas (list, optional): Areas to generate, in output order. Defaults to all areas.
+        seed (int, optional): Seed of the numpy random generator.
+
+    Returns:
+        DataFrame: One row per individual with area, age, gender, ethnicity and region.
+    """
+    rng = np.random.default_rng(seed)
+    age_categories = pd.Index(df_age_gender["age"].unique())
+    if areas is None:
+        areas = df_age_gender["area"].unique()
+    area_categories = pd.Index(areas)
+    gender_categories = pd.Index(df_age_gender["gender"].unique())
+    ethnicity_categories = pd.Index(df_ethnicity["ethnicity"].unique())
+    region_categories = pd.Index(df_age_gender["region"].unique())
+
+    age_gender = df_age_gender[df_age_gender["area"].isin(area_categories)]
+    area_codes = area_categories.get_indexer(age_gender["area"])
+    age_codes = age_categories.get_indexer(age_gender["age"])
+    group_codes = area_codes * len(age_categories) + age_codes
+    num_groups = len(area_categories) * len(age_categories)
+
+    # gender counts and size of every (area, age) group
+    gender_counts = np.zeros((num_groups, len(gender_categories)))
+    np.add.at(
+        gender_counts,
+        (group_codes, gender_categories.get_indexer(age_gender["gender"])),
+        age_gender["count"].to_numpy(dtype=np.float64),
+    )
+    first_rows = pd.Series(np.arange(len(age_gender))).groupby(group_codes).first()
+    group_sizes = np.zeros(num_groups, dtype=np.int64)
+    if "population_count" in age_gender.columns:
+        group_sizes[first_rows.index] = (
+            age_gender["population_count"].to_numpy()[first_rows.to_numpy()].astype(int)
+        )
+    else:
+        group_sizes = gender_counts.sum(axis=1).astype(np.int64)
+    group_regions = np.zeros(num_groups, dtype=np.int32)
+    group_regions[first_rows.index] = region_categories.get_indexer(
+        age_gender["region"].to_numpy()[first_rows.to_numpy()]
+    )
+
+    # ethnicity counts of every area
+    ethnicity = df_ethnicity[df_ethnicity["area"].isin(area_categories)]
+    ethnicity_counts = np.zeros((len(area_categories), len(ethnicity_categories)))
+    np.add.at(
+        ethnicity_counts,
+        (
+            area_categories.get_indexer(ethnicity["area"]),
+            ethnicity_categories.get_indexer(ethnicity["ethnicity"]),
+        ),
+        ethnicity["count"].to_numpy(dtype=np.float64),
+    )
+
+    groups = np.repeat(np.arange(num_groups), group_sizes)
+    individual_areas = groups // len(age_categories)
+    genders = sample_codes(rng, normalize_rows(gender_counts), groups)
+    ethnicities = sample_codes(rng, normalize_rows(ethnicity_counts), individual_areas)
+
+    return DataFrame(
+        {
+            "area": pd.Categorical.from_codes(individual_areas, area_categories),
+            "age": pd.Categorical.from_codes(
+                groups % len(age_categories), age_categories
+            ),
+            "gender": pd.Categorical.from_codes(genders, gender_categories),
+            "ethnicity": pd.Categorical.from_codes(ethnicities, ethnicity_categories),
+            "region": pd.Categorical.from_codes(
+                group_regions[groups], region_categories
+            ),
+        }
+    )
+
+
 def base_pop_wrapper(
     input_data,
     area_selector=None,
     use_parallel=False,
     n_cpu=8,
+    vectorized=True,
+    seed=None,
 ) -> DataFrame:
 
     df_age_gender = input_data["age_gender"]
@@ -93,8 +196,21 @@ def base_pop_wrapper(
 
     start_time = datetime.utcnow()
 
+    if vectorized:
+        population = create_base_pop_vectorized(
+            df_age_gender, df_ethnicity, areas=area_selector, seed=seed
+        )
+        total_mins = (datetime.utcnow() - start_time).total_seconds() / 60.0
+        logger.info(f"Processing time (base population): {total_mins}")
+        base_address = DataFrame(columns=["type", "name", "latitude", "longitude"])
+        return population, base_address
+
     if use_parallel:
+        # ray is only needed by the parallel per-group path
+        import ray
+
         ray.init(num_cpus=n_cpu, include_dashboard=False)
+        create_base_pop_remote = ray.remote(create_base_pop)
 
     results = []
     if area_selector is None:
@@ -5,7 +5,6 @@ from pandas import DataFrame, concat
 from numpy.random import randint as numpy_randint
 from numpy.random import choice as numpy_choice
 from numpy import NaN, isnan
-import ray
 import logging
 from datetime import datetime
 from copy import deepcopy
@@ -99,32 +98,13 @@ def assign_any_remained_people(
         for x in existing_households
         if x != "NaN" and not (isinstance(x, float) and np.isnan(x))
     ]
+    if len(existing_households) == 0:
+        return proc_base_pop
 
-    while len(adults) > 0:
-        household_id = numpy_choice(existing_households)
-        num_adults_to_add = numpy_randint(0, 3)
-
-        if num_adults_to_add > len(adults):
-            num_adults_to_add = len(adults)
-
-        adult_ids = adults.sample(num_adults_to_add).index.tolist()
-        proc_base_pop.loc[proc_base_pop.index.isin(adult_ids), "household"] = (
-            household_id
-        )
-        adults = adults.loc[~adults.index.isin(adult_ids)]
-
-    while len(children) > 0:
-        household_id = numpy_choice(existing_households)
-        num_children_to_add = numpy_randint(0, 3)
-
-        if num_children_to_add > len(children):
-            num_children_to_add = len(children)
-
-        children_ids = children.sample(num_children_to_add).index.tolist()
-        proc_base_pop.loc[proc_base_pop.index.isin(children_ids), "household"] = (
-            household_id
-        )
-        children = children.loc[~children.index.isin(children_ids)]
+    remained_ids = adults.index.append(children.index)
+    proc_base_pop.loc[remained_ids, "household"] = numpy_choice(
+        existing_households, size=len(remained_ids)
+    )
 
     return proc_base_pop
 
@@ -166,15 +146,6 @@ def rename_household_id(df: DataFrame, proc_area: str, adult_list: list) -> Data
     return df.drop(["is_adult", "num_adults", "num_children"], axis=1)
 
 
-@ray.remote
-def create_household_composition_v3_remote(
-    proc_houshold_dataset, proc_base_pop, proc_area, adult_list, children_list
-):
-    return create_household_composition_v3(
-        proc_houshold_dataset, proc_base_pop, proc_area, adult_list, children_list
-    )
-
-
 def create_household_composition_v3(
     proc_household_dataset: DataFrame,
     proc_base_pop: DataFrame,
@@ -344,6 +315,189 @@ def create_household_composition_v3(
     return proc_base_pop
 
 
+def draw_members(pool, cursor, assigned, count):
+    """Take the next `count` unassigned people of a shuffled pool
+
+    Args:
+        pool (np.ndarray): Positions of the people in the pool
+        cursor (int): Position in the pool to continue from
+        assigned (np.ndarray): Boolean mask of people that have a household
+        count (int): Number of people to take
+
+    Returns:
+        tuple: Positions taken and the new cursor
+    """
+    members = []
+    while len(members) < count:
+        person = pool[cursor]
+        cursor += 1
+        if not assigned[person]:
+            members.append(person)
+    return members, cursor
+
+
+def plan_households(row: pd.Series, rng: np.random.Generator) -> tuple:
+    """Draw type and number of adults and children of all households of an area
+
+    Follows `create_household_composition_v3`: the first `living_alone`
+    nonfamily households are single adults, other households have a
+    size around `average_household_size` and families get up to
+    two times the average number of children.
+
+    Args:
+        row (Series): Household data of the area
+        rng (Generator): Random number generator
+
+    Returns:
+        tuple: Number of adults and number of children per household
+    """
+    num_households = int(row["household_num"])
+    weights = np.array(
+        [row["family_households"], row["nonfamily_households"]], dtype=float
+    )
+    family_prob = weights[0] / weights.sum() if weights.sum() > 0 else 0.5
+
+    family = rng.random(num_households) < family_prob
+    total = np.trunc(
+        rng.normal(row["average_household_size"], 0.5, num_households)
+    ).astype(int)
+    total = np.clip(total, 0, None)
+
+    if row["children_num"] > 0:
+        avg_children_per_family = row["children_num"] / num_households
+        children = np.trunc(
+            rng.integers(0, 3, num_households) * avg_children_per_family
+        ).astype(int)
+    else:
+        children = np.zeros(num_households, dtype=int)
+    children = np.where(family & (total - children > 0), children, 0)
+    adults = total - children
+
+    living_alone = np.cumsum(~family) <= row["living_alone"]
+    alone = ~family & living_alone
+    adults = np.where(alone, 1, adults)
+
+    return adults, children
+
+
+def create_household_composition_v4(
+    proc_household_dataset: DataFrame,
+    proc_base_pop: DataFrame,
+    proc_area: int or str,
+    adult_list: list,
+    children_list: list,
+    rng: np.random.Generator or None = None,
+) -> DataFrame:
+    """Create household composition (V4)
+
+    Same household model as V3 in linear time. Household sizes are drawn
+    up front, adults come from one shuffled pool and children from
+    shuffled pools per ethnicity, all consumed through cursors. Children
+    share the majority ethnicity of the adults when the pool is large
+    enough. Remaining people join random existing households in one step.
+
+    Args:
+        proc_household_dataset (DataFrame): Household dataset
+        proc_base_pop (DataFrame): Base population dataset
+        proc_area (intorstr): Area to use
+        rng (Generator, optional): Random number generator
+
+    Returns:
+        DataFrame: Updated population dataset, household ids are
+            {area}_{adult_num}_{children_num}_{id}
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+
+    ages = proc_base_pop["age"].to_numpy()
+    ethnicity_codes, _ = pd.factorize(proc_base_pop["ethnicity"])
+    is_adult = np.isin(ages, adult_list)
+    is_child = np.isin(ages, children_list)
+
+    adult_pool = rng.permutation(np.flatnonzero(is_adult))
+    child_pool = rng.permutation(np.flatnonzero(is_child))
+
+    # children sorted by ethnicity, shuffled within each ethnicity
+    child_by_ethnicity = child_pool[
+        np.argsort(ethnicity_codes[child_pool], kind="stable")
+    ]
+    num_ethnicities = ethnicity_codes.max() + 1 if len(ethnicity_codes) else 0
+    ethnicity_remaining = np.bincount(
+        ethnicity_codes[child_pool], minlength=num_ethnicities
+    )
+    ethnicity_cursor = np.concatenate([[0], np.cumsum(ethnicity_remaining)[:-1]])
+
+    household = np.full(len(proc_base_pop), -1, dtype=np.int64)
+    assigned = np.zeros(len(proc_base_pop), dtype=bool)
+    adult_cursor, child_cursor = 0, 0
+    children_remaining = len(child_pool)
+    household_id = 0
+
+    for _, row in proc_household_dataset.iterrows():
+        adults_num, children_num = plan_households(row, rng)
+        for num_adults, num_children in zip(adults_num, children_num):
+            if (
+                len(adult_pool) - adult_cursor < num_adults
+                or children_remaining < num_children
+            ):
+                continue
+            if num_adults + num_children == 0:
+                continue
+
+            adult_ids = adult_pool[adult_cursor : adult_cursor + num_adults]
+            adult_cursor += num_adults
+
+            children_ids = []
+            if num_children > 0:
+                majority = (
+                    np.bincount(ethnicity_codes[adult_ids]).argmax()
+                    if num_adults > 0
+                    else -1
+                )
+                if majority >= 0 and ethnicity_remaining[majority] >= num_children:
+                    children_ids, ethnicity_cursor[majority] = draw_members(
+                        child_by_ethnicity,
+                        ethnicity_cursor[majority],
+                        assigned,
+                        num_children,
+                    )
+                else:
+                    children_ids, child_cursor = draw_members(
+                        child_pool, child_cursor, assigned, num_children
+                    )
+                assigned[children_ids] = True
+                np.subtract.at(ethnicity_remaining, ethnicity_codes[children_ids], 1)
+                children_remaining -= num_children
+
+            household[adult_ids] = household_id
+            household[children_ids] = household_id
+            household_id += 1
+
+    # remaining adults and children join random existing households
+    remained = np.concatenate(
+        [adult_pool[adult_cursor:], child_pool[~assigned[child_pool]]]
+    )
+    if household_id > 0 and len(remained) > 0:
+        household[remained] = rng.integers(0, household_id, len(remained))
+
+    members = household >= 0
+    num_adults = np.bincount(household[members & is_adult], minlength=household_id)
+    num_children = np.bincount(household[members & ~is_adult], minlength=household_id)
+    household_names = np.array(
+        [
+            f"{proc_area}_{num_adults[i]}_{num_children[i]}_{i}"
+            for i in range(household_id)
+        ],
+        dtype=object,
+    )
+
+    household_names = np.append(household_names, NaN)
+
+    proc_base_pop = proc_base_pop.copy()
+    proc_base_pop["household"] = household_names[household]
+    return proc_base_pop
+
+
 def household_wrapper(
     houshold_dataset: DataFrame,
     base_pop: DataFrame,
@@ -353,67 +507,70 @@ def household_wrapper(
     geo_address_data: DataFrame or None = None,
     use_parallel: bool = False,
     n_cpu: int = 8,
+    seed: int or None = None,
 ) -> DataFrame:
     """Assign people to different households
 
     Args:
         houshold_dataset (DataFrame): _description_
         base_pop (DataFrame): _description_
+        seed (int, optional): Seed of the household assignment
     """
     start_time = datetime.utcnow()
     if use_parallel:
+        # ray is only needed to spread the areas over workers
+        import ray
+
         ray.init(num_cpus=n_cpu, ignore_reinit_error=True)
+        create_household_composition_remote = ray.remote(
+            create_household_composition_v4
+        )
 
     base_pop["household"] = NaN
+    base_pop["household"] = base_pop["household"].astype(object)
 
-    all_areas = list(base_pop["area"].unique())
-    total_areas = len(all_areas)
+    area_positions = base_pop.groupby("area", sort=False, observed=True).indices
+    seeds = np.random.SeedSequence(seed).spawn(len(area_positions))
+    total_areas = len(area_positions)
 
-    results = []
-    for i, proc_area in enumerate(all_areas):
+    tasks = []
+    for i, (proc_area, positions) in enumerate(area_positions.items()):
         logger.info(f"{i}/{total_areas}: Processing {proc_area}")
 
-        proc_base_pop = base_pop[base_pop["area"] == proc_area].reset_index()
-
+        proc_base_pop = base_pop.iloc[positions]
         proc_houshold_dataset = household_prep(houshold_dataset, proc_base_pop)
 
-        if len(proc_base_pop) == 0:
-            continue
-
+        args = (
+            proc_houshold_dataset,
+            proc_base_pop,
+            proc_area,
+            adult_list,
+            children_list,
+        )
         if use_parallel:
-            base_pop_results = ray.get(
-                [
-                    create_household_composition_v3_remote.remote(
-                        proc_houshold_dataset,
-                        proc_base_pop,
-                        proc_area,
-                        adult_list,
-                        children_list,
-                    )
-                    for proc_area in all_areas
-                ]
+            tasks.append(
+                (
+                    positions,
+                    create_household_composition_remote.remote(
+                        *args, np.random.default_rng(seeds[i])
+                    ),
+                )
             )
-            base_pop = pd.concat(base_pop_results, ignore_index=True)
-            ray.shutdown()
-            break
         else:
-            result = create_household_composition_v3(
-                proc_houshold_dataset,
-                proc_base_pop,
-                proc_area,
-                adult_list,
-                children_list,
+            result = create_household_composition_v4(
+                *args, np.random.default_rng(seeds[i])
             )
+            tasks.append((positions, result))
 
-            results.append(result)
+    for positions, result in tasks:
+        if use_parallel:
+            result = ray.get(result)
+        base_pop.iloc[positions, base_pop.columns.get_loc("household")] = result[
+            "household"
+        ].to_numpy()
 
-            try:
-                for result in results:
-                    result_index = result["index"]
-                    result_content = result.drop("index", axis=1)
-                    base_pop.iloc[result_index] = result_content
-            except Exception as e:
-                print(e)
+    if use_parallel:
+        ray.shutdown()
 
     end_time = datetime.utcnow()
 
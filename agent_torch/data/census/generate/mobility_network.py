@@ -1,57 +1,158 @@
 import os
+import json
+import numpy as np
 import pandas as pd
-from scipy.stats import nbinom
-import ray
-import random
-import networkx as nx
+from concurrent.futures import ProcessPoolExecutor
 
 import base64
 import uuid
 
 
-def _get_agent_interactions(age, interaction_dict):
-    mean, sd = interaction_dict[age]["mu"], interaction_dict[age]["sigma"]
+EDGE_DTYPE = np.dtype("<i4")
 
-    p = mean / (sd * sd)
-    n = mean * mean / (sd * sd - mean)
-    num_interactions = nbinom.rvs(n, p)
+
+def sample_interactions(age_df, interaction_dict, age_category_dict, rng):
+    """Sample the number of daily interactions of every agent
+
+    One negative binomial draw per age category, with mean `mu` and
+    standard deviation `sigma` of the category.
+
+    Args:
+        age_df (Series): Age of every agent
+        interaction_dict (dict): {category: {"mu": mean, "sigma": sd}}
+        age_category_dict (dict): {age: category}
+        rng (Generator): Random number generator
+
+    Returns:
+        np.ndarray: Number of interactions per agent
+    """
+    categories = np.asarray(pd.Series(age_df).map(age_category_dict), dtype=object)
+    num_interactions = np.zeros(len(categories), dtype=np.int64)
+    for category in pd.unique(categories):
+        agents = np.flatnonzero(categories == category)
+        mean = interaction_dict[category]["mu"]
+        sd = interaction_dict[category]["sigma"]
+
+        p = mean / (sd * sd)
+        n = mean * mean / (sd * sd - mean)
+        num_interactions[agents] = rng.negative_binomial(n, p, size=len(agents))
 
     return num_interactions
 
 
+def stub_matching_edges(num_interactions, rng):
+    """Random graph with the given degrees (configuration model)
+
+    Every agent gets one stub per interaction, the stubs are shuffled and
+    paired up. Self loops and repeated pairs are dropped.
+
+    Args:
+        num_interactions (np.ndarray): Number of interactions per agent
+        rng (Generator): Random number generator
+
+    Returns:
+        np.ndarray: Undirected edges of shape (num_edges, 2), int32
+    """
+    stubs = np.repeat(
+        np.arange(len(num_interactions), dtype=np.int64), num_interactions
+    )
+    stubs = rng.permutation(stubs)
+    pairs = stubs[: len(stubs) // 2 * 2].reshape(-1, 2)
+    pairs = np.sort(pairs[pairs[:, 0] != pairs[:, 1]], axis=1)
+
+    keys = np.unique(pairs[:, 0] * len(num_interactions) + pairs[:, 1])
+    edges = np.stack(
+        [keys // len(num_interactions), keys % len(num_interactions)], axis=1
+    )
+    return edges.astype(EDGE_DTYPE)
+
+
+def write_edges(edges, outfile):
+    if outfile.endswith(".csv"):
+        np.savetxt(outfile, edges, fmt="%d", delimiter=",")
+    else:
+        edges.astype(EDGE_DTYPE).tofile(outfile)
+
+
+def generate_step(num_interactions, seed, outfile):
+    edges = stub_matching_edges(num_interactions, np.random.default_rng(seed))
+    write_edges(edges, outfile)
+    return len(edges)
+
+
 def mobility_network_wrapper(
-    age_df, num_steps, interaction_dict, age_category_dict, save_path=None
+    age_df,
+    num_steps,
+    interaction_dict,
+    age_category_dict,
+    save_path=None,
+    file_format="csv",
+    n_workers=None,
+    seed=None,
 ):
+    """Generate one random contact network per step
 
+    The number of interactions of every agent is sampled once, every step
+    is an independent stub matching with these degrees. Steps are
+    generated in parallel worker processes. With `file_format="bin"`
+    every step is written as raw int32 (source, destination) pairs and
+    `index.json` lists the files and their number of edges.
+
+    Args:
+        age_df (Series): Age of every agent
+        num_steps (int): Number of networks to generate
+        interaction_dict (dict): {category: {"mu": mean, "sigma": sd}}
+        age_category_dict (dict): {age: category}
+        save_path (str, optional): Output folder. Defaults to a folder in /tmp.
+        file_format (str): "csv" or "bin"
+        n_workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+        seed (int, optional): Seed of the networks
+
+    Returns:
+        list: Paths of the generated networks
+    """
     if save_path is None:
         unique_id = str(uuid.uuid4())
         encoded_id = base64.urlsafe_b64encode(unique_id.encode()).decode()
         save_path = "/tmp/random_mobility_networks_{}".format(encoded_id)
+    os.makedirs(save_path, exist_ok=True)
 
-    num_agents = age_df.shape[0]
+    seeds = np.random.SeedSequence(seed).spawn(num_steps + 1)
+    num_interactions = sample_interactions(
+        age_df, interaction_dict, age_category_dict, np.random.default_rng(seeds[0])
+    )
 
-    agents_random_interactions = [
-        _get_agent_interactions(age_category_dict[age], interaction_dict)
-        for age in age_df
+    mobility_networks_list = [
+        os.path.join(save_path, "{}.{}".format(t, file_format))
+        for t in range(num_steps)
     ]
-
-    interactions_list = []
-    mobility_networks_list = []
-
-    for t in range(num_steps):
-        for agent_id in range(num_agents):
-            interactions_list.extend([agent_id] * agents_random_interactions[agent_id])
-        random.shuffle(interactions_list)
-
-        edges_list = [
-            (interactions_list[i], interactions_list[i + 1])
-            for i in range(len(interactions_list) - 1)
+    n_workers = min(n_workers or os.cpu_count() or 1, max(num_steps, 1))
+    if n_workers > 1:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            num_edges = list(
+                executor.map(
+                    generate_step,
+                    [num_interactions] * num_steps,
+                    seeds[1:],
+                    mobility_networks_list,
+                )
+            )
+    else:
+        num_edges = [
+            generate_step(num_interactions, step_seed, outfile)
+            for step_seed, outfile in zip(seeds[1:], mobility_networks_list)
         ]
-        G = nx.Graph()
-        G.add_edges_from(edges_list)
 
-        outfile = os.path.join(save_path, "{}.csv".format(t))
-        nx.write_edgelist(G, outfile, delimiter=",", data=False)
-        mobility_networks_list.append(outfile)
+    if file_format == "bin":
+        index = {
+            "num_agents": len(num_interactions),
+            "dtype": EDGE_DTYPE.str,
+            "steps": [
+                {"file": os.path.basename(outfile), "num_edges": int(edges)}
+                for outfile, edges in zip(mobility_networks_list, num_edges)
+            ],
+        }
+        with open(os.path.join(save_path, "index.json"), "w") as f:
+            json.dump(index, f)
 
     return mobility_networks_list
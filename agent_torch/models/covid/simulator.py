@@ -14,6 +14,7 @@ def get_registry():
 
     from .substeps.utils import (
         network_from_file,
+        multi_layer_network,
         read_from_file,
         get_lam_gamma_integrals,
         get_mean_agent_interactions,
@@ -24,6 +25,7 @@ def get_registry():
     )
 
     reg.register(network_from_file, "network_from_file", key="network")
+    reg.register(multi_layer_network, "multi_layer_network", key="network")
     reg.register(read_from_file, "read_from_file", key="initialization")
     reg.register(
         get_lam_gamma_integrals, "get_lam_gamma_integrals", key="initialization"
@@ -18,6 +18,10 @@ from ...calibration.utils.misc import week_num_to_epiweek, name_to_neighborhood
 
 @with_behavior
 class MakeIsolationDecision(SubstepAction):
+    # the cases of the next decision are final once transmission ("0") is done, so
+    # the LLM answers while the progression substep runs
+    prefetch_after = "0"
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -48,12 +52,32 @@ class MakeIsolationDecision(SubstepAction):
 
         return one_hot_tensor.to(self.device)
 
+    def behavior_kwargs(self, state, step):
+        """prompt inputs of the decision at `step`: the cases of the week before"""
+        daily_infected = state["environment"]["daily_infected"]
+        cases = daily_infected[max(step - 7, 0) : step].sum()
+        return {
+            "device": self.device,
+            "step": step,
+            "week": step // 7 + 1,
+            "cases": int(cases),
+            "current_memory_dir": self.config["simulation_metadata"].get("memory_dir"),
+        }
+
+    def prefetch(self, state):
+        if self.mode == "llm" and self.behavior is not None:
+            self.behavior.prefetch(
+                self.behavior_kwargs(state, int(state["current_step"]) + 1)
+            )
+
     def forward(self, state, observation):
         # if in heuristic mode, return random values for isolation decision
         if self.mode == "heuristic":
             will_isolate = torch.rand(self.num_agents, 1).to(self.device)
         else:
             assert self.behavior is not None
-            will_isolate = torch.rand(self.num_agents, 1).to(self.device)
+            will_isolate = self.behavior.sample(
+                self.behavior_kwargs(state, int(state["current_step"]))
+            )
 
         return {self.output_variables[0]: will_isolate}
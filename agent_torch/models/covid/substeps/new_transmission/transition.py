@@ -2,10 +2,11 @@ import torch
 from torch_geometric.data import Data
 import torch.nn.functional as F
 import re
+import warnings
 
 from agent_torch.core.substep import SubstepTransitionMessagePassing
-from agent_torch.core.helpers import get_by_path
-from agent_torch.core.distributions import StraightThroughBernoulli
+from agent_torch.core.helpers import get_by_path, TimeSeriesBuffer
+from agent_torch.core.distributions import StraightThroughBernoulli, Binomial
 
 
 class NewTransmission(SubstepTransitionMessagePassing):
@@ -19,6 +20,7 @@ class NewTransmission(SubstepTransitionMessagePassing):
 
         self.num_timesteps = self.config["simulation_metadata"]["num_steps_per_episode"]
         self.num_weeks = self.config["simulation_metadata"]["NUM_WEEKS"]
+        self.num_regions = self.config["simulation_metadata"].get("num_regions", 1)
 
         self.STAGE_UPDATE_VAR = 1
         self.INFINITY_TIME = self.config["simulation_metadata"]["INFINITY_TIME"]
@@ -28,6 +30,7 @@ class NewTransmission(SubstepTransitionMessagePassing):
 
         self.mode = self.config["simulation_metadata"]["EXECUTION_MODE"]
         self.st_bernoulli = StraightThroughBernoulli.apply
+        self.binomial = Binomial.apply
 
         self.calibration_mode = self.config["simulation_metadata"]["calibration"]
 
@@ -102,6 +105,192 @@ class NewTransmission(SubstepTransitionMessagePassing):
 
         return one_hot_tensor.to(self.device)
 
+    def _get_layer_weights(self):
+        if "layer_weights" in self.fixed_args:
+            return self.fixed_args["layer_weights"]
+        if "layer_weights" not in self.learnable_args:
+            return None
+        if self.calibration_mode:
+            return self.calibrate_layer_weights
+        return self.learnable_args["layer_weights"]
+
+    def weight_contact_layers(self, edge_attr, layer_weights):
+        """scale B_n of each edge by the weight of its contact layer"""
+        layer_ids = edge_attr[0, :].long()
+        B_n = edge_attr[1, :] * layer_weights.view(-1)[layer_ids]
+        return torch.vstack((edge_attr[0, :], B_n))
+
+    def super_agent_lam(
+        self,
+        t,
+        R,
+        SFSusceptibility,
+        SFInfector,
+        lam_gamma_integrals,
+        agents_ages,
+        current_stages,
+        agents_infected_index,
+        agents_infected_time,
+        agents_mean_interactions,
+        agents_weight,
+        agents_node,
+        edge_list,
+        edge_attr,
+    ):
+        """force of infection per member of each super-agent, aggregated over network nodes"""
+        nodes = agents_node.view(-1).long()
+        weight = agents_weight.view(-1)
+        num_nodes = int(nodes.max()) + 1
+
+        node_weight = torch.zeros(num_nodes, device=weight.device).index_add(
+            0, nodes, weight
+        )
+        node_weight = torch.clamp(node_weight, min=1)
+
+        infected_idx = agents_infected_index.view(-1).bool()
+        integrals = torch.zeros_like(weight)
+        infected_times = t - agents_infected_time.view(-1)[infected_idx] - 1
+        integrals[infected_idx] = lam_gamma_integrals[infected_times.long()]
+
+        A_s_i = SFInfector[current_stages.view(-1).long()]
+        node_infectiousness = (
+            torch.zeros(num_nodes, device=weight.device).index_add(
+                0, nodes, A_s_i * integrals * weight
+            )
+            / node_weight
+        )
+
+        source, target = edge_list[0, :], edge_list[1, :]
+        B_n = edge_attr[1, :]
+        I_bar = agents_mean_interactions.view(-1)[target[edge_attr[0, :].long()]]
+        node_lam = (
+            torch.zeros(num_nodes, device=weight.device).index_add(
+                0, target, node_infectiousness[source] * B_n / I_bar
+            )
+            / node_weight
+        )
+
+        S_A_s = SFSusceptibility[agents_ages.view(-1).long()]
+        return R * S_A_s * node_lam[nodes]
+
+    def merge_super_agents(
+        self,
+        agents_weight,
+        agents_node,
+        current_stages,
+        current_transition_times,
+        agents_infected_time,
+    ):
+        """
+        merge the rows of a node that are in the same disease stage with the same
+        transition (and, while infectious, infection) time. Merged rows are freed
+        (weight 0) so that later exposures can split into them.
+        """
+        weight = agents_weight.view(-1)
+        stages = current_stages.view(-1)
+        infectious = (stages > self.SUSCEPTIBLE_VAR) & (stages < self.RECOVERED_VAR)
+        key = torch.stack(
+            (
+                agents_node.view(-1).float(),
+                stages.float(),
+                current_transition_times.view(-1).float(),
+                agents_infected_time.view(-1).float() * infectious,
+            ),
+            dim=1,
+        )
+
+        rows = torch.arange(weight.shape[0], device=weight.device)
+        occupied = rows[weight > 0]
+        groups, inverse = torch.unique(key[occupied], dim=0, return_inverse=True)
+        keep = torch.full(
+            (groups.shape[0],), weight.shape[0], dtype=torch.long, device=weight.device
+        ).scatter_reduce(0, inverse, occupied, reduce="amin")
+
+        merged_weight = torch.zeros_like(weight).index_add(
+            0, keep[inverse], weight[occupied]
+        )
+        return merged_weight.view_as(agents_weight)
+
+    def split_super_agents(
+        self,
+        num_exposed,
+        agents_weight,
+        agents_node,
+        current_stages,
+        agents_infected_time,
+    ):
+        """
+        move newly exposed members of a super-agent into a free row (weight 0) of the same
+        node. Only one row per node can split in a step. Nodes without a free row add them
+        to their most recently infected (exposed or infected) row instead, which moves the
+        members along with that cohort. Exposures that find neither are dropped with a
+        warning.
+        """
+        nodes = agents_node.view(-1).long()
+        weight = agents_weight.view(-1)
+        num_rows, num_nodes = weight.shape[0], int(nodes.max()) + 1
+        rows = torch.arange(num_rows, device=weight.device)
+
+        free = weight == 0
+        first_free = torch.full(
+            (num_nodes,), num_rows, dtype=torch.long, device=weight.device
+        ).scatter_reduce(0, nodes[free], rows[free], reduce="amin")
+
+        stages = current_stages.view(-1)
+        cohort = ~free & (stages > self.SUSCEPTIBLE_VAR) & (stages < self.RECOVERED_VAR)
+        infected_time = agents_infected_time.view(-1).float()
+        newest_infection = torch.full(
+            (num_nodes,), -1.0, device=weight.device
+        ).scatter_reduce(0, nodes[cohort], infected_time[cohort], reduce="amax")
+        newest = cohort & (infected_time == newest_infection[nodes])
+        newest_cohort = torch.full(
+            (num_nodes,), num_rows, dtype=torch.long, device=weight.device
+        ).scatter_reduce(0, nodes[newest], rows[newest], reduce="amin")
+
+        spawning = num_exposed > 0
+        first_spawning = torch.full(
+            (num_nodes,), num_rows, dtype=torch.long, device=weight.device
+        ).scatter_reduce(0, nodes[spawning], rows[spawning], reduce="amin")
+
+        moving = spawning & (rows == first_spawning[nodes])
+        can_split = moving & (first_free[nodes] < num_rows)
+        can_join = moving & ~can_split & (newest_cohort[nodes] < num_rows)
+
+        num_dropped = int((num_exposed * ~(can_split | can_join)).sum())
+        if num_dropped > 0:
+            warnings.warn(
+                f"NewTransmission: {num_dropped} exposures dropped, no row to move "
+                "super-agent members into; increase `compression.spare_rows`"
+            )
+
+        split_rows = first_free[nodes[can_split]]
+        join_rows = newest_cohort[nodes[can_join]]
+
+        num_exposed = num_exposed * (can_split | can_join)
+        updated_weight = (
+            weight
+            - num_exposed
+            + torch.zeros_like(weight)
+            .index_add(0, split_rows, num_exposed[can_split])
+            .index_add(0, join_rows, num_exposed[can_join])
+        )
+
+        return num_exposed, updated_weight.view_as(agents_weight), split_rows
+
+    def update_daily_infected(
+        self, t, daily_infected, newly_exposed_today, agents_region
+    ):
+        if agents_region is None:
+            return TimeSeriesBuffer(daily_infected).write(t, newly_exposed_today.sum())
+
+        # daily_infected holds one column per region: (num_steps, num_regions)
+        exposed_by_region = torch.zeros(
+            self.num_regions,
+            dtype=newly_exposed_today.dtype,
+            device=newly_exposed_today.device,
+        ).index_add(0, agents_region, newly_exposed_today.view(-1))
+        return TimeSeriesBuffer(daily_infected).write(t, exposed_by_region)
+
     def update_infected_times(self, t, agents_infected_times, newly_exposed_today):
         """Note: not differentiable"""
         updated_infected_times = torch.clone(agents_infected_times).to(
@@ -115,7 +304,6 @@ class NewTransmission(SubstepTransitionMessagePassing):
     def forward(self, state, action=None):
         input_variables = self.input_variables
         t = int(state["current_step"])
-        time_step_one_hot = self._generate_one_hot_tensor(t, self.num_timesteps)
 
         week_id = int(t / 7)
         week_one_hot = self._generate_one_hot_tensor(week_id, self.num_weeks)
@@ -124,7 +312,18 @@ class NewTransmission(SubstepTransitionMessagePassing):
             R_tensor = self.calibrate_R2
         else:
             R_tensor = self.learnable_args["R2"]  # tensor of size NUM_WEEK
-        R = (R_tensor * week_one_hot).sum()
+
+        agents_region = None
+        if "region_id" in input_variables:
+            # R2 holds one column per region: (NUM_WEEKS, num_regions)
+            agents_region = get_by_path(
+                state, re.split("/", input_variables["region_id"])
+            )
+            agents_region = agents_region.view(-1).long()
+            R_regions = torch.matmul(week_one_hot.float(), R_tensor).view(-1)
+            R = R_regions[agents_region]
+        else:
+            R = (R_tensor * week_one_hot).sum()
 
         SFSusceptibility = get_by_path(
             state, re.split("/", input_variables["SFSusceptibility"])
@@ -152,6 +351,10 @@ class NewTransmission(SubstepTransitionMessagePassing):
             state, re.split("/", input_variables["adjacency_matrix"])
         )
 
+        layer_weights = self._get_layer_weights()
+        if layer_weights is not None:
+            all_edgeattr = self.weight_contact_layers(all_edgeattr, layer_weights)
+
         daily_infected = get_by_path(
             state, re.split("/", input_variables["daily_infected"])
         )
@@ -162,6 +365,27 @@ class NewTransmission(SubstepTransitionMessagePassing):
 
         will_isolate = action["citizens"]["isolation_decision"]
 
+        if "weight" in input_variables:
+            return self.forward_super_agents(
+                state,
+                t,
+                R,
+                SFSusceptibility,
+                SFInfector,
+                all_lam_gamma.squeeze(),
+                agents_ages,
+                current_stages,
+                agents_infected_index,
+                agents_infected_time,
+                agents_mean_interactions_split,
+                current_transition_times,
+                daily_infected,
+                all_edgelist,
+                all_edgeattr,
+                will_isolate,
+                agents_region,
+            )
+
         all_node_attr = (
             torch.stack(
                 (
@@ -192,7 +416,7 @@ class NewTransmission(SubstepTransitionMessagePassing):
             x=agents_data.x,
             edge_attr=agents_data.edge_attr,
             t=agents_data.t,
-            R=R,
+            R=R if agents_region is None else R[agents_data.edge_index[1]],
             SFSusceptibility=SFSusceptibility,
             SFInfector=SFInfector,
             lam_gamma_integrals=all_lam_gamma.squeeze(),
@@ -214,8 +438,9 @@ class NewTransmission(SubstepTransitionMessagePassing):
             current_stages == self.SUSCEPTIBLE_VAR
         ).squeeze() * potentially_exposed_today
 
-        daily_infected = daily_infected + newly_exposed_today.sum() * time_step_one_hot
-        daily_infected = daily_infected.squeeze(0)
+        daily_infected = self.update_daily_infected(
+            t, daily_infected, newly_exposed_today, agents_region
+        )
 
         newly_exposed_today = newly_exposed_today.unsqueeze(1)
 
@@ -233,3 +458,93 @@ class NewTransmission(SubstepTransitionMessagePassing):
             self.output_variables[2]: updated_infected_times,
             self.output_variables[3]: daily_infected,
         }
+
+    def forward_super_agents(
+        self,
+        state,
+        t,
+        R,
+        SFSusceptibility,
+        SFInfector,
+        lam_gamma_integrals,
+        agents_ages,
+        current_stages,
+        agents_infected_index,
+        agents_infected_time,
+        agents_mean_interactions,
+        current_transition_times,
+        daily_infected,
+        all_edgelist,
+        all_edgeattr,
+        will_isolate,
+        agents_region=None,
+    ):
+        """Transmission for weighted super-agents: exposures are sampled binomially per row"""
+        input_variables = self.input_variables
+        agents_weight = get_by_path(state, re.split("/", input_variables["weight"]))
+        agents_node = get_by_path(state, re.split("/", input_variables["node"]))
+        agents_weight = self.merge_super_agents(
+            agents_weight,
+            agents_node,
+            current_stages,
+            current_transition_times,
+            agents_infected_time,
+        )
+
+        lam = self.super_agent_lam(
+            t,
+            R,
+            SFSusceptibility,
+            SFInfector,
+            lam_gamma_integrals,
+            agents_ages,
+            current_stages,
+            agents_infected_index,
+            agents_infected_time,
+            agents_mean_interactions,
+            agents_weight,
+            agents_node,
+            all_edgelist,
+            all_edgeattr,
+        )
+        prob_infected = (1 - torch.exp(-1 * lam)) * (1.0 - will_isolate.view(-1))
+
+        susceptible = (current_stages == self.SUSCEPTIBLE_VAR).view(-1)
+        num_exposed = self.binomial(
+            agents_weight.view(-1) * susceptible, torch.clamp(prob_infected, 0.0, 1.0)
+        )
+
+        num_exposed, updated_weight, exposed_rows = self.split_super_agents(
+            num_exposed,
+            agents_weight,
+            agents_node,
+            current_stages,
+            agents_infected_time,
+        )
+
+        daily_infected = self.update_daily_infected(
+            t, daily_infected, num_exposed, agents_region
+        )
+
+        newly_exposed_rows = torch.zeros_like(current_stages)
+        newly_exposed_rows[exposed_rows] = 1
+
+        # free rows may be reused, so their stage is set rather than incremented
+        updated_stages = (
+            current_stages * (1 - newly_exposed_rows)
+            + newly_exposed_rows * self.EXPOSED_VAR
+        )
+        updated_next_stage_times = self.update_transition_times(
+            t, current_transition_times, newly_exposed_rows
+        )
+        updated_infected_times = self.update_infected_times(
+            t, agents_infected_time, newly_exposed_rows
+        )
+
+        return {
+            self.output_variables[0]: updated_stages,
+            self.output_variables[1]: updated_next_stage_times,
+            self.output_variables[2]: updated_infected_times,
+            self.output_variables[3]: daily_infected,
+            "weight": updated_weight,
+        }
@@ -1,9 +1,8 @@
 import torch
-import torch.nn.functional as F
 import re
 
 from agent_torch.core.substep import SubstepTransition
-from agent_torch.core.helpers import get_by_path
+from agent_torch.core.helpers import get_by_path, TimeSeriesBuffer
 
 
 class SEIRMProgression(SubstepTransition):
@@ -12,6 +11,7 @@ class SEIRMProgression(SubstepTransition):
 
         self.device = torch.device(self.config["simulation_metadata"]["device"])
         self.num_timesteps = self.config["simulation_metadata"]["num_steps_per_episode"]
+        self.num_regions = self.config["simulation_metadata"].get("num_regions", 1)
 
         self.SUSCEPTIBLE_VAR = self.config["simulation_metadata"]["SUSCEPTIBLE_VAR"]
         self.EXPOSED_VAR = self.config["simulation_metadata"]["EXPOSED_VAR"]
@@ -32,14 +32,14 @@ class SEIRMProgression(SubstepTransition):
             "INFECTED_TO_RECOVERED_TIME"
         ]
 
-    def _generate_one_hot_tensor(self, timestep, num_timesteps):
-        timestep_tensor = torch.tensor([timestep])
-        one_hot_tensor = F.one_hot(timestep_tensor, num_classes=num_timesteps)
-
-        return one_hot_tensor.to(self.device)
-
     def update_daily_deaths(
-        self, t, daily_dead, current_stages, current_transition_times
+        self,
+        t,
+        daily_dead,
+        current_stages,
+        current_transition_times,
+        weight=None,
+        agents_region=None,
     ):
         # recovered or dead agents
         recovered_and_dead_mask = (current_stages == self.INFECTED_VAR) * (
@@ -48,17 +48,26 @@ class SEIRMProgression(SubstepTransition):
         new_death_recovered_today = (
             current_stages * recovered_and_dead_mask / self.INFECTED_VAR
         )
+        if weight is not None:
+            # super-agents stand in for `weight` identical individuals
+            new_death_recovered_today = new_death_recovered_today * weight
 
         if self.calibration_mode:
-            num_dead_today = new_death_recovered_today.sum() * self.calibrate_M
+            M = self.calibrate_M
         else:
-            num_dead_today = new_death_recovered_today.sum() * self.learnable_args["M"]
+            M = self.learnable_args["M"]
 
-        daily_dead = (
-            daily_dead
-            + self._generate_one_hot_tensor(t, self.num_timesteps) * num_dead_today
-        )
-        return daily_dead
+        if agents_region is not None:
+            # daily_deaths holds one column per region: (num_steps, num_regions)
+            dead_by_region = torch.zeros(
+                self.num_regions,
+                dtype=new_death_recovered_today.dtype,
+                device=new_death_recovered_today.device,
+            ).index_add(0, agents_region, new_death_recovered_today.view(-1))
+            return TimeSeriesBuffer(daily_dead).write(t, dead_by_region * M)
+
+        num_dead_today = new_death_recovered_today.sum() * M
+        return TimeSeriesBuffer(daily_dead).write(t, num_dead_today)
 
     def update_current_stages(self, t, current_stages, current_transition_times):
         transit_agents = (current_transition_times <= t) * self.STAGE_UPDATE_VAR
@@ -110,8 +119,24 @@ class SEIRMProgression(SubstepTransition):
             t, current_stages, current_transition_times
         )
 
+        weight = None
+        if "weight" in input_variables:
+            weight = get_by_path(state, re.split("/", input_variables["weight"]))
+
+        agents_region = None
+        if "region_id" in input_variables:
+            agents_region = get_by_path(
+                state, re.split("/", input_variables["region_id"])
+            )
+            agents_region = agents_region.view(-1).long()
+
         new_daily_deaths = self.update_daily_deaths(
-            t, daily_deaths, current_stages, current_transition_times
+            t,
+            daily_deaths,
+            current_stages,
+            current_transition_times,
+            weight,
+            agents_region,
         )
 
         return {
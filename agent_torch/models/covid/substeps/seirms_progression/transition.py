@@ -1,9 +1,8 @@
 import torch
-import torch.nn.functional as F
 import re
 
 from agent_torch.core.substep import SubstepTransition
-from agent_torch.core.helpers import get_by_path
+from agent_torch.core.helpers import get_by_path, TimeSeriesBuffer
 from agent_torch.core.helpers.distributions import StraightThroughBernoulli
 
 
@@ -39,12 +38,6 @@ class SEIRMSProgression(SubstepTransition):
         )  # we use this if calibration is external
         self.st_bernoulli = StraightThroughBernoulli.apply
 
-    def _generate_one_hot_tensor(self, timestep, num_timesteps):
-        timestep_tensor = torch.tensor([timestep])
-        one_hot_tensor = F.one_hot(timestep_tensor, num_classes=num_timesteps)
-
-        return one_hot_tensor.to(self.device)
-
     def update_daily_deaths(
         self, t, daily_death_count, current_stages, current_transition_times
     ):
@@ -58,10 +51,7 @@ class SEIRMSProgression(SubstepTransition):
         )
         num_dead_today = new_death_recovered_today.sum() * self.external_M
 
-        daily_death_count = (
-            daily_death_count
-            + self._generate_one_hot_tensor(t, self.num_timesteps) * num_dead_today
-        )
+        daily_death_count = TimeSeriesBuffer(daily_death_count).write(t, num_dead_today)
 
         agent_death_prob = (
             self.external_M * recovered_or_dead_agents
@@ -1,3 +1,4 @@
+import os
 import numpy as np
 import pandas as pd
 from scipy.stats import gamma
@@ -10,6 +11,12 @@ import torch.nn as nn
 from torch_geometric.data import Data
 from torch_geometric.utils.convert import to_networkx
 
+from agent_torch.core.helpers.network import (
+    MultiLayerNetwork,
+    build_multi_layer_network,
+    read_edge_list,
+)
+
 
 def get_lam_gamma_integrals(shape, params):
     scale, rate = params["scale"], params["rate"]
@@ -128,7 +135,7 @@ def network_from_file(params):
     file_path = params["file_path"]
 
     random_network_edgelist_forward = (
-        torch.tensor(pd.read_csv(file_path, header=None).to_numpy()).t().long()
+        torch.from_numpy(read_edge_list(file_path)).t().long()
     )
     random_network_edgelist_backward = torch.vstack(
         (random_network_edgelist_forward[1, :], random_network_edgelist_forward[0, :])
@@ -151,3 +158,30 @@ def network_from_file(params):
     A = torch.tensor(nx.adjacency_matrix(G).todense())
 
     return G, (all_edgelist, all_edgeattr)
+
+
+def multi_layer_network(params):
+    """
+    Household, work, school and random contact layers packed into one network.
+    Either loads a network exported by `CensusDataLoader.generate_contact_layers`
+    (`file_path`) or builds the layers from the population folder.
+    """
+    if params.get("file_path") is not None:
+        network = MultiLayerNetwork.load(params["file_path"])
+    else:
+        population_dir = params["population_dir"]
+        layer_specs = params["layers"]
+
+        attributes = {}
+        for spec in layer_specs.values():
+            names = [spec.get("attribute")] + (["age"] if spec.get("ages") else [])
+            for name in names:
+                if name is not None and name not in attributes:
+                    attribute_path = os.path.join(population_dir, f"{name}.pickle")
+                    attributes[name] = pd.read_pickle(attribute_path).values
+
+        network = build_multi_layer_network(
+            attributes, layer_specs, params["num_agents"], seed=params.get("seed")
+        )
+
+    return network, (network.edge_index(), network.edge_attr())
@@ -0,0 +1,33 @@
+import os
+import pytest
+import yaml
+
+from agent_torch.core.helpers import read_config
+from agent_torch.models import covid
+from agent_torch.populations import sample
+
+
+@pytest.fixture
+def sample_config(tmp_path):
+    """Returns a factory for covid configs that run on the sample population"""
+
+    def make_config(update=None):
+        config_path = os.path.join(covid.__path__[0], "yamls", "config.yaml")
+        with open(config_path, "r") as f:
+            raw_config = yaml.safe_load(f)
+
+        metadata = raw_config["simulation_metadata"]
+        metadata["population_dir"] = sample.__path__[0]
+        metadata["num_agents"] = 1000
+        metadata["calibration"] = False
+        metadata["EXECUTION_MODE"] = "heuristic"
+
+        if update is not None:
+            update(raw_config)
+
+        test_config_path = str(tmp_path / "config.yaml")
+        with open(test_config_path, "w") as f:
+            yaml.dump(raw_config, f)
+        return read_config(test_config_path)
+
+    return make_config
@@ -35,3 +35,66 @@ class MockLLMBackend(LLMBackend):
         raise NotImplementedError(
             "inspect_history method is not applicable for Langchain backend"
         )
+
+
+class CountingMockLLM(LLMBackend):
+    """Mock dspy-style backend that answers with a fixed value and counts queries"""
+
+    def __init__(self, answer="0.5"):
+        super().__init__()
+        self.backend = "dspy"
+        self.model = "mock"
+        self.temperature = 0.0
+        self.answer = answer
+        self.num_queries = 0
+        self.num_batches = 0
+
+    def initialize_llm(self):
+        return None
+
+    def prompt(self, prompt_list):
+        self.num_queries += len(prompt_list)
+        self.num_batches += 1
+        return [self.answer for _ in prompt_list]
+
+
+class PackedAnswerMockLLM(CountingMockLLM):
+    """Answers packed prompts line by line, leaving out the indices in `skip`"""
+
+    def __init__(self, skip=()):
+        super().__init__(answer="single")
+        self.skip = set(skip)
+
+    def prompt(self, prompt_list):
+        self.num_queries += len(prompt_list)
+        self.num_batches += 1
+        return [
+            self.answer_for(prompt_input["agent_query"]) for prompt_input in prompt_list
+        ]
+
+    def answer_for(self, query):
+        questions = [line for line in query.split("\n\n") if line.startswith("[")]
+        if len(questions) == 0:
+            return self.answer
+        return "\n".join(
+            f"[{i}]: packed {question.split('] ', 1)[1]}"
+            for i, question in enumerate(questions, start=1)
+            if i not in self.skip
+        )
+
+
+class ScriptedMockLLM(CountingMockLLM):
+    """Answers each query with the next entry of its script, the last one repeats"""
+
+    def __init__(self, scripts, answer="0.5"):
+        super().__init__(answer=answer)
+        self.scripts = {query: list(script) for query, script in scripts.items()}
+
+    def prompt(self, prompt_list):
+        self.num_queries += len(prompt_list)
+        self.num_batches += 1
+        outputs = []
+        for prompt_input in prompt_list:
+            script = self.scripts.get(prompt_input["agent_query"], [self.answer])
+            outputs.append(script.pop(0) if len(script) > 1 else script[0])
+        return outputs
@@ -0,0 +1,70 @@
+from types import SimpleNamespace
+
+import torch
+
+from agent_torch.core.llm.backend import LocalCausalLM
+
+
+class CharTokenizer:
+    """Character level tokenizer, token id = code point, eos is chr(3)"""
+
+    chat_template = None
+    eos_token = "\x03"
+    eos_token_id = 3
+
+    def __init__(self):
+        self.pad_token = None
+
+    @property
+    def pad_token_id(self):
+        return None if self.pad_token is None else ord(self.pad_token)
+
+    def __call__(self, text, add_special_tokens=True):
+        return {"input_ids": [ord(c) for c in text]}
+
+    def decode(self, ids, skip_special_tokens=True):
+        return "".join(chr(i) for i in ids if i != self.eos_token_id)
+
+
+class DigitSumLM(torch.nn.Module):
+    """
+    Answers with the last digit of the sum of all attended token ids, then eos.
+    The key/value cache holds the token ids seen so far. Masked (padding)
+    tokens that leak into the sum change the answer.
+    """
+
+    vocab_size = 128
+
+    def __init__(self):
+        super().__init__()
+        self.num_tokens = 0
+
+    def forward(
+        self,
+        input_ids,
+        attention_mask=None,
+        position_ids=None,
+        past_key_values=None,
+        use_cache=True,
+    ):
+        self.num_tokens += input_ids.numel()
+        tokens = input_ids.float().unsqueeze(1).unsqueeze(-1)
+        if past_key_values is not None:
+            tokens = torch.cat([past_key_values[0][0], tokens], dim=2)
+        if attention_mask is None:
+            attention_mask = torch.ones(tokens.shape[0], tokens.shape[2])
+
+        total = (tokens[:, 0, :, 0] * attention_mask.float()).sum(-1).long()
+        targets = ord("0") + total % 10
+        last = input_ids[:, -1]
+        answered = (last >= ord("0")) & (last <= ord("9"))
+        targets = torch.where(answered, torch.full_like(targets, 3), targets)
+
+        logits = torch.zeros(input_ids.shape + (self.vocab_size,))
+        logits[torch.arange(input_ids.shape[0]), -1, targets] = 1.0
+        return SimpleNamespace(logits=logits, past_key_values=((tokens, tokens),))
+
+
+class MockLocalCausalLM(LocalCausalLM):
+    def load_model(self):
+        return CharTokenizer(), DigitSumLM()
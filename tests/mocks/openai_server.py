@@ -0,0 +1,75 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockOpenAIServer:
+    """
+    Local stand-in for an OpenAI-style /chat/completions endpoint.
+    Every response is delayed by `latency` seconds. The first `failures`
+    requests for a prompt get `error_status`. Prompts containing "always fail"
+    never succeed.
+    """
+
+    def __init__(self, answer="0.5", latency=0.0, failures=0, error_status=500):
+        self.answer = answer
+        self.latency = latency
+        self.failures = failures
+        self.error_status = error_status
+        self.lock = threading.Lock()
+        self.attempts = {}
+        self.num_requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length))
+                status, body = server.respond(payload)
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_port}/v1"
+
+    def respond(self, payload):
+        prompt = payload["messages"][-1]["content"]
+        with self.lock:
+            self.num_requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            attempt = self.attempts.get(prompt, 0)
+            self.attempts[prompt] = attempt + 1
+
+        time.sleep(self.latency)
+        with self.lock:
+            self.in_flight -= 1
+
+        if "always fail" in prompt or attempt < self.failures:
+            return self.error_status, {"error": {"message": "injected failure"}}
+        return 200, {
+            "choices": [{"message": {"role": "assistant", "content": self.answer}}],
+            "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": 1},
+        }
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.httpd.shutdown()
+        self.httpd.server_close()
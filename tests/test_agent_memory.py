@@ -0,0 +1,20 @@
+from agent_torch.core.llm.agent_memory import RingBufferMemory
+
+
+def test_ring_buffer_keeps_last_pairs(tmp_path):
+    memory = RingBufferMemory(num_agents=2, capacity=3)
+    for i in range(5):
+        memory.save_context(0, f"q{i}", f"a{i}")
+    memory.save_context(1, "q", "a")
+
+    assert memory.get_pairs(0) == [("q2", "a2"), ("q3", "a3"), ("q4", "a4")]
+    assert [m.content for m in memory.get_messages(0, last_k=3)] == ["a3", "q4", "a4"]
+    assert [m.type for m in memory.get_messages(1)] == ["human", "ai"]
+    assert len(memory.inputs) == 6
+
+    memory.save(tmp_path / "memory.json")
+    loaded = RingBufferMemory.load(tmp_path / "memory.json")
+    assert loaded.get_pairs(0, last_k=2) == [("q3", "a3"), ("q4", "a4")]
+
+    memory.clear(0)
+    assert memory.get_messages(0) == [] and memory.counts[1] == 1
@@ -0,0 +1,49 @@
+import asyncio
+import time
+
+from agent_torch.core.llm.backend import AsyncOpenAILLM
+from tests.mocks.openai_server import MockOpenAIServer
+
+
+def make_llm(server, **kwargs):
+    return AsyncOpenAILLM(
+        "test-key", base_url=server.base_url, backoff_base=0.01, **kwargs
+    )
+
+
+def test_bounded_concurrency():
+    with MockOpenAIServer(latency=0.05) as server:
+        llm = make_llm(server, max_concurrency=4)
+        outputs = llm.prompt([f"prompt {i}" for i in range(12)])
+        llm.close()
+
+    assert outputs == ["0.5"] * 12
+    assert server.max_in_flight <= 4
+
+
+def test_retries_and_partial_results():
+    with MockOpenAIServer(failures=2, error_status=429) as server:
+        llm = make_llm(server, max_retries=3)
+        prompts = [
+            {"agent_query": "group 0", "chat_history": []},
+            {"agent_query": "group 1 always fail", "chat_history": []},
+        ]
+        outputs = llm.prompt(prompts)
+        llm.close()
+
+    assert outputs == ["0.5", None]
+    assert list(llm.last_errors.keys()) == [1]
+    assert server.attempts["group 0"] == 3
+    assert server.attempts["group 1 always fail"] == 4
+
+
+def test_rate_limit_and_async_api():
+    with MockOpenAIServer() as server:
+        llm = make_llm(server, requests_per_second=20, burst=1)
+        start = time.monotonic()
+        outputs = asyncio.run(llm.aprompt([f"prompt {i}" for i in range(6)]))
+        elapsed = time.monotonic() - start
+        llm.close()
+
+    assert outputs == ["0.5"] * 6
+    assert elapsed >= 0.2
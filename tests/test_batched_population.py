@@ -0,0 +1,124 @@
+import json
+import os
+import shutil
+import types
+
+import numpy as np
+import pandas as pd
+import torch
+
+from agent_torch.core import Runner
+from agent_torch.core.dataloader import BatchedPopulation, LoadPopulation
+from agent_torch.core.helpers.network import read_edge_list
+from agent_torch.models.covid.simulator import get_registry
+from agent_torch.populations import sample
+from fixtures.runner import sample_config
+
+
+def test_merge_populations(tmp_path):
+    population = BatchedPopulation([sample, sample], save_dir=str(tmp_path))
+
+    assert population.region_names == ["sample", "sample_1"]
+    assert population.population_size == 2000
+    assert population.region_id.tolist() == [0] * 1000 + [1] * 1000
+
+    with open(tmp_path / "mapping.json", "r") as f:
+        mapping = json.load(f)
+    with open(os.path.join(sample.__path__[0], "mapping.json"), "r") as f:
+        sample_mapping = json.load(f)
+    assert mapping["age"] == sample_mapping["age"]
+    assert len(mapping["household"]) == 2 * len(sample_mapping["household"])
+
+    age = pd.read_pickle(tmp_path / "age.pickle")
+    sample_age = pd.read_pickle(os.path.join(sample.__path__[0], "age.pickle"))
+    assert (age.values[1000:] == sample_age.values).all()
+
+    household = pd.read_pickle(tmp_path / "household.pickle")
+    assert not set(household.values[:1000]) & set(household.values[1000:])
+
+    edges = pd.read_csv(tmp_path / "mobility_networks" / "0.csv", header=None)
+    num_edges = len(edges) // 2
+    assert edges.values[:num_edges].max() < 1000
+    assert edges.values[num_edges:].min() >= 1000
+
+
+def test_merge_binary_networks(tmp_path):
+    regions = []
+    for name in ["north", "south"]:
+        folder = tmp_path / name
+        shutil.copytree(sample.__path__[0], folder)
+        network_dir = folder / "mobility_networks"
+        for csv_file in network_dir.glob("*.csv"):
+            read_edge_list(csv_file).astype("<i4").tofile(csv_file.with_suffix(".bin"))
+            csv_file.unlink()
+        region = types.ModuleType(name)
+        region.__path__ = [str(folder)]
+        regions.append(region)
+
+    population = BatchedPopulation(regions, save_dir=str(tmp_path / "merged"))
+    network_dir = tmp_path / "merged" / "mobility_networks"
+    edges = read_edge_list(network_dir / "0.bin")
+    num_edges = len(edges) // 2
+    assert edges[:num_edges].max() < 1000
+    assert edges[num_edges:].min() >= 1000
+
+    with open(network_dir / "index.json") as f:
+        index = json.load(f)
+    assert index["num_agents"] == population.population_size == 2000
+    assert index["steps"][0] == {"file": "0.bin", "num_edges": len(edges)}
+
+
+def test_region_outputs(tmp_path, sample_config):
+    population = BatchedPopulation([sample, sample], save_dir=str(tmp_path / "pop"))
+
+    def batch_regions(raw_config):
+        metadata = raw_config["simulation_metadata"]
+        population_dir = population.population_folder_path
+        metadata["population_dir"] = population_dir
+        metadata["num_agents"] = population.population_size
+        metadata["num_regions"] = 2
+
+        citizens = raw_config["state"]["agents"]["citizens"]
+        region_id = dict(citizens["properties"]["age"])
+        region_id["name"] = "Region"
+        region_id["initialization_function"] = {
+            "generator": "load_population_attribute",
+            "arguments": {
+                "file_path": {
+                    "initialization_function": None,
+                    "learnable": False,
+                    "name": "Filepath for region ids",
+                    "shape": [1],
+                    "value": f"{population_dir}/region_id.pickle",
+                }
+            },
+        }
+        citizens["properties"]["region_id"] = region_id
+
+        environment = raw_config["state"]["environment"]
+        for key in ("daily_infected", "daily_deaths"):
+            environment[key]["shape"] = [metadata["num_steps_per_episode"], 2]
+
+        transmission = raw_config["substeps"]["0"]["transition"]["new_transmission"]
+        transmission["arguments"]["R2"]["shape"] = [metadata["NUM_WEEKS"], 2]
+        progression = raw_config["substeps"]["1"]["transition"]["seirm_progression"]
+        for transition in (transmission, progression):
+            transition["input_variables"]["region_id"] = "agents/citizens/region_id"
+
+    runner = Runner(sample_config(batch_regions), get_registry())
+    runner.init()
+    runner.step(5)
+
+    daily_infected = runner.state["environment"]["daily_infected"]
+    daily_deaths = runner.state["environment"]["daily_deaths"]
+    assert daily_infected.shape[1] == 2
+    assert daily_deaths.shape[1] == 2
+    assert (daily_infected[:5].sum(0) > 0).all()
+
+
+def test_temporary_population_is_removed_on_close():
+    with BatchedPopulation([sample, sample]) as population:
+        folder = population.population_folder_path
+        assert os.path.exists(os.path.join(folder, "region_id.pickle"))
+        assert LoadPopulation(population).population_size == 2000
+    assert not os.path.exists(folder)
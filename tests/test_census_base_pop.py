@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+from agent_torch.data.census.generate.base_pop import (
+    base_pop_wrapper,
+    create_base_pop_vectorized,
+)
+
+
+def census_tables():
+    age_gender = pd.DataFrame(
+        {
+            "area": ["a1"] * 4 + ["a2"] * 4,
+            "age": ["U19", "U19", "20t29", "20t29"] * 2,
+            "gender": ["male", "female"] * 4,
+            "count": [300, 100, 0, 200, 50, 50, 400, 0],
+            "region": ["r1"] * 4 + ["r2"] * 4,
+        }
+    )
+    ethnicity = pd.DataFrame(
+        {
+            "area": ["a1", "a1", "a2", "a2"],
+            "ethnicity": ["asian", "hispanic", "asian", "hispanic"],
+            "count": [1, 3, 1, 0],
+        }
+    )
+    return age_gender, ethnicity
+
+
+def test_group_sizes_and_marginals():
+    age_gender, ethnicity = census_tables()
+    population = create_base_pop_vectorized(age_gender, ethnicity, seed=0)
+
+    sizes = population.groupby(["area", "age"], observed=True).size()
+    assert sizes[("a1", "U19")] == 400
+    assert sizes[("a1", "20t29")] == 200
+    assert sizes[("a2", "U19")] == 100
+    assert sizes[("a2", "20t29")] == 400
+
+    a1_young = population[(population["area"] == "a1") & (population["age"] == "U19")]
+    assert np.isclose((a1_young["gender"] == "male").mean(), 0.75, atol=0.07)
+    a1_old = population[(population["area"] == "a1") & (population["age"] == "20t29")]
+    assert (a1_old["gender"] == "female").all()
+
+    a1 = population[population["area"] == "a1"]
+    assert np.isclose((a1["ethnicity"] == "hispanic").mean(), 0.75, atol=0.05)
+    assert (population[population["area"] == "a2"]["ethnicity"] == "asian").all()
+    assert (population[population["area"] == "a2"]["region"] == "r2").all()
+
+
+def test_wrapper_area_selector_and_seed():
+    age_gender, ethnicity = census_tables()
+    input_data = {"age_gender": age_gender, "ethnicity": ethnicity}
+
+    population, base_address = base_pop_wrapper(input_data, ["a2"], seed=1)
+    assert list(population["area"].unique()) == ["a2"]
+    assert len(population) == 500
+    assert list(base_address.columns) == ["type", "name", "latitude", "longitude"]
+
+    again, _ = base_pop_wrapper(input_data, ["a2"], seed=1)
+    pd.testing.assert_frame_equal(population, again)
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+from agent_torch.data.census.generate.household import household_wrapper
+
+ADULTS = ["20t29", "30t39"]
+CHILDREN = ["U19"]
+
+
+def census_tables(num_people=3000):
+    rng = np.random.default_rng(0)
+    base_pop = pd.DataFrame(
+        {
+            "area": rng.choice(["a1", "a2"], num_people),
+            "age": rng.choice(ADULTS + CHILDREN, num_people, p=[0.35, 0.35, 0.3]),
+            "gender": rng.choice(["male", "female"], num_people),
+            "ethnicity": rng.choice(["asian", "hispanic", "white"], num_people),
+            "region": "r1",
+        }
+    )
+    households = pd.DataFrame(
+        {
+            "area": ["a1", "a2"],
+            "people_num": [1500, 1500],
+            "children_num": [450, 450],
+            "household_num": [600, 600],
+            "family_households": [400, 300],
+            "nonfamily_households": [200, 300],
+            "living_alone": [100, 150],
+            "average_household_size": [2.5, 2.5],
+        }
+    )
+    return households, base_pop
+
+
+def test_household_composition():
+    households, base_pop = census_tables()
+    population, _ = household_wrapper(
+        households,
+        base_pop,
+        ADULTS,
+        CHILDREN,
+        pd.DataFrame(columns=["type", "name", "latitude", "longitude"]),
+        seed=0,
+    )
+
+    assert population["household"].notna().all()
+    parts = population["household"].str.split("_", expand=True)
+    assert (parts[0] == population["area"]).all()
+
+    # household ids encode the actual number of adults and children
+    members = population.assign(is_adult=population["age"].isin(ADULTS))
+    counts = members.groupby("household")["is_adult"].agg(["sum", "size"])
+    encoded = counts.index.to_series().str.split("_", expand=True)
+    assert (encoded[1].astype(int) == counts["sum"]).all()
+    assert (encoded[2].astype(int) == counts["size"] - counts["sum"]).all()
+
+    again, _ = household_wrapper(
+        households,
+        base_pop.drop(columns="household"),
+        ADULTS,
+        CHILDREN,
+        pd.DataFrame(columns=["type", "name", "latitude", "longitude"]),
+        seed=0,
+    )
+    pd.testing.assert_series_equal(population["household"], again["household"])
@@ -0,0 +1,51 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from agent_torch.core.helpers.network import read_edge_list
+from agent_torch.data.census.generate.mobility_network import (
+    mobility_network_wrapper,
+    sample_interactions,
+)
+
+INTERACTIONS = {"child": {"mu": 2.0, "sigma": 2.0}, "adult": {"mu": 6.0, "sigma": 3.0}}
+AGE_MAP = {"U19": "child", "20t29": "adult", "30t39": "adult"}
+
+
+def test_sample_interactions_per_category():
+    ages = pd.Series(["U19"] * 20000 + ["20t29"] * 10000 + ["30t39"] * 10000)
+    degrees = sample_interactions(ages, INTERACTIONS, AGE_MAP, np.random.default_rng(0))
+
+    assert np.isclose(degrees[:20000].mean(), 2.0, atol=0.1)
+    assert np.isclose(degrees[20000:].mean(), 6.0, atol=0.1)
+    assert np.isclose(degrees[20000:].std(), 3.0, atol=0.1)
+
+
+def test_binary_networks_match_csv(tmp_path):
+    ages = pd.Series(["U19", "20t29", "30t39"] * 500)
+    args = (ages, 3, INTERACTIONS, AGE_MAP)
+
+    bin_files = mobility_network_wrapper(
+        *args, save_path=str(tmp_path / "bin"), file_format="bin", n_workers=2, seed=0
+    )
+    csv_files = mobility_network_wrapper(
+        *args, save_path=str(tmp_path / "csv"), n_workers=1, seed=0
+    )
+
+    with open(tmp_path / "bin" / "index.json") as f:
+        index = json.load(f)
+    assert index["num_agents"] == len(ages)
+    assert [step["file"] for step in index["steps"]] == ["0.bin", "1.bin", "2.bin"]
+
+    for bin_file, csv_file, step in zip(bin_files, csv_files, index["steps"]):
+        edges = read_edge_list(bin_file)
+        assert os.path.getsize(bin_file) == 8 * step["num_edges"]
+        assert np.array_equal(edges, read_edge_list(csv_file))
+        assert (edges[:, 0] < edges[:, 1]).all()
+        assert len(np.unique(edges, axis=0)) == len(edges)
+
+    assert not np.array_equal(
+        read_edge_list(bin_files[0]), read_edge_list(bin_files[1])
+    )
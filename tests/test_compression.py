@@ -0,0 +1,142 @@
+import warnings
+
+import torch
+
+from agent_torch.core import Runner
+from agent_torch.core.initializer import DEFAULT_SPARE_ROWS
+from agent_torch.models.covid.simulator import get_registry
+from fixtures.runner import sample_config
+
+
+def compress_citizens(raw_config):
+    raw_config["simulation_metadata"]["compression"] = {
+        "citizens": {
+            "by": ["age", "disease_stage"],
+            "spare_rows": 10,
+            "networks": ["agent_agent/infection_network"],
+        }
+    }
+    for substep, transition in (("0", "new_transmission"), ("1", "seirm_progression")):
+        input_variables = raw_config["substeps"][substep]["transition"][transition][
+            "input_variables"
+        ]
+        input_variables["weight"] = "agents/citizens/weight"
+        input_variables["node"] = "agents/citizens/node"
+
+
+def test_super_agents_conserve_population(sample_config):
+    runner = Runner(sample_config(compress_citizens), get_registry())
+    runner.init()
+
+    citizens = runner.state["agents"]["citizens"]
+    num_nodes = int(citizens["node"].max()) + 1
+    assert citizens["weight"].shape[0] == num_nodes * 11
+    assert citizens["disease_stage"].shape[0] == citizens["weight"].shape[0]
+    assert citizens["weight"].sum() == 1000
+    assert runner.config["simulation_metadata"]["num_agents"] == num_nodes * 11
+
+    edge_list, _ = runner.state["network"]["agent_agent"]["infection_network"][
+        "adjacency_matrix"
+    ]
+    assert edge_list.max() < num_nodes
+
+    runner.step(5)
+
+    citizens = runner.state["agents"]["citizens"]
+    assert torch.isclose(citizens["weight"].sum(), torch.tensor(1000.0))
+    assert (citizens["weight"] >= 0).all()
+    daily_infected = runner.state["environment"]["daily_infected"]
+    assert daily_infected.sum() == torch.round(daily_infected.sum())
+
+
+def test_default_spare_rows_keep_compression(sample_config):
+    def compress_by_default(raw_config):
+        compress_citizens(raw_config)
+        del raw_config["simulation_metadata"]["compression"]["citizens"]["spare_rows"]
+
+    runner = Runner(sample_config(compress_by_default), get_registry())
+    runner.init()
+
+    citizens = runner.state["agents"]["citizens"]
+    num_nodes = int(citizens["node"].max()) + 1
+    assert citizens["weight"].shape[0] == num_nodes * (1 + DEFAULT_SPARE_ROWS)
+    # at least a 10x reduction in rows for the 1000 sample agents
+    assert citizens["weight"].shape[0] * 10 <= 1000
+
+    runner.step(3)
+    assert torch.isclose(
+        runner.state["agents"]["citizens"]["weight"].sum(), torch.tensor(1000.0)
+    )
+
+
+def run_episode(sample_config, spare_rows=None):
+    def compress(raw_config):
+        compress_citizens(raw_config)
+        citizens = raw_config["simulation_metadata"]["compression"]["citizens"]
+        if spare_rows is None:
+            del citizens["spare_rows"]
+        else:
+            citizens["spare_rows"] = spare_rows
+
+    torch.manual_seed(0)
+    runner = Runner(sample_config(compress), get_registry())
+    runner.init()
+    citizens = runner.state["agents"]["citizens"]
+    susceptible = (citizens["weight"] * (citizens["disease_stage"] == 0)).sum()
+
+    with warnings.catch_warnings():
+        warnings.filterwarnings("error", message=".*exposures dropped")
+        runner.step(runner.config["simulation_metadata"]["num_steps_per_episode"])
+
+    citizens = runner.state["agents"]["citizens"]
+    exposed = (
+        susceptible - (citizens["weight"] * (citizens["disease_stage"] == 0)).sum()
+    )
+    return exposed, runner.state["environment"]["daily_infected"].sum()
+
+
+def test_default_spare_rows_count_every_exposure(sample_config):
+    exposed, infected = run_episode(sample_config)
+    # every member that left a susceptible row is counted, none are dropped
+    assert infected == exposed
+
+    # a super-agent per step needs no merging; the epidemic has the same size
+    exposed_without_merging, _ = run_episode(sample_config, spare_rows=21)
+    assert exposed_without_merging / 2 < exposed < exposed_without_merging * 2
+
+
+def test_split_without_free_row_joins_latest_cohort(sample_config):
+    runner = Runner(sample_config(compress_citizens), get_registry())
+    runner.init()
+    transmission = runner.initializer.transition_function["0"]["new_transmission"]
+
+    # node 0: susceptible row, two exposed cohorts and no free row
+    weight = torch.tensor([[10.0], [3.0], [2.0]])
+    node = torch.zeros(3, 1, dtype=torch.long)
+    stages = torch.tensor([[0.0], [1.0], [1.0]])
+    infected_time = torch.tensor([[0.0], [2.0], [4.0]])
+
+    num_exposed, updated_weight, split_rows = transmission.split_super_agents(
+        torch.tensor([4.0, 0.0, 0.0]), weight, node, stages, infected_time
+    )
+    assert num_exposed.sum() == 4
+    assert split_rows.numel() == 0
+    assert updated_weight.view(-1).tolist() == [6.0, 3.0, 6.0]
+
+
+def test_merge_frees_identical_rows(sample_config):
+    runner = Runner(sample_config(compress_citizens), get_registry())
+    runner.init()
+    transmission = runner.initializer.transition_function["0"]["new_transmission"]
+
+    weight = torch.tensor([[5.0], [2.0], [3.0], [4.0]])
+    node = torch.zeros(4, 1, dtype=torch.long)
+    # two recovered rows with different infection times, two infected cohorts
+    stages = torch.tensor([[3.0], [3.0], [2.0], [2.0]])
+    next_stage_time = torch.tensor([[130.0], [130.0], [9.0], [10.0]])
+    infected_time = torch.tensor([[1.0], [2.0], [4.0], [5.0]])
+
+    merged = transmission.merge_super_agents(
+        weight, node, stages, next_stage_time, infected_time
+    )
+    assert merged.view(-1).tolist() == [7.0, 0.0, 3.0, 4.0]
@@ -35,3 +35,23 @@ def test_interpolation(config):
     config.add_metadata("num_steps", "${simulation_metadata.num_episodes}")
 
     assert config.get("simulation_metadata.num_steps") == 3
+
+
+def test_adding_metrics(config):
+    """
+    Ensure that metric reducers are stored in their own section.
+    """
+    config.add_metric(
+        "stages_by_age",
+        "agents/citizens/disease_stage",
+        reduce="histogram",
+        group_by="agents/citizens/age",
+        bins=5,
+    )
+
+    assert oc.to_object(config.get("metrics.stages_by_age")) == {
+        "path": "agents/citizens/disease_stage",
+        "reduce": "histogram",
+        "group_by": "agents/citizens/age",
+        "bins": 5,
+    }
@@ -0,0 +1,50 @@
+import pytest
+
+from agent_torch.core.llm.archetype import Archetype
+from agent_torch.core.llm.behavior import Behavior
+from agent_torch.core.llm.conversation_log import ConversationLog
+from agent_torch.populations import sample
+from tests.mocks.llm import CountingMockLLM
+
+
+def test_behavior_appends_turns_to_log(tmp_path):
+    log_path = str(tmp_path / "conversation_history" / "run.jsonl")
+    archetypes = Archetype(n_arch=2).llm(CountingMockLLM(), "{gender} {ethnicity}")
+    behavior = Behavior(archetypes, sample, conversation_log=log_path)
+
+    for _ in range(2):
+        behavior.sample({"device": "cpu"})
+    behavior.close()
+    assert behavior.conversation_log.closed
+    assert not behavior.conversation_log.writer.is_alive()
+
+    num_groups = behavior.prompt_manager.distinct_groups
+    assert num_groups == 10
+    records = ConversationLog.read(log_path)
+    assert len(records) == 2 * 2 * num_groups
+
+    step_records = ConversationLog.read(log_path, step=1, group=0)
+    assert [record["archetype"] for record in step_records] == [0, 1]
+    assert step_records[0]["answer"] == "0.5"
+    assert set(step_records[0]["variables"]) == {"gender", "ethnicity"}
+
+
+class Unwritable:
+    def __str__(self):
+        raise OSError("No space left on device")
+
+
+def test_write_error_is_raised_instead_of_hanging(tmp_path):
+    log = ConversationLog(str(tmp_path / "run.jsonl"))
+    log.append([{"step": 0, "answer": "0.5"}])
+    log.flush()
+
+    log.append([{"step": 1, "answer": Unwritable()}])
+    with pytest.raises(OSError, match="No space left"):
+        log.flush()
+    with pytest.raises(OSError, match="No space left"):
+        log.append([{"step": 2, "answer": "0.5"}])
+    with pytest.raises(OSError, match="No space left"):
+        log.close()
+    assert not log.writer.is_alive()
+    assert len(ConversationLog.read(log.path)) == 1
@@ -0,0 +1,47 @@
+from agent_torch.core.llm.archetype import Archetype
+from agent_torch.core.llm.behavior import Behavior
+from agent_torch.core.llm.reuse import DecisionReuse
+from agent_torch.populations import sample
+from tests.mocks.llm import CountingMockLLM
+
+
+def test_stale_groups():
+    reuse = DecisionReuse(rtol=0.1)
+    group_variables = [
+        {"gender": "male", "cases": 100},
+        {"gender": "female", "cases": 10},
+    ]
+    assert reuse.stale_groups(group_variables) == [0, 1]
+    reuse.update([0, 1], group_variables, [["0.1", "0.2"]])
+
+    group_variables = [
+        {"gender": "male", "cases": 109},
+        {"gender": "female", "cases": 12},
+    ]
+    assert reuse.stale_groups(group_variables) == [1]
+    # the tolerance is measured against the inputs the answer was queried with
+    group_variables[0]["cases"] = 111
+    assert reuse.stale_groups(group_variables) == [0, 1]
+    assert reuse.get_outputs(2, 1) == [["0.1", "0.2"]]
+
+
+def test_behavior_reuses_unchanged_groups(tmp_path):
+    llm = CountingMockLLM()
+    archetypes = Archetype(n_arch=2).llm(llm, "{gender} {cases}")
+    behavior = Behavior(
+        archetypes,
+        sample,
+        conversation_log=str(tmp_path / "run.jsonl"),
+        reuse_tolerance=0.05,
+    )
+
+    num_calls = 2 * behavior.prompt_manager.distinct_groups
+    first = behavior.sample({"device": "cpu", "cases": 100})
+    assert llm.num_queries == num_calls
+
+    assert behavior.sample({"device": "cpu", "cases": 104}) is first
+    assert llm.num_queries == num_calls
+
+    behavior.sample({"device": "cpu", "cases": 120})
+    assert llm.num_queries == 2 * num_calls
+    behavior.conversation_log.close()
@@ -2,7 +2,10 @@ import pytest
 from torch.optim import SGD
 from contextlib import contextmanager
 
+from agent_torch.core.executor import Executor
+from agent_torch.models import covid
 from fixtures.executor import executor
+from fixtures.runner import sample_config
 
 
 @contextmanager
@@ -17,3 +20,31 @@ def test_executor(executor):
     with not_raises():
         executor.init()
         executor.execute()
+
+
+class ConfigLoader:
+    def __init__(self, config):
+        self.config = config
+
+    def get_config(self):
+        return self.config
+
+
+def test_executor_without_trajectory(sample_config):
+    def without_trajectory(raw_config):
+        metadata = raw_config["simulation_metadata"]
+        metadata["capture_trajectory"] = False
+        metadata["num_episodes"] = 1
+        metadata["num_steps_per_episode"] = 2
+
+    executor = Executor(
+        model=covid, data_loader=ConfigLoader(sample_config(without_trajectory))
+    )
+    executor.init()
+    executor.execute(key="daily_infected")
+
+    assert executor.runner.state_trajectory == []
+    assert (
+        executor.simulation_values
+        is executor.runner.state["environment"]["daily_infected"]
+    )
@@ -0,0 +1,76 @@
+import os
+
+import pytest
+
+from agent_torch.core.llm.archetype import Archetype
+from agent_torch.core.llm.behavior import Behavior
+from agent_torch.core.llm.benchmark import (
+    MemoryTimer,
+    SimulatedLLM,
+    benchmark_behavior,
+    benchmark_env,
+    constant_latency,
+    format_results,
+)
+from agent_torch.models import covid
+from agent_torch.populations import sample
+
+
+def test_simulated_llm_rates():
+    llm = SimulatedLLM(
+        latency=constant_latency(0.01), failure_rate=0.2, malformed_rate=0.3
+    )
+    answers = llm.prompt(["q"] * 1000)
+    assert 150 < answers.count(None) < 250
+    assert 250 < answers.count(SimulatedLLM.MALFORMED_ANSWER) < 350
+    # 1000 requests of 10ms on 16 connections
+    assert abs(llm.simulated_time - 0.63) < 0.011
+
+
+def test_benchmark_behavior_rows():
+    rows = benchmark_behavior(
+        sample,
+        prompts=("{gender}", "{gender} {ethnicity}"),
+        archetype_counts=(2,),
+        num_steps=2,
+        make_llm=lambda: SimulatedLLM(malformed_rate=0.5),
+    )
+    assert [row["groups"] for row in rows] == [2, 10]
+    for row in rows:
+        # malformed answers are re-queried per group
+        assert row["retry_amplification"] > 1.0
+        assert row["requests_per_step"] >= row["groups"] * 2
+    assert "retry_amplification" in format_results(rows).splitlines()[0]
+
+
+def test_memory_timer_covers_export(tmp_path):
+    archetypes = Archetype(n_arch=1).llm(SimulatedLLM(), "{gender}")
+    behavior = Behavior(archetypes, sample)
+    timer = MemoryTimer(archetypes)
+
+    behavior.sample({"device": "cpu", "current_memory_dir": str(tmp_path)})
+    seconds = timer.seconds
+    archetypes[-1].export_memory_to_file(file_dir=str(tmp_path), last_k=2)
+    assert timer.seconds > seconds > 0
+
+
+@pytest.fixture
+def covid_config():
+    # envs.create rewrites the model config for the population it loads
+    config_path = os.path.join(covid.__path__[0], "yamls", "config.yaml")
+    with open(config_path, "r") as f:
+        original = f.read()
+    yield config_path
+    with open(config_path, "w") as f:
+        f.write(original)
+
+
+def test_benchmark_env(covid_config):
+    archetype = Archetype(n_arch=1).llm(SimulatedLLM(), "{gender}")
+    result = benchmark_env(
+        covid, sample, {"make_isolation_decision": archetype}, num_steps=2
+    )
+
+    assert result["create_time"] > 0 and result["step_latency"] > 0
+    # the covid isolation policy samples every group once per step
+    assert result["requests_per_step"] == 2
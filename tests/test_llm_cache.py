@@ -0,0 +1,63 @@
+import time
+
+from agent_torch.core.llm.archetype import Archetype, prompt_archetypes
+from agent_torch.core.llm.cache import SQLiteLLMCache
+from tests.mocks.llm import CountingMockLLM
+
+
+def test_cache_shared_between_instances(tmp_path):
+    path = str(tmp_path / "llm_cache.sqlite")
+    cache = SQLiteLLMCache(path)
+    cache.set_many({"a": "0.1", "b": ["0.2"]})
+
+    other = SQLiteLLMCache(path)
+    assert other.get_many(["a", "b", "c"]) == {"a": "0.1", "b": ["0.2"]}
+    assert other.stats()["hits"] == 2 and other.stats()["misses"] == 1
+
+
+def test_cache_eviction(tmp_path):
+    cache = SQLiteLLMCache(str(tmp_path / "lru.sqlite"), max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    time.sleep(0.01)
+    cache.get("a")
+    cache.set("c", 3)
+    assert len(cache) == 2 and cache.get("b") is None and cache.get("a") == 1
+
+    expiring = SQLiteLLMCache(str(tmp_path / "ttl.sqlite"), ttl=0)
+    expiring.set("a", 1)
+    time.sleep(0.01)
+    assert expiring.get("a") is None and len(expiring) == 0
+
+
+def test_archetype_reuses_cached_responses(tmp_path):
+    llm = CountingMockLLM()
+    cache = SQLiteLLMCache(str(tmp_path / "llm_cache.sqlite"))
+    prompts = ["prompt for group 0", "prompt for group 1"]
+
+    def run_episode():
+        archetypes = Archetype(n_arch=2, cache=cache).llm(llm, "{age}")
+        for archetype in archetypes:
+            archetype.initialize_memory(num_agents=len(prompts))
+        return [archetype(prompts, last_k=2) for archetype in archetypes]
+
+    assert run_episode() == [["0.5", "0.5"], ["0.5", "0.5"]]
+    assert llm.num_queries == 4
+
+    run_episode()
+    assert llm.num_queries == 4
+    assert cache.stats()["hits"] == 4
+
+
+def test_archetypes_share_one_batch():
+    llm = CountingMockLLM()
+    archetypes = Archetype(n_arch=3).llm(llm, "{age}")
+    for archetype in archetypes:
+        archetype.initialize_memory(num_agents=2)
+
+    outputs = prompt_archetypes(archetypes, ["group 0", "group 1"], last_k=2)
+
+    assert outputs == [["0.5", "0.5"]] * 3
+    assert llm.num_batches == 1 and llm.num_queries == 6
+    for archetype in archetypes:
+        assert len(archetype.get_memory(last_k=4, agent_id=1)["chat_history"]) == 2
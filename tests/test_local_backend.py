@@ -0,0 +1,36 @@
+from agent_torch.core.llm.archetype import Archetype, prompt_archetypes
+from tests.mocks.local_lm import MockLocalCausalLM
+
+
+def expected_answer(llm, prompt):
+    text = llm.to_text(prompt)
+    return str(sum(ord(c) for c in text) % 10)
+
+
+def test_batched_generation_with_shared_prefix():
+    llm = MockLocalCausalLM("models/digit-sum", agent_profile="You are a resident.")
+    llm.batch_size = 2
+    llm.initialize_llm()
+
+    prompts = ["a", "longer prompt", "mid one", "x y"]
+    answers = llm.prompt(prompts)
+    # padding inside a batch must not change any answer
+    assert answers == [expected_answer(llm, prompt) for prompt in prompts]
+    assert len(llm.prefix_cache) == 1
+
+    num_tokens = llm.llm.num_tokens
+    assert llm.prompt(prompts) == answers
+    # the shared prefix is not encoded a second time
+    prefix_length = len(next(iter(llm.prefix_cache)))
+    assert llm.llm.num_tokens - num_tokens == num_tokens - prefix_length
+
+
+def test_local_backend_with_archetypes():
+    llm = MockLocalCausalLM("models/digit-sum")
+    archetypes = Archetype(n_arch=2).llm(llm, "{age}")
+    for archetype in archetypes:
+        archetype.initialize_memory(num_agents=2)
+
+    outputs = prompt_archetypes(archetypes, ["q0", "q1"], last_k=2)
+    assert outputs[0] == outputs[1]
+    assert all(len(output) == 1 and output.isdigit() for output in outputs[0])
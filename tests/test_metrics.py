@@ -0,0 +1,58 @@
+import torch
+
+from agent_torch.core import Runner
+from agent_torch.core.metrics import MetricReducer
+from agent_torch.models.covid.simulator import get_registry
+from fixtures.runner import sample_config
+
+
+def test_grouped_reducers():
+    state = {
+        "agents": {
+            "citizens": {
+                "stage": torch.tensor([[0], [1], [1], [2], [0]]),
+                "age": torch.tensor([[0], [0], [1], [1], [1]]),
+            }
+        }
+    }
+    spec = {"path": "agents/citizens/stage", "group_by": "agents/citizens/age"}
+
+    assert MetricReducer("sum", spec)(state).tolist() == [1, 3]
+    assert MetricReducer("mean", {**spec, "reduce": "mean"})(state).tolist() == [
+        0.5,
+        1.0,
+    ]
+    assert MetricReducer("count", {**spec, "reduce": "count"})(state).tolist() == [
+        1,
+        2,
+    ]
+    histogram = MetricReducer("histogram", {**spec, "reduce": "histogram", "bins": 3})
+    assert histogram(state).tolist() == [[1, 1, 0], [1, 1, 1]]
+
+
+def test_metrics_without_trajectory(sample_config):
+    def add_metrics(raw_config):
+        raw_config["simulation_metadata"]["capture_trajectory"] = False
+        raw_config["metrics"] = {
+            "stages_by_age": {
+                "path": "agents/citizens/disease_stage",
+                "reduce": "histogram",
+                "bins": 5,
+                "group_by": "agents/citizens/age",
+            },
+            "daily_infected": {"path": "environment/daily_infected"},
+        }
+
+    runner = Runner(sample_config(add_metrics), get_registry())
+    runner.init()
+    runner.step(3)
+
+    assert runner.state_trajectory == []
+    stages_by_age = runner.metrics["stages_by_age"]
+    assert stages_by_age.shape[0] == 3 and stages_by_age.shape[2] == 5
+    assert (stages_by_age.sum((1, 2)) == 1000).all()
+
+    daily_infected = runner.metrics["daily_infected"]
+    assert torch.equal(
+        daily_infected[-1], runner.state["environment"]["daily_infected"].sum()
+    )
@@ -0,0 +1,73 @@
+import numpy as np
+import torch
+
+from agent_torch.core.helpers.network import (
+    MultiLayerNetwork,
+    build_multi_layer_network,
+    chunked_group_ids,
+    group_clique_edges,
+    pack_layers,
+)
+from agent_torch.models.covid.substeps.utils import multi_layer_network
+from agent_torch.populations import sample
+
+
+def test_group_clique_edges():
+    edges = group_clique_edges(np.array([0, 0, 1, -1, 0, 1]))
+
+    pairs = set(map(tuple, edges.T.tolist()))
+    assert pairs == {(0, 1), (1, 0), (0, 4), (4, 0), (1, 4), (4, 1), (2, 5), (5, 2)}
+
+
+def test_chunked_group_ids_respects_group_size():
+    areas = np.array([0] * 10 + [1] * 3)
+    eligible = np.array([True] * 12 + [False])
+    chunks = chunked_group_ids(areas, group_size=4, eligible=eligible, seed=0)
+
+    assert chunks[-1] == -1
+    _, sizes = np.unique(chunks[chunks >= 0], return_counts=True)
+    assert sorted(sizes.tolist()) == [2, 2, 4, 4]
+
+
+def test_pack_layers_keeps_layer_ids(tmp_path):
+    layers = {
+        "household": np.array([[0, 1], [1, 0]]),
+        "random": np.array([[2, 0], [0, 1]]),
+    }
+    network = pack_layers(layers, num_nodes=3)
+
+    assert network.num_edges == 4
+    assert network.crow_indices.tolist() == [0, 2, 4, 4]
+    assert network.layer_sizes() == {"household": 2, "random": 2}
+
+    edge_index = network.edge_index()
+    edges = {
+        (s, d, layer)
+        for s, d, layer in zip(*edge_index.tolist(), network.layer_ids.tolist())
+    }
+    assert edges == {(0, 1, 0), (1, 0, 0), (2, 0, 1), (0, 1, 1)}
+
+    network.save(tmp_path / "network.npz")
+    loaded = MultiLayerNetwork.load(tmp_path / "network.npz")
+    assert torch.equal(loaded.col_indices, network.col_indices)
+    assert loaded.layer_names == network.layer_names
+
+
+def test_multi_layer_network_from_population():
+    population_dir = sample.__path__[0]
+    params = {
+        "population_dir": population_dir,
+        "num_agents": 1000,
+        "seed": 0,
+        "layers": {
+            "household": {"attribute": "household"},
+            "work": {"attribute": "area", "group_size": 10, "ages": [0]},
+            "random": {"file_path": f"{population_dir}/mobility_networks/0.csv"},
+        },
+    }
+    network, (edge_index, edge_attr) = multi_layer_network(params)
+
+    assert edge_index.shape == (2, network.num_edges)
+    assert edge_attr.shape == (2, network.num_edges)
+    assert set(edge_attr[0].long().tolist()) == {0, 1, 2}
+    assert (edge_index[1][1:] >= edge_index[1][:-1]).all()
@@ -0,0 +1,34 @@
+from agent_torch.core.llm.archetype import Archetype, prompt_archetypes
+from agent_torch.core.llm.packing import pack_questions, unpack_answers
+from tests.mocks.llm import PackedAnswerMockLLM
+
+
+def test_unpack_answers():
+    response = "[2]: 0.4\n1. 0.1\nsome chatter\n[9]: 0.9"
+    assert unpack_answers(response, 3) == ["0.1", "0.4", None]
+    assert "[2] second" in pack_questions(["first", "second"])
+
+
+def test_unpack_answers_ignores_bare_decimals():
+    # a reply of bare numbers is not indexed, it is re-sent unpacked
+    assert unpack_answers("1.5\n0.75", 2) == [None, None]
+    assert unpack_answers("1. 0.5\n2.\t0.75", 2) == ["0.5", "0.75"]
+
+
+def test_packed_archetypes_fall_back_to_single_calls():
+    llm = PackedAnswerMockLLM(skip={2})
+    archetypes = Archetype(n_arch=2, pack_size=3).llm(llm, "{age}")
+    for archetype in archetypes:
+        archetype.initialize_memory(num_agents=4)
+
+    prompts = ["q0", "q1", "q2", "q3"]
+    outputs = prompt_archetypes(archetypes, prompts, last_k=2)
+
+    expected = ["packed q0", "single", "packed q2", "packed q3"]
+    assert outputs == [expected, expected]
+    # 2 packs per archetype in one batch, then one batch for the unparsed answers
+    assert llm.num_batches == 2 and llm.num_queries == 4 + 2
+    assert (
+        archetypes[1].get_memory(last_k=2, agent_id=2)["chat_history"][1].content
+        == "packed q2"
+    )
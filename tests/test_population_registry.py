@@ -0,0 +1,34 @@
+import os
+import shutil
+from types import SimpleNamespace
+
+import pandas as pd
+
+from agent_torch.core.dataloader import LoadPopulation, PopulationRegistry
+from agent_torch.populations import sample
+
+
+def test_loaders_share_tensors():
+    first, second = LoadPopulation(sample), LoadPopulation(sample)
+    assert first.age is second.age
+    assert first.population_size == second.population_size == 1000
+
+
+def test_registry_reloads_changed_files(tmp_path):
+    folder = tmp_path / "region"
+    shutil.copytree(sample.__path__[0], folder, ignore=shutil.ignore_patterns("*.py*"))
+    region = SimpleNamespace(__path__=[str(folder)])
+
+    before = LoadPopulation(region)
+    assert LoadPopulation(region).gender is before.gender
+
+    gender = pd.read_pickle(folder / "gender.pickle")
+    pd.to_pickle(1 - gender, folder / "gender.pickle")
+    stat = os.stat(folder / "gender.pickle")
+    os.utime(folder / "gender.pickle", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    after = LoadPopulation(region)
+    assert after.gender is not before.gender
+    assert (after.gender == 1 - before.gender).all()
+    assert after.age is not before.age  # the entry is reloaded as a whole
+    PopulationRegistry.clear()
@@ -0,0 +1,127 @@
+import threading
+
+from agent_torch.core import Runner
+from agent_torch.core.llm.archetype import Archetype
+from agent_torch.core.llm.behavior import Behavior
+from agent_torch.models.covid.simulator import get_registry
+from agent_torch.populations import sample
+from fixtures.runner import sample_config
+from tests.mocks.llm import CountingMockLLM
+
+
+class GatedMockLLM(CountingMockLLM):
+    """Blocks every batch until `release` is set"""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def prompt(self, prompt_list):
+        assert self.release.wait(timeout=10)
+        return super().prompt(prompt_list)
+
+
+def test_sample_picks_up_prefetched_decision(tmp_path):
+    llm = GatedMockLLM()
+    archetypes = Archetype(n_arch=2).llm(llm, "{gender} {cases}")
+    behavior = Behavior(
+        archetypes, sample, conversation_log=str(tmp_path / "run.jsonl")
+    )
+
+    # the prefetch returns while the LLM is still answering
+    future = behavior.prefetch({"device": "cpu", "cases": 10})
+    assert not future.done()
+    llm.release.set()
+
+    num_calls = 2 * behavior.prompt_manager.distinct_groups
+    sampled = behavior.sample({"device": "cpu", "cases": 10})
+    assert llm.num_queries == num_calls
+    assert sampled.shape == (behavior.population.population_size, 1)
+
+    # a prefetch while another one is running is skipped, not waited for
+    llm.release.clear()
+    pending = behavior.prefetch({"device": "cpu", "cases": 30})
+    assert behavior.prefetch({"device": "cpu", "cases": 40}) is pending
+    assert not pending.done()
+    llm.release.set()
+    behavior.sample({"device": "cpu", "cases": 30})
+    assert llm.num_queries == 2 * num_calls
+
+    # prompt inputs changed after the prefetch, the decision is sampled again
+    behavior.prefetch({"device": "cpu", "cases": 10})
+    behavior.sample({"device": "cpu", "cases": 20})
+    assert llm.num_queries == 4 * num_calls
+    behavior.conversation_log.close()
+
+
+def test_runner_prefetches_once_per_step(sample_config):
+    def enable_prefetch(raw_config):
+        raw_config["simulation_metadata"]["prefetch_behavior"] = True
+
+    runner = Runner(sample_config(enable_prefetch), get_registry())
+    runner.init()
+
+    prefetched_steps = []
+    policies = runner.initializer.policy_function
+    policy = next(
+        policy
+        for substep_policies in policies.values()
+        for agent_policies in substep_policies.values()
+        for policy in agent_policies.values()
+    )
+    policy.prefetch = lambda state: prefetched_steps.append(state["current_step"])
+
+    runner.step(3)
+    assert prefetched_steps == [0, 1, 2]
+
+
+class HandshakeMockLLM(CountingMockLLM):
+    """Prefetched batches (off the main thread) wait for `progressed`"""
+
+    def __init__(self):
+        super().__init__()
+        self.started = threading.Event()
+        self.progressed = threading.Event()
+
+    def prompt(self, prompt_list):
+        if threading.current_thread() is not threading.main_thread():
+            self.started.set()
+            assert self.progressed.wait(timeout=10)
+            self.progressed.clear()
+        return super().prompt(prompt_list)
+
+
+def test_prefetch_overlaps_progression(sample_config):
+    def enable_llm_prefetch(raw_config):
+        raw_config["simulation_metadata"]["prefetch_behavior"] = True
+        raw_config["simulation_metadata"]["EXECUTION_MODE"] = "llm"
+
+    runner = Runner(sample_config(enable_llm_prefetch), get_registry())
+    runner.init()
+
+    llm = HandshakeMockLLM()
+    behavior = Behavior(Archetype(n_arch=1).llm(llm, "{gender} {cases}"), sample)
+    policy = runner.initializer.policy_function["0"]["citizens"][
+        "make_isolation_decision"
+    ]
+    policy.behavior = behavior
+
+    # the progression substep only runs while next step's request is in flight
+    progression = runner.initializer.transition_function["1"]["seirm_progression"]
+    forward = progression.forward
+
+    def progress_during_request(state, action):
+        assert llm.started.wait(timeout=10)
+        llm.started.clear()
+        next_state = forward(state, action)
+        llm.progressed.set()
+        return next_state
+
+    progression.forward = progress_during_request
+
+    runner.step(3)
+    # the prefetch for step 3 is still finishing after progression released it
+    behavior.prefetched[1].result(timeout=10)
+    # step 0 is sampled directly, steps 1-3 are prefetched and none is sampled again
+    assert llm.num_batches == 4
+    assert llm.num_queries == 4 * behavior.prompt_manager.distinct_groups
@@ -0,0 +1,99 @@
+from types import SimpleNamespace
+
+import torch
+
+from agent_torch.core.dataloader import LoadPopulation
+from agent_torch.core.llm.behavior import Behavior
+from agent_torch.core.llm.clustering import StateClusterGrouping
+from agent_torch.core.llm.prompt_manager import PromptManager
+from agent_torch.populations import astoria
+
+
+def test_group_ids_match_prompt_combinations():
+    population = LoadPopulation(astoria)
+    manager = PromptManager("{age} {gender} {ethnicity}", population)
+    manager.get_prompt_list(kwargs={})
+    group_ids = manager.get_group_ids(manager.dict_variables_with_values)
+
+    assert group_ids.shape == (population.population_size,)
+    assert ((group_ids >= 0) == (population.age != 0)).all()
+    for agent in range(0, population.population_size, 97):
+        if population.age[agent] == 0:
+            assert group_ids[agent] == -1
+            continue
+        combination = manager.combinations_of_prompt_variables_with_index[
+            group_ids[agent]
+        ]
+        for key, value in combination.items():
+            assert getattr(population, key)[agent] == value
+
+
+def test_sampled_behavior_averages_archetypes():
+    group_ids = torch.tensor([0, 1, -1, 1, 2])
+    outputs = [["0.2", "0.4", None], ["0.4", None, "1.0"]]
+
+    sampled = Behavior.get_sampled_behavior(group_ids, outputs, num_groups=3)
+    assert torch.allclose(sampled.squeeze(1), torch.tensor([0.3, 0.4, 0.0, 0.4, 1.0]))
+
+
+def test_empty_groups_are_pruned():
+    population = LoadPopulation(astoria)
+    manager = PromptManager("{age} {gender} {ethnicity}", population)
+
+    assert manager.distinct_groups < manager.total_groups
+    assert (
+        manager.calls_saved_per_step == manager.total_groups - manager.distinct_groups
+    )
+    assert len(manager.get_prompt_list(kwargs={})) == manager.distinct_groups
+
+    group_ids = manager.get_group_ids(manager.dict_variables_with_values)
+    occupied = torch.unique(group_ids[group_ids >= 0])
+    assert occupied.tolist() == list(range(manager.distinct_groups))
+
+
+def test_state_clusters_bound_prompts():
+    population = LoadPopulation(astoria)
+    grouping = StateClusterGrouping(["age", "gender", "assets"], num_clusters=16)
+    manager = PromptManager("{age} {gender} {assets}", population, grouping=grouping)
+    assets = torch.rand(population.population_size, 1) * 1000
+
+    prompt_list = manager.get_prompt_list(kwargs={"assets": assets})
+    group_ids = manager.get_group_ids(manager.dict_variables_with_values)
+
+    assert manager.distinct_groups == 16 and len(prompt_list) == 16
+    # the first age group is never prompted, as for demographic groups
+    assert ((group_ids >= 0) == (population.age.reshape(-1) != 0)).all()
+    assert group_ids.max() < len(prompt_list)
+    # representatives are prompted with decoded demographics and their own state
+    age, gender, value = prompt_list[0].split(" ")
+    assert age in manager.filtered_mapping["age"]
+    assert gender in manager.filtered_mapping["gender"]
+    assert 0 <= float(value) <= 1000
+    # members of a cluster are close in state
+    spread = [assets[group_ids == g].std() for g in range(len(prompt_list))]
+    assert torch.stack(spread).nan_to_num().mean() < assets.std()
+
+    # cluster ids, and with them the archetype memory slots, are stable
+    manager.get_prompt_list(kwargs={"assets": assets})
+    next_ids = manager.get_group_ids(manager.dict_variables_with_values)
+    assert (next_ids == group_ids).float().mean() > 0.9
+
+
+def test_state_clusters_with_fewer_agents_than_clusters():
+    population = SimpleNamespace(population_size=5, age=torch.arange(5.0))
+    grouping = StateClusterGrouping(["age"], num_clusters=8)
+
+    group_ids, representatives = grouping.assign(population, {})
+    assert grouping.centroids.shape == (8, 1)
+    assert representatives.shape == (8,)
+    assert (group_ids >= 0).all() and group_ids.max() < 8
+
+    # the next step warm-starts from the 8 centroids
+    group_ids, representatives = grouping.assign(population, {})
+    assert grouping.centroids.shape == (8, 1)
+    assert representatives.shape == (8,)
+
+    eligible = torch.tensor([False, True, True, False, False])
+    group_ids, representatives = grouping.assign(population, {}, eligible=eligible)
+    assert (group_ids[~eligible] == -1).all()
+    assert set(representatives.tolist()) <= {1, 2}
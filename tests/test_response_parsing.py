@@ -0,0 +1,37 @@
+from agent_torch.core.llm.archetype import Archetype, prompt_archetypes
+from agent_torch.core.llm.parsing import ListSchema, NumberSchema
+from tests.mocks.llm import ScriptedMockLLM
+
+
+def test_local_repairs():
+    schema = NumberSchema(minimum=0, maximum=1)
+    assert schema("0.3") == 0.3
+    assert schema("Yes, they would.") == 1.0
+    assert schema("I'd say about 0.7 overall") == 0.7
+    assert schema("Yes, about 0.7") == 0.7
+    assert schema("No more than 0.3") == 0.3
+    assert schema("1.5") == 1.0
+    assert schema("not sure") is None
+    assert NumberSchema(maximum=1, clamp=False)("1.5") is None
+
+    pair = ListSchema(length=2)
+    assert pair("[0.2, 0.8]") == [0.2, 0.8]
+    assert pair("Answer: [0.2, 0.8] because...") == [0.2, 0.8]
+    assert pair("work 0.2, consume 0.8") == [0.2, 0.8]
+    assert pair("[0.2]") is None
+
+
+def test_only_failing_groups_are_requeried():
+    llm = ScriptedMockLLM({"q1": ["unclear", "maybe", "0.9"], "q2": ["never"]})
+    archetypes = Archetype(n_arch=2, response_schema=NumberSchema(0, 1)).llm(
+        llm, "{age}"
+    )
+    for archetype in archetypes:
+        archetype.initialize_memory(num_agents=3)
+
+    outputs = prompt_archetypes(archetypes, ["q0", "q1", "q2"], last_k=2)
+
+    # q1 is fixed by the first re-query, q2 stays invalid after two re-queries
+    assert outputs == [[0.5, 0.9, None], [0.5, 0.9, None]]
+    assert llm.num_queries == 6 + 4 + 2
+    assert archetypes[0].get_memory(last_k=2, agent_id=2)["chat_history"] == []
@@ -0,0 +1,52 @@
+import torch
+
+from agent_torch.core.llm.archetype import Archetype
+from agent_torch.core.llm.behavior import Behavior
+from agent_torch.core.llm.surrogate import BehaviorSurrogate
+from agent_torch.populations import sample
+from tests.mocks.llm import CountingMockLLM
+
+
+def test_surrogate_fits_recorded_answers(tmp_path):
+    mapping = {"gender": ["male", "female"]}
+    surrogate = BehaviorSurrogate(mapping, max_std=0.1)
+    for cases in range(0, 100, 5):
+        surrogate.record(
+            [{"gender": "male", "cases": cases}, {"gender": "female", "cases": cases}],
+            [0.2, 0.8],
+        )
+    surrogate.save_examples(str(tmp_path / "examples.json"))
+    surrogate = BehaviorSurrogate(mapping, max_std=0.1)
+    surrogate.load_examples(str(tmp_path / "examples.json")).fit(epochs=300)
+
+    values, std, confident = surrogate.predict(
+        [{"gender": "male", "cases": 50}, {"gender": "female", "cases": 500}]
+    )
+    assert torch.allclose(values[0], torch.tensor(0.2), atol=0.05)
+    # outside the range of case counts seen during training
+    assert confident.tolist() == [True, False]
+
+
+def test_behavior_falls_back_to_llm(tmp_path):
+    llm = CountingMockLLM()
+    archetypes = Archetype(n_arch=2).llm(llm, "{gender} {cases}")
+    behavior = Behavior(
+        archetypes, sample, conversation_log=str(tmp_path / "run.jsonl")
+    )
+    # the surrogate encodes the groups of the behavior's prompt
+    mapping = behavior.prompt_manager.filtered_mapping
+    behavior.surrogate = BehaviorSurrogate(mapping, max_std=0.1)
+
+    for cases in (100, 110, 120):
+        behavior.sample({"device": "cpu", "cases": cases})
+    num_queries = llm.num_queries
+    assert len(behavior.surrogate) == 3 * behavior.prompt_manager.distinct_groups
+    behavior.surrogate.fit(epochs=300)
+
+    sampled = behavior.sample({"device": "cpu", "cases": 115})
+    assert llm.num_queries == num_queries
+    assert torch.allclose(sampled, torch.full_like(sampled, 0.5), atol=0.05)
+
+    behavior.sample({"device": "cpu", "cases": 500})
+    assert llm.num_queries > num_queries
+    behavior.conversation_log.close()
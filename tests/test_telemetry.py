@@ -0,0 +1,30 @@
+from agent_torch.core.llm.archetype import Archetype
+from agent_torch.core.llm.behavior import Behavior
+from agent_torch.core.llm.conversation_log import ConversationLog
+from agent_torch.core.llm.telemetry import LLMTelemetry
+from agent_torch.populations import sample
+from tests.mocks.llm import ScriptedMockLLM
+
+
+def test_telemetry_per_step(tmp_path):
+    telemetry = LLMTelemetry(str(tmp_path / "telemetry.jsonl"))
+    llm = ScriptedMockLLM({"male": ["unsure", "0.3"]})
+    archetypes = Archetype(n_arch=2, telemetry=telemetry).llm(llm, "{gender}")
+    behavior = Behavior(
+        archetypes, sample, conversation_log=str(tmp_path / "run.jsonl")
+    )
+
+    for step in range(2):
+        behavior.sample({"device": "cpu", "step": step, "substep": "0"})
+    telemetry.close()
+
+    summary = telemetry.summary(by="step")
+    # step 0: 2 groups x 2 archetypes, the malformed "male" answer is re-queried once
+    assert summary[0]["requests"] == 5 and summary[0]["parse_failures"] == 1
+    assert summary[1]["requests"] == 4 and summary[1]["parse_failures"] == 0
+    assert telemetry.summary()["latency_p95"] is not None
+
+    records = ConversationLog.read(str(tmp_path / "telemetry.jsonl"), step=0)
+    assert len(records) == 5
+    assert {record["substep"] for record in records} == {"0"}
+    behavior.conversation_log.close()
@@ -0,0 +1,27 @@
+import torch
+
+from agent_torch.core.helpers import TimeSeriesBuffer
+
+
+def test_write_matches_one_hot_accumulation():
+    daily = torch.zeros(5)
+    value = torch.tensor(3.0, requires_grad=True)
+
+    written = TimeSeriesBuffer(daily).write(2, value)
+    written = TimeSeriesBuffer(written).write(2, value)
+    assert written.tolist() == [0.0, 0.0, 6.0, 0.0, 0.0]
+    assert TimeSeriesBuffer(written).read(2) == 6.0
+
+    written.sum().backward()
+    assert value.grad == 2.0
+
+    replaced = TimeSeriesBuffer(written).write(2, 1.0, accumulate=False)
+    assert replaced[2] == 1.0 and written[2] == 6.0
+
+
+def test_write_along_time_dim():
+    by_region = TimeSeriesBuffer(torch.zeros(4, 2)).write(1, torch.tensor([1.0, 2.0]))
+    assert by_region[1].tolist() == [1.0, 2.0] and by_region.sum() == 3.0
+
+    monthly = TimeSeriesBuffer(torch.zeros(1, 4), dim=-1).write(3, torch.tensor([5.0]))
+    assert monthly.tolist() == [[0.0, 0.0, 0.0, 5.0]]